@@ -14,12 +14,66 @@ class Settings(BaseSettings):
     google_api_key: Optional[str] = None
     google_model: str = "gemini-pro"
     
-    primary_llm_provider: str = "openai"  # Only OpenAI supported for now
+    primary_llm_provider: str = "openai"  # openai, anthropic, google, or local for the offline stand-in
+
+    # Multi-provider routing: with more than one provider listed, each call
+    # goes to the fastest healthy one (latency and error rate tracked as EWMAs)
+    llm_providers: str = ""  # comma-separated, e.g. "openai,anthropic"; empty uses the primary only
+    llm_ewma_alpha: float = 0.2
+    llm_unhealthy_error_rate: float = 0.5  # providers above this error-rate EWMA are tried last
+    llm_unhealthy_cooldown_seconds: float = 30.0  # after which an unhealthy provider is probed again
+    llm_hedge_requests: bool = False  # start a second provider if the first is slower than its p95
+    llm_hedge_default_delay_ms: float = 2000.0  # hedge delay until a provider has enough samples
+    llm_request_timeout_seconds: float = 60.0  # deadline for one call, retries included
+    llm_max_retries: int = 2  # on timeouts, connection errors, rate limits and 5xx only
+    llm_retry_backoff_seconds: float = 0.5
+    llm_retry_max_backoff_seconds: float = 8.0
+    llm_circuit_failure_threshold: int = 5  # consecutive failures that open the circuit
+    llm_circuit_reset_seconds: float = 30.0  # open time before a probe call is let through
+    llm_json_mode: str = "auto"  # auto (by model), on or off: provider JSON mode for structured responses
+    llm_structured_retries: int = 1  # corrective re-asks after an unparseable or invalid structured response
+    llm_usage_window_seconds: float = 3600.0  # rolling window of per-call token/cost records for /metrics/llm
+
+    # Local stand-in LLM (PRIMARY_LLM_PROVIDER=local) for offline load tests
+    local_llm_latency_distribution: str = "lognormal"  # fixed, uniform or lognormal
+    local_llm_latency_ms: float = 800.0  # median time to first token
+    local_llm_latency_spread: float = 0.5  # lognormal sigma, or +/- fraction for uniform
+    local_llm_tokens_per_second: float = 0.0  # 0 returns all tokens at once
+    local_llm_response_tokens: int = 200
+    local_llm_error_rate: float = 0.0
+    local_llm_seed: int = 0
+    local_llm_responses_path: Optional[str] = None  # JSON {"prompt substring": "canned response"}
     
     # Vector Database Configuration
     vector_db_path: str = "./vector_db"
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
-    
+    embedding_backend: str = "torch"  # torch, onnx or onnx-int8
+    embedding_onnx_file: str = "onnx/model.onnx"
+    embedding_onnx_int8_file: str = "onnx/model_quint8_avx2.onnx"
+    embedding_batch_size: int = 32
+
+    # Vector Index (HNSW) Configuration
+    # Applied when a collection is created; run `python manage_index.py compact`
+    # to rebuild an existing collection with new values.
+    hnsw_space: str = "l2"  # l2, cosine or ip
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 100
+    hnsw_ef_search: int = 100
+    # Recall on /vector-store-stats reads every embedding, so it is off unless asked for
+    index_recall_sample_size: int = 0
+    index_recall_max_sample_size: int = 200
+    index_generations_to_keep: int = 1
+    index_reload_check_seconds: float = 5.0
+
+    # Retrieval Backend
+    # "snapshot" serves queries from a read-only memory-mapped export of the
+    # index (`python manage_index.py export-snapshot`) shared by all workers.
+    retrieval_backend: str = "chroma"  # chroma or snapshot
+    vector_snapshot_path: str = "./vector_snapshot"
+    vector_snapshot_dtype: str = "float32"  # float16 halves the file but converts rows per query
+    vector_snapshot_ivf_lists: int = 0  # 0 = exact brute-force search
+    vector_snapshot_nprobe: int = 8
+
     # Application Configuration
     debug: bool = True
     host: str = "0.0.0.0"
@@ -33,6 +87,43 @@ class Settings(BaseSettings):
     # RAG Configuration
     top_k_retrieval: int = 5
     similarity_threshold: float = 0.7
+    source_snippet_chars: int = 200  # source text kept in compact guidance payloads
+
+    # Assessment Sessions
+    # "sqlite" persists sessions in a file every worker on the node can share
+    session_store_backend: str = "memory"  # memory or sqlite
+    session_db_path: str = "./data/sessions.db"
+    session_ttl_seconds: float = 86400
+    session_max_sessions: int = 10000  # memory backend only
+    # sqlite backend; 0 writes through, which workers sharing the file rely on
+    session_flush_interval_seconds: float = 0.0
+    session_flush_batch_size: int = 200
+
+    # Bulk Eligibility Screening
+    screening_batch_rows: int = 5000
+
+    # Question Base Generators
+    # Completions are cached here so reruns only pay for changed prompts
+    completion_cache_dir: str = "./.completion_cache"
+
+    # Enhanced Assessment results, keyed by a hash of the canonical answer set and
+    # the prompt; expired and surplus entries are pruned, deleting the directory purges it
+    enhanced_assessment_cache_dir: str = "./data/enhanced_assessment_cache"
+    enhanced_assessment_cache_ttl_seconds: float = 7 * 86400
+    enhanced_assessment_cache_max_entries: int = 10000
+
+    # Offline Guidance Batches (queued to disk, resumed after restarts)
+    guidance_batch_dir: str = "./data/guidance_batches"
+    guidance_batch_mode: str = "workers"  # workers, or openai_batch for the OpenAI Batch API
+    guidance_batch_concurrency: int = 2  # facilities answered at once, shared by all jobs
+    guidance_batch_max_items: int = 10000
+    guidance_batch_poll_seconds: float = 60.0  # OpenAI batch status polling interval
+
+    # Response Compression
+    response_compression: str = "auto"  # auto (brotli if brotli-asgi is installed, else gzip), gzip or off
+    response_compression_min_bytes: int = 1000
+    response_gzip_level: int = 6
+    response_brotli_quality: int = 4
     
     class Config:
         env_file = ".env"
@@ -42,10 +133,19 @@ class Settings(BaseSettings):
 # Global settings instance
 settings = Settings()
 
+# Model name of the offline stand-in provider, in usage records and provider info alike
+LOCAL_LLM_MODEL = "local-stand-in"
+
 
-def get_llm_config():
-    """Get the configuration for the primary LLM provider."""
-    provider = settings.primary_llm_provider.lower()
+def configured_providers():
+    """Providers to route between, primary first unless LLM_PROVIDERS says otherwise."""
+    providers = [name.strip().lower() for name in settings.llm_providers.split(",") if name.strip()]
+    return providers or [settings.primary_llm_provider.lower()]
+
+
+def get_llm_config(provider: Optional[str] = None):
+    """Get the configuration for an LLM provider (the primary one by default)."""
+    provider = (provider or settings.primary_llm_provider).lower()
     
     if provider == "openai":
         if not settings.openai_api_key:
@@ -63,6 +163,12 @@ def get_llm_config():
             "api_key": settings.anthropic_api_key,
             "model": settings.anthropic_model
         }
+    elif provider == "local":
+        return {
+            "provider": "local",
+            "api_key": None,
+            "model": LOCAL_LLM_MODEL
+        }
     elif provider == "google":
         if not settings.google_api_key:
             raise ValueError("Google API key not configured")
@@ -1,17 +1,20 @@
 import logging
 from datetime import datetime
-from typing import Dict, Any
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from typing import Dict, Any, Optional
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request, Header, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 import os
 import json
+import time
 
-from app.config import settings, get_llm_config
+from app.config import settings
 from app.models.eligibility import (
-    AssessmentRequest, AnswerSubmission, AssessmentResponse
+    AssessmentRequest, AnswerSubmission, AssessmentResponse,
+    AssessmentSubmission, AssessmentSubmissionResponse
 )
 from app.models.forecasting import ForecastingRequest, ForecastingResponse
 from app.models.responses import (
@@ -19,13 +22,28 @@ from app.models.responses import (
     HealthResponse, 
     RAGResponse, 
     DocumentUploadResponse,
-    QuestionRequest
+    QuestionRequest,
+    BatchRetrievalRequest,
+    BatchRetrievalResponse,
+    GuidanceBatchRequest
 )
 from app.services.eligibility_service import EligibilityService
 from app.services.forecasting_service import ForecastingService
-from app.services.rag_service import RAGService
-from app.services.llm_service import LLMService
+from app.services.rag_service import RAGService, IndexRebuildInProgress
+from app.services.llm_service import LLMService, DEFAULT_TEMPERATURE
+from app.services.llm_usage import LLMUsageRoute, llm_usage, llm_usage_tags
+from app.services.question_base_job import QuestionBaseRegenerator, RegenerationInProgress
+from app.services.guidance_batch import GuidanceBatchRunner
 from app.utils.document_loader import DocumentProcessor
+from app.utils.screening import ScreeningParser, detect_format, iter_line_batches
+from app.utils.file_cache import CachedJSONFile, CachedResponse, etag_matches
+from app.utils.completion_cache import CompletionCache
+from app.utils.json_response import FastJSONResponse, add_compression
+from app.utils.payload_fields import INCLUDE_OPTIONS, select_fields
+from app.utils.prompts import (
+    ASSESSMENT_TURN_PROMPT, DEFAULT_ASSESSMENT_PROMPT, QUESTION_PROMPTS, RAG_QUERY_PROMPT,
+    build_enhanced_assessment_messages
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,8 +53,11 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="45Q Tax Credit Eligibility & Forecasting System",
     description="A model-agnostic RAG application for 45Q tax credit analysis",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
+# Endpoints tag their LLM calls with their route for /metrics/llm
+app.router.route_class = LLMUsageRoute
 
 # Add CORS middleware
 app.add_middleware(
@@ -46,17 +67,54 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+add_compression(app)
+
 
 # Mount static files
 if os.path.exists("static"):
     app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Initialize services
-eligibility_service = EligibilityService()
-forecasting_service = ForecastingService()
-rag_service = RAGService()
+# Initialize services. They share one LLMService (and one RAGService), so
+# routing statistics and circuit breakers cover every LLM call of the worker.
 llm_service = LLMService()
+rag_service = RAGService(llm_service=llm_service)
+eligibility_service = EligibilityService(rag_service=rag_service, llm_service=llm_service)
+forecasting_service = ForecastingService(rag_service=rag_service, llm_service=llm_service)
 document_processor = DocumentProcessor()
+question_base_regenerator = QuestionBaseRegenerator()
+# Enhanced assessment results by answer set; on disk so all workers share it
+enhanced_assessment_cache = CompletionCache(
+    settings.enhanced_assessment_cache_dir,
+    max_age_seconds=settings.enhanced_assessment_cache_ttl_seconds,
+    max_entries=settings.enhanced_assessment_cache_max_entries
+)
+guidance_batch_runner = GuidanceBatchRunner(rag_service)
+
+
+@app.on_event("startup")
+async def resume_guidance_batches():
+    """Pick up guidance batches an earlier worker left unfinished."""
+    resumed = guidance_batch_runner.resume()
+    if resumed:
+        logger.info(f"Resumed {len(resumed)} guidance batch job(s)")
+
+
+@app.on_event("shutdown")
+def flush_sessions():
+    """Write buffered assessment sessions before the worker exits."""
+    eligibility_service.sessions.close()
+
+
+@app.on_event("shutdown")
+async def stop_regeneration():
+    """Stop a running question base regeneration; the live files stay as they are."""
+    await question_base_regenerator.shutdown()
+
+
+@app.on_event("shutdown")
+async def stop_guidance_batches():
+    """Stop draining guidance batches; they resume on the next start."""
+    await guidance_batch_runner.shutdown()
 
 
 @app.get("/")
@@ -72,17 +130,21 @@ async def root():
 async def health_check():
     """Health check endpoint."""
     try:
-        # Check LLM service
+        # Check LLM service; every endpoint shares it, so its breakers cover all LLM calls
         provider_info = llm_service.get_provider_info()
+        circuit_breakers = llm_service.get_circuit_breakers()
+        # An open circuit means LLM-backed endpoints are failing fast
+        degraded = any(breaker["state"] != "closed" for breaker in circuit_breakers.values())
         
         return HealthResponse(
             success=True,
-            message="Service is healthy",
-            status="healthy",
+            message="LLM provider unavailable, failing fast" if degraded else "Service is healthy",
+            status="degraded" if degraded else "healthy",
             version="1.0.0",
             timestamp=datetime.now().isoformat(),
             data={
                 "llm_provider": provider_info,
+                "llm_circuit_breakers": circuit_breakers,
                 "vector_store": {"status": "available"}
             }
         )
@@ -98,8 +160,10 @@ async def health_check():
         )
 
 
+# The assessment endpoints are sync so FastAPI runs them in the threadpool:
+# with the sqlite backend every session read and write goes to disk.
 @app.post("/assess-eligibility", response_model=AssessmentResponse)
-async def start_eligibility_assessment(request: AssessmentRequest):
+def start_eligibility_assessment(request: AssessmentRequest):
     """Start a new eligibility assessment."""
     try:
         assessment = eligibility_service.start_assessment(request.session_id)
@@ -117,7 +181,7 @@ async def start_eligibility_assessment(request: AssessmentRequest):
 
 
 @app.post("/submit-answer", response_model=AssessmentResponse)
-async def submit_answer(submission: AnswerSubmission):
+def submit_answer(submission: AnswerSubmission):
     """Submit an answer to the eligibility questionnaire."""
     try:
         result = eligibility_service.submit_answer(
@@ -149,8 +213,73 @@ async def submit_answer(submission: AnswerSubmission):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/submit-assessment", response_model=AssessmentSubmissionResponse)
+def submit_assessment(submission: AssessmentSubmission):
+    """Submit every questionnaire answer at once and get the eligibility result.
+
+    Answers are validated against the question definitions; any errors are
+    returned alongside the result instead of failing the request.
+    """
+    try:
+        result = eligibility_service.submit_assessment(submission.answers, submission.session_id)
+        return AssessmentSubmissionResponse(**result)
+    except Exception as e:
+        logger.error(f"Error submitting assessment: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/screen-eligibility/batch")
+async def screen_eligibility_batch(request: Request, format: Optional[str] = None, id_field: str = "facility_id"):
+    """Screen a facility list for 45Q eligibility without the questionnaire.
+
+    The body is JSON lines (one answer dict per line) or CSV with a header row
+    using the questionnaire's question ids as column names. The response
+    streams one JSON line per input row with the row number, the `id_field`
+    value if present and the eligibility result, followed by a summary line.
+    """
+    try:
+        upload_format = detect_format(request.headers.get("content-type"), format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def screen_batch(parser: ScreeningParser, lines) -> tuple:
+        rows = parser.parse(lines) if lines is not None else parser.finish()
+        results = eligibility_service.screen_rows(rows, id_field)
+        eligible = sum(1 for result in results if result.get("is_eligible"))
+        body = "".join(json.dumps(result) + "\n" for result in results)
+        return body, len(results), eligible
+
+    async def stream_results():
+        parser = ScreeningParser(upload_format)
+        start = time.perf_counter()
+        total_rows = total_eligible = 0
+        batches = iter_line_batches(request.stream(), settings.screening_batch_rows)
+        async for lines in batches:
+            body, rows, eligible = await run_in_threadpool(screen_batch, parser, lines)
+            total_rows, total_eligible = total_rows + rows, total_eligible + eligible
+            if body:
+                yield body
+        body, rows, eligible = await run_in_threadpool(screen_batch, parser, None)
+        total_rows, total_eligible = total_rows + rows, total_eligible + eligible
+        if body:
+            yield body
+
+        elapsed = time.perf_counter() - start
+        rows_per_second = total_rows / elapsed if elapsed else 0.0
+        logger.info(f"Screened {total_rows} rows ({total_eligible} eligible) in {elapsed:.2f}s "
+                    f"({rows_per_second:.0f} rows/s)")
+        yield json.dumps({"summary": {
+            "rows": total_rows,
+            "eligible": total_eligible,
+            "seconds": elapsed,
+            "rows_per_second": rows_per_second
+        }}) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 @app.get("/assessment-progress/{session_id}")
-async def get_assessment_progress(session_id: str):
+def get_assessment_progress(session_id: str):
     """Get the current progress of an assessment."""
     try:
         progress = eligibility_service.get_assessment_progress(session_id)
@@ -166,6 +295,20 @@ async def get_assessment_progress(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/assessment-metrics")
+async def get_assessment_metrics():
+    """Get assessment completion metrics, including average questions per assessment."""
+    try:
+        return BaseResponse(
+            success=True,
+            message="Assessment metrics retrieved",
+            data=eligibility_service.get_assessment_metrics()
+        )
+    except Exception as e:
+        logger.error(f"Error getting assessment metrics: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/forecast-credits", response_model=ForecastingResponse)
 async def generate_credit_forecast(request: ForecastingRequest):
     """Generate a credit forecast based on facility information."""
@@ -184,7 +327,8 @@ async def generate_credit_forecast(request: ForecastingRequest):
             }
         )
         
-        return ForecastingResponse(
+        # Returned directly so FastAPI skips its jsonable_encoder pass over the forecast
+        return FastJSONResponse(ForecastingResponse(
             session_id=request.session_id,
             forecast=forecast,
             confidence_score=0.85,
@@ -194,18 +338,28 @@ async def generate_credit_forecast(request: ForecastingRequest):
                 "Consider bonus credit opportunities",
                 "Consult with tax professionals"
             ]
-        )
+        ))
     except Exception as e:
         logger.error(f"Error generating forecast: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _question_instructions(template: Optional[str]) -> str:
+    """The server-side instructions for an /ask-question template id."""
+    if template == "assessment_turn":
+        # Interactive turns follow the current (possibly regenerated) assessment prompt
+        cached = assessment_prompt_file.get() or default_assessment_prompt_response
+        return f"{cached.data['data']['prompt']}\n{ASSESSMENT_TURN_PROMPT}"
+    return QUESTION_PROMPTS.get(template) or RAG_QUERY_PROMPT
+
+
 @app.post("/ask-question", response_model=RAGResponse)
 async def ask_question(request: QuestionRequest):
     """Ask a question using the RAG system."""
     try:
-        result = await rag_service.answer_question(request.question, request.context)
-        
+        result = await rag_service.answer_question(request.question, request.context,
+                                                   instructions=_question_instructions(request.template))
+
         return RAGResponse(
             success=True,
             message="Question answered successfully",
@@ -219,6 +373,28 @@ async def ask_question(request: QuestionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/retrieve/batch", response_model=BatchRetrievalResponse)
+def retrieve_batch(request: BatchRetrievalRequest):
+    """Retrieve relevant chunks for several queries in one batched search."""
+    # A plain def so FastAPI runs the embedding pass in its threadpool
+    try:
+        start = time.perf_counter()
+        results = rag_service.retrieve_many(request.queries, request.top_k)
+
+        return FastJSONResponse(BatchRetrievalResponse(
+            success=True,
+            message=f"Retrieved documents for {len(request.queries)} queries",
+            results=[
+                [{"id": doc.id, "content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+                for docs in results
+            ],
+            retrieval_time=time.perf_counter() - start
+        ))
+    except Exception as e:
+        logger.error(f"Error in batch retrieval: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/upload-documents", response_model=DocumentUploadResponse)
 async def upload_documents(files: list[UploadFile] = File(...)):
     """Upload and process documents for the RAG system."""
@@ -230,6 +406,7 @@ async def upload_documents(files: list[UploadFile] = File(...)):
         
         documents_processed = 0
         total_chunks = 0
+        rebuild_seconds = 0.0
         
         for file in files:
             # Save uploaded file
@@ -244,9 +421,12 @@ async def upload_documents(files: list[UploadFile] = File(...)):
         processing_result = document_processor.process_documents_for_rag(documents_dir)
         
         if processing_result["success"]:
-            # Update RAG system with new documents
-            rag_service.add_documents(processing_result["chunks"])
+            # The whole directory was re-processed, so rebuild the index from it
+            # instead of appending duplicates of the existing chunks
+            # Re-embedding is CPU-bound; keep it off the event loop
+            rebuild_result = await run_in_threadpool(rag_service.rebuild_index, processing_result["chunks"])
             total_chunks = processing_result["chunks_created"]
+            rebuild_seconds = rebuild_result.get("rebuild_seconds", 0.0)
         
         return DocumentUploadResponse(
             success=True,
@@ -254,18 +434,25 @@ async def upload_documents(files: list[UploadFile] = File(...)):
             documents_processed=documents_processed,
             total_chunks=total_chunks,
             vector_db_updated=processing_result["success"],
-            processing_time=0.0  # Could add actual timing
+            processing_time=rebuild_seconds
         )
+    except IndexRebuildInProgress as e:
+        return JSONResponse(status_code=409, content=BaseResponse(
+            success=False,
+            message=f"{e}; the uploaded files are saved and will be indexed by the next upload or rebuild",
+            data=e.owner
+        ).model_dump())
     except Exception as e:
         logger.error(f"Error uploading documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/vector-store-stats")
-async def get_vector_store_stats():
-    """Get statistics about the vector store."""
+def get_vector_store_stats(recall_sample_size: Optional[int] = None):
+    """Get statistics about the vector store, with HNSW recall on a sample when `recall_sample_size` is set."""
+    # Sync on purpose: FastAPI runs it in the threadpool, and recall reads the whole collection
     try:
-        stats = rag_service.get_vector_store_stats()
+        stats = rag_service.get_vector_store_stats(recall_sample_size)
         return BaseResponse(
             success=True,
             message="Vector store statistics retrieved",
@@ -291,16 +478,39 @@ async def get_llm_provider_info():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/metrics/llm")
+async def get_llm_metrics(window_seconds: Optional[float] = None, top_sessions: int = 20):
+    """Token usage, latency and estimated cost of LLM calls by endpoint, provider and session."""
+    return BaseResponse(
+        success=True,
+        message="LLM usage metrics retrieved",
+        data=llm_usage.summary(window_seconds, top_sessions)
+    )
+
+
+FIELDS_DESCRIPTION = "Comma separated top-level data fields to return (default: all)"
+INCLUDE_DESCRIPTION = (f"Comma separated extras: {', '.join(INCLUDE_OPTIONS)}. By default sources are "
+                       "summarized and full chunks are fetched from /sources/{chunk_id}")
+
+
 @app.post("/detailed-guidance/{session_id}")
-async def get_detailed_guidance(session_id: str):
+async def get_detailed_guidance(session_id: str,
+                                fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+                                include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION)):
     """Get detailed guidance for a completed assessment."""
     try:
         guidance = await eligibility_service.get_detailed_guidance(session_id)
-        return BaseResponse(
+        try:
+            data = select_fields(guidance, ["rag_guidance"], fields, include)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse(BaseResponse(
             success=True,
             message="Detailed guidance generated",
-            data=guidance
-        )
+            data=data
+        ))
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -309,7 +519,9 @@ async def get_detailed_guidance(session_id: str):
 
 
 @app.post("/detailed-forecast-analysis")
-async def get_detailed_forecast_analysis(request: ForecastingRequest):
+async def get_detailed_forecast_analysis(request: ForecastingRequest,
+                                         fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+                                         include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION)):
     """Get detailed forecast analysis with RAG guidance."""
     try:
         analysis = await forecasting_service.get_detailed_forecast_analysis(
@@ -326,96 +538,108 @@ async def get_detailed_forecast_analysis(request: ForecastingRequest):
             }
         )
         
-        return BaseResponse(
+        try:
+            data = select_fields(analysis, ["rag_analysis"], fields, include)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse(BaseResponse(
             success=True,
             message="Detailed forecast analysis generated",
-            data=analysis
-        )
+            data=data
+        ))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating detailed forecast analysis: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/sources/{chunk_id}")
+def get_source(chunk_id: str):
+    """Get the full text and metadata of a retrieved source chunk."""
+    try:
+        doc = rag_service.get_source(chunk_id)
+    except Exception as e:
+        logger.error(f"Error getting source {chunk_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if doc is None:
+        raise HTTPException(status_code=404, detail=f"Source {chunk_id} not found")
+    return BaseResponse(
+        success=True,
+        message="Source retrieved",
+        data={"id": doc.id, "content": doc.page_content, "metadata": doc.metadata}
+    )
+
+
+def _build_assessment_prompt_response(data: Dict[str, Any]) -> Dict[str, Any]:
+    return BaseResponse(
+        success=True,
+        message="Assessment prompt retrieved",
+        data={"prompt": data["improved_prompt"]}
+    ).model_dump()
+
+
+def _build_enhanced_questions_response(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Flatten all questions into a single array
+    all_questions = []
+    for category_key, category_data in data["categories"].items():
+        for question in category_data["questions"]:
+            all_questions.append(question)
+
+    return BaseResponse(
+        success=True,
+        message="Enhanced questions loaded successfully",
+        data={
+            "questions": all_questions,
+            "total_questions": len(all_questions),
+            "categories": len(data["categories"])
+        }
+    ).model_dump()
+
+
+# Parsed once and reloaded only when the files change (e.g. after /regenerate-question-base)
+assessment_prompt_file = CachedJSONFile("assessment_prompt.json", _build_assessment_prompt_response)
+enhanced_questions_file = CachedJSONFile("enhanced_question_base.json", _build_enhanced_questions_response)
+default_assessment_prompt_response = CachedResponse.from_data(BaseResponse(
+    success=True,
+    message="Default assessment prompt retrieved",
+    data={"prompt": DEFAULT_ASSESSMENT_PROMPT}
+).model_dump())
+
+
+def _cached_json_response(cached: CachedResponse, if_none_match: Optional[str]) -> Response:
+    """Serve a pre-serialized payload, or a 304 if the client's copy is current."""
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
 @app.get("/assessment-prompt")
-async def get_assessment_prompt():
+async def get_assessment_prompt(if_none_match: Optional[str] = Header(None)):
     """Get the generated assessment prompt for interactive assessments."""
     try:
-        # Try to load the generated prompt
-        prompt_file = "assessment_prompt.json"
-        if os.path.exists(prompt_file):
-            with open(prompt_file, "r") as f:
-                data = json.load(f)
-                return BaseResponse(
-                    success=True,
-                    message="Assessment prompt retrieved",
-                    data={"prompt": data["improved_prompt"]}
-                )
-        else:
-            # Return a default prompt if no generated one exists
-            default_prompt = """You are an expert 45Q tax credit eligibility assessor. Your job is to determine if a company qualifies for 45Q credits and provide a complete assessment.
-
-IMPORTANT RULES:
-- NEVER refer users to tax professionals or external consultants
-- ALWAYS provide complete eligibility assessments when you have enough information
-- Ask specific, targeted questions based on the 45Q regulations
-- Continue asking questions until you can make a definitive determination
-- Give comprehensive assessments with clear yes/no eligibility and reasoning
-
-ASSESSMENT PROCESS:
-1. Start with general facility information
-2. Ask targeted follow-up questions based on responses
-3. Continue until you have enough information for a complete assessment
-4. Provide a definitive eligibility determination with:
-   - Eligible: Yes/No
-   - Reasoning based on 45Q regulations
-   - Specific provisions that apply
-   - Estimated credit amounts if possible
-   - Next steps for the company
-
-Remember: You are the expert. Provide complete guidance, don't defer to others."""
-            
-            return BaseResponse(
-                success=True,
-                message="Default assessment prompt retrieved",
-                data={"prompt": default_prompt}
-            )
+        # Fall back to a default prompt if no generated one exists
+        cached = assessment_prompt_file.get() or default_assessment_prompt_response
+        return _cached_json_response(cached, if_none_match)
     except Exception as e:
         logger.error(f"Error getting assessment prompt: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/get-enhanced-questions")
-async def get_enhanced_questions():
+async def get_enhanced_questions(if_none_match: Optional[str] = Header(None)):
     """Get the enhanced 45Q assessment questions."""
     try:
-        # Load the enhanced questions from the generated file
-        questions_file = "enhanced_question_base.json"
-        if os.path.exists(questions_file):
-            with open(questions_file, "r") as f:
-                data = json.load(f)
-                
-                # Flatten all questions into a single array
-                all_questions = []
-                for category_key, category_data in data["categories"].items():
-                    for question in category_data["questions"]:
-                        all_questions.append(question)
-                
-                return BaseResponse(
-                    success=True,
-                    message="Enhanced questions loaded successfully",
-                    data={
-                        "questions": all_questions,
-                        "total_questions": len(all_questions),
-                        "categories": len(data["categories"])
-                    }
-                )
-        else:
-            raise HTTPException(status_code=404, detail="Enhanced questions file not found. Please run the question generator first.")
-            
+        cached = enhanced_questions_file.get()
     except Exception as e:
         logger.error(f"Error loading enhanced questions: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Enhanced questions file not found. Please run the question generator first.")
+    return _cached_json_response(cached, if_none_match)
+
 
 @app.post("/complete-enhanced-assessment")
 async def complete_enhanced_assessment(request: dict):
@@ -430,47 +654,20 @@ async def complete_enhanced_assessment(request: dict):
         if not answers:
             raise HTTPException(status_code=400, detail="At least one answer is required")
         
-        # Create a comprehensive assessment prompt
-        assessment_prompt = f"""
-You are an expert 45Q tax credit eligibility assessor. Analyze the following facility information and provide a comprehensive eligibility assessment.
-
-FACILITY ASSESSMENT DATA:
-Session ID: {session_id}
-Total Questions Answered: {len(answers)}
-
-ANSWERS PROVIDED:
-"""
-        
-        # Add all answers to the prompt
-        for answer in answers:
-            assessment_prompt += f"\nQuestion: {answer['question']}"
-            assessment_prompt += f"\nAnswer: {answer['answer']}"
-            assessment_prompt += f"\nCategory: {answer['category']}\n"
-        
-        assessment_prompt += """
-
-ASSESSMENT REQUIREMENTS:
-1. Determine if the facility is eligible for 45Q tax credits
-2. Identify which specific 45Q provisions apply
-3. Provide reasoning for eligibility determination
-4. Estimate potential credit amounts if eligible
-5. Identify any missing information that could affect eligibility
-6. Provide specific next steps and recommendations
-
-Please provide a comprehensive assessment with:
-- ELIGIBILITY: Yes/No with clear reasoning
-- APPLICABLE PROVISIONS: List specific 45Q provisions
-- CREDIT ESTIMATES: Potential credit amounts if eligible
-- MISSING INFORMATION: Any critical gaps
-- NEXT STEPS: Specific recommendations
-- RISK FACTORS: Any potential issues or concerns
-
-Format your response in a clear, structured manner.
-"""
-        
-        # Use the LLM service to generate the assessment
-        llm_config = get_llm_config()
-        assessment_result = await llm_service.generate_response(assessment_prompt, llm_config)
+        # The same answers, in any order and from any session, reuse the stored assessment.
+        # Entries are keyed by the model that answered; with routing that varies per call.
+        messages = build_enhanced_assessment_messages(answers)
+        assessment_result = enhanced_assessment_cache.get_any(
+            enhanced_assessment_cache.key(model, messages, DEFAULT_TEMPERATURE) for model in llm_service.model_ids()
+        )
+        cached = assessment_result is not None
+        if not cached:
+            with llm_usage_tags(session_id=session_id):
+                assessment_result, model = await llm_service.chat_completion_with_model(messages)
+            # Off the event loop: a write may prune the cache directory
+            await run_in_threadpool(enhanced_assessment_cache.put,
+                                    enhanced_assessment_cache.key(model, messages, DEFAULT_TEMPERATURE),
+                                    assessment_result)
         
         return BaseResponse(
             success=True,
@@ -479,44 +676,108 @@ Format your response in a clear, structured manner.
                 "assessment": assessment_result,
                 "session_id": session_id,
                 "questions_answered": len(answers),
+                "cached": cached,
                 "timestamp": datetime.now().isoformat()
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error completing enhanced assessment: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/regenerate-question-base")
+@app.post("/regenerate-question-base", status_code=202)
 async def regenerate_question_base():
-    """Regenerate the question base by running the analysis script."""
+    """Start regenerating the question base in the background.
+
+    Poll /regenerate-question-base/{job_id} for progress. The generated files
+    replace the live ones only once the whole run has succeeded.
+    """
     try:
-        import subprocess
-        import sys
-        
-        # Run the question base generation script
-        result = subprocess.run([
-            sys.executable, "generate_question_base.py"
-        ], capture_output=True, text=True, cwd=os.getcwd())
-        
-        if result.returncode == 0:
-            return BaseResponse(
-                success=True,
-                message="Question base regenerated successfully",
-                data={"output": result.stdout}
-            )
-        else:
-            return BaseResponse(
-                success=False,
-                message="Failed to regenerate question base",
-                data={"error": result.stderr}
-            )
+        job = question_base_regenerator.start()
+        return BaseResponse(
+            success=True,
+            message="Question base regeneration started",
+            data=job
+        )
+    except RegenerationInProgress as e:
+        return JSONResponse(status_code=409, content=BaseResponse(
+            success=False,
+            message=str(e),
+            data=e.job
+        ).model_dump())
     except Exception as e:
         logger.error(f"Error regenerating question base: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/regenerate-question-base/{job_id}")
+async def get_regeneration_status(job_id: str):
+    """Get the status and progress of a question base regeneration."""
+    try:
+        return BaseResponse(
+            success=True,
+            message="Regeneration status retrieved",
+            data=question_base_regenerator.get(job_id)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.delete("/regenerate-question-base/{job_id}")
+async def cancel_regeneration(job_id: str):
+    """Cancel a running question base regeneration."""
+    try:
+        return BaseResponse(
+            success=True,
+            message="Regeneration cancelled",
+            data=await question_base_regenerator.cancel(job_id)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.post("/guidance-batch", status_code=202)
+async def submit_guidance_batch(request: GuidanceBatchRequest):
+    """Queue eligibility and/or credit calculation guidance for many facilities."""
+    try:
+        return BaseResponse(
+            success=True,
+            message="Guidance batch queued",
+            data=guidance_batch_runner.submit(request.facilities, request.kinds)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error queueing guidance batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/guidance-batch/{job_id}")
+async def get_guidance_batch(job_id: str):
+    """Get the status and progress of a guidance batch."""
+    try:
+        return BaseResponse(
+            success=True,
+            message="Guidance batch status retrieved",
+            data=guidance_batch_runner.get(job_id)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/guidance-batch/{job_id}/results")
+async def get_guidance_batch_results(job_id: str):
+    """Stream the finished items of a guidance batch as NDJSON, one line per facility."""
+    try:
+        guidance_batch_runner.get(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return StreamingResponse(guidance_batch_runner.iter_results(job_id), media_type="application/x-ndjson")
+
+
 # Error handlers
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 from enum import Enum
 
@@ -39,6 +39,9 @@ class QuestionType(str, Enum):
 
 
 class EligibilityQuestion(BaseModel):
+    # Shared by every assessment through the questionnaire, so never mutated
+    model_config = ConfigDict(frozen=True)
+
     id: str
     question: str
     type: QuestionType
@@ -52,7 +55,7 @@ class EligibilityQuestion(BaseModel):
 class EligibilityAssessment(BaseModel):
     session_id: str
     current_question_index: int = 0
-    questions: List[EligibilityQuestion]
+    questionnaire_version: str
     answers: Dict[str, Any] = {}
     is_complete: bool = False
     eligibility_result: Optional[Dict[str, Any]] = None
@@ -95,10 +98,28 @@ class AnswerSubmission(BaseModel):
     answer: Any
 
 
+class AssessmentSubmission(BaseModel):
+    session_id: Optional[str] = None
+    answers: Dict[str, Any]
+
+
+class AnswerValidationError(BaseModel):
+    question_id: str
+    message: str
+
+
 class AssessmentResponse(BaseModel):
     session_id: str
     current_question: Optional[EligibilityQuestion] = None
     progress: float = Field(ge=0.0, le=1.0)
     is_complete: bool = False
     eligibility_result: Optional[EligibilityResult] = None
-    next_question: Optional[EligibilityQuestion] = None 
\ No newline at end of file
+    next_question: Optional[EligibilityQuestion] = None 
+
+
+class AssessmentSubmissionResponse(BaseModel):
+    session_id: str
+    is_complete: bool = False
+    eligibility_result: Optional[EligibilityResult] = None
+    validation_errors: List[AnswerValidationError] = []
+    current_question: Optional[EligibilityQuestion] = None  # First invalid question, to continue step by step
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, Any, Dict, List
+from app.utils.prompts import QUESTION_PROMPTS
 
 
 class BaseResponse(BaseModel):
@@ -12,6 +13,25 @@ class BaseResponse(BaseModel):
 class QuestionRequest(BaseModel):
     question: str
     context: Optional[str] = None
+    # Id of the server-side instructions to answer with (see QUESTION_PROMPTS); keep per-request data in `question`
+    template: Optional[str] = None
+
+    @field_validator("template")
+    @classmethod
+    def known_template(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and value not in QUESTION_PROMPTS:
+            raise ValueError(f"Unknown template: {value}. Choose one of {', '.join(QUESTION_PROMPTS)}")
+        return value
+
+
+class BatchRetrievalRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=100)
+    top_k: Optional[int] = Field(None, ge=1, le=50)
+
+
+class GuidanceBatchRequest(BaseModel):
+    facilities: List[Dict[str, Any]] = Field(..., min_length=1)
+    kinds: List[str] = Field(default_factory=lambda: ["eligibility", "credit_calculation"], min_length=1)
 
 
 class HealthResponse(BaseResponse):
@@ -36,4 +56,8 @@ class DocumentUploadResponse(BaseResponse):
     documents_processed: int
     total_chunks: int
     vector_db_updated: bool
-    processing_time: float 
\ No newline at end of file
+    processing_time: float 
+
+class BatchRetrievalResponse(BaseResponse):
+    results: List[List[Dict[str, Any]]]
+    retrieval_time: float
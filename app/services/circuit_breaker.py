@@ -0,0 +1,81 @@
+"""
+Circuit breaker for calls to an upstream LLM provider.
+
+After `failure_threshold` consecutive failed calls the breaker opens and calls
+fail fast with `CircuitOpenError` instead of waiting on a provider that is
+down. Once `reset_seconds` have passed it goes half-open and lets a single
+probe call through: success closes it again, failure re-opens it.
+"""
+
+import time
+from typing import Any, Dict, Optional
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open state machine around one provider."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go upstream now."""
+        state = self.state
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        retry_in = max(self.reset_seconds - (time.monotonic() - self.opened_at), 0.0)
+        raise CircuitOpenError(f"{self.name} circuit is open; retry in {retry_in:.1f}s")
+
+    def record_success(self):
+        self._state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._probe_in_flight or self.consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN or self._probe_in_flight:
+                self.times_opened += 1
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def record_abandoned(self):
+        """A call was cancelled before it finished; let another probe through."""
+        self._probe_in_flight = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        state = self.state
+        info = {
+            "state": state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "times_opened": self.times_opened
+        }
+        if state != self.CLOSED:
+            info["retry_in_seconds"] = max(self.reset_seconds - (time.monotonic() - self.opened_at), 0.0)
+        return info
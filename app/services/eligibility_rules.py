@@ -0,0 +1,507 @@
+"""
+Declarative 45Q eligibility and credit-rate rules.
+
+`RULE_SET` describes thresholds, facility classes, sequestration categories,
+operation date windows and bonus rules as plain data. `EligibilityRules`
+compiles it once into per-value lookup tables, so evaluating an answer set is
+a handful of dictionary lookups instead of repeated lowercase substring scans.
+Both `EligibilityService` and `ForecastingService` use the shared `RULES`.
+
+Keywords are matched as lowercase substrings of the answer, as the
+questionnaire options are free to carry extra wording. A facility's provision
+comes from the first matching class; the other per-class attributes (credit
+rate, extra capture minimum, recommendation, bonus) come from any matching
+class that defines them.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.eligibility import EligibilityResult
+
+RULE_SET: Dict[str, Any] = {
+    "capture_minimum": {
+        "minimum_tons": 12.5,
+        "message": "Minimum CO2 capture requirement not met (12.5 metric tons)",
+        "invalid_message": "Invalid CO2 capture amount format"
+    },
+    "default_credit_rate": 60.0,  # $/ton
+    "facility_classes": [
+        {
+            "id": "direct_air_capture",
+            "match": ["direct air capture"],
+            "provision": "Section 45Q - Direct Air Capture",
+            "credit_rate": 85.0,
+            "capture_minimum": {
+                "minimum_tons": 1.0,
+                "message": "Direct air capture minimum requirement not met (1.0 metric tons)"
+            },
+            "recommendation": "Ensure DAC facility meets specific technical requirements"
+        },
+        {
+            "id": "electric_generation",
+            "match": ["electric generation"],
+            "provision": "Section 45Q - Electric Generation"
+        },
+        {
+            "id": "industrial",
+            "match": ["industrial"],
+            "provision": "Section 45Q - Industrial Facilities",
+            "recommendation": "Verify industrial facility qualifies under Section 45Q",
+            "carbon_intensity_bonus": 0.05
+        }
+    ],
+    "default_facility_class": {"id": "other", "provision": "Section 45Q - Other Facilities"},
+    "sequestration_categories": [
+        {
+            "id": "qualified_storage",
+            "match": ["geologic storage", "enhanced oil recovery"],
+            "reason": "Qualified geologic storage or EOR sequestration"
+        },
+        {
+            "id": "utilization",
+            "match": ["utilization"],
+            "reason": "CO2 utilization in qualified products",
+            "forecast_rate_factor": 0.6  # Utilization credits are typically lower
+        }
+    ],
+    "unqualified_sequestration_message": "Qualified sequestration method required",
+    "operation_date": {
+        "format": "%Y-%m-%d",
+        "early_before_year": 2023,
+        "early_reason": "Facility operational before 2023",
+        "latest_year": 2032,
+        "late_message": "Facility must be operational by 2032",
+        # An unparseable date is reported but does not make a facility ineligible
+        "invalid_message": "Invalid operation date format"
+    },
+    "bonuses": {
+        "domestic_content": {"minimum_percentage": 40, "bonus": 0.1},
+        "energy_community": {"bonus": 0.1, "true_strings": ["true", "yes", "1"]}
+    },
+    "ineligible_recommendations": [
+        "Review facility characteristics to meet eligibility requirements",
+        "Consider increasing CO2 capture capacity if below minimum thresholds",
+        "Ensure qualified sequestration method is used"
+    ],
+    "general_recommendations": [
+        "Consult with tax professionals for detailed guidance",
+        "Maintain detailed documentation of capture and sequestration",
+        "Consider domestic content requirements for bonus credits"
+    ],
+    "confidence_score": 0.85
+}
+
+# Lookup tables keyed by raw answer values are cleared past this many entries
+MAX_CACHED_VALUES = 10000
+
+
+@dataclass(frozen=True)
+class FacilityProfile:
+    class_id: str
+    provision: str
+    credit_rate: float
+    capture_minimums: Tuple[Tuple[float, int], ...]  # (minimum tons, requirement bit)
+    recommendation: Optional[str]
+    carbon_intensity_bonus: float
+
+
+@dataclass(frozen=True)
+class SequestrationProfile:
+    category: Optional[str]
+    reason_bits: int
+    requirement_bits: int
+    forecast_rate_factor: float
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    return value.lower() if isinstance(value, str) else str(value).lower()
+
+
+def _factorize(values: List[Any], typed: bool = False) -> Tuple[np.ndarray, List[Any]]:
+    """Integer codes per value plus the distinct values, in first-seen order.
+
+    With `typed`, values that compare equal across types (True == 1) get
+    separate codes; only needed where the rules tell them apart.
+    """
+    index: Dict[Any, int] = {}
+    try:
+        if typed:
+            codes = [index.setdefault((value.__class__, value), len(index)) for value in values]
+            uniques = [value for _, value in index]
+        else:
+            codes = [index.setdefault(value, len(index)) for value in values]
+            uniques = list(index)
+    except TypeError:
+        # Unhashable answers (lists, dicts) are rare; key them by repr
+        index, uniques, codes = {}, [], []
+        for value in values:
+            key = (value.__class__, repr(value))
+            if key not in index:
+                index[key] = len(uniques)
+                uniques.append(value)
+            codes.append(index[key])
+    return np.fromiter(codes, dtype=np.int64, count=len(codes)), uniques
+
+
+class EligibilityRules:
+    """A rule set compiled into lookup tables and bit-flag predicates.
+
+    Each requirement and reason message owns one bit; an answer set evaluates
+    to two bitmasks that are turned back into message lists in rule order.
+    """
+
+    def __init__(self, rule_set: Dict[str, Any] = RULE_SET):
+        self.rule_set = rule_set
+        self.requirement_messages: List[str] = []
+        self.reason_messages: List[str] = []
+
+        capture = rule_set["capture_minimum"]
+        self.capture_minimum = capture["minimum_tons"]
+        self._capture_bit = self._requirement(capture["message"])
+        self._capture_invalid_bit = self._requirement(capture["invalid_message"])
+
+        self.facility_classes = rule_set["facility_classes"]
+        # (minimum tons, requirement bit) per class id with its own minimum
+        self._class_minimums = {
+            facility_class["id"]: (
+                facility_class["capture_minimum"]["minimum_tons"],
+                self._requirement(facility_class["capture_minimum"]["message"])
+            )
+            for facility_class in self.facility_classes
+            if facility_class.get("capture_minimum")
+        }
+
+        self.sequestration_categories = rule_set["sequestration_categories"]
+        self._sequestration_reason_bits = {
+            category["id"]: self._reason(category["reason"]) for category in self.sequestration_categories
+        }
+        self._unqualified_sequestration_bit = self._requirement(rule_set["unqualified_sequestration_message"])
+
+        dates = rule_set["operation_date"]
+        self._early_bit = self._reason(dates["early_reason"])
+        self._late_bit = self._requirement(dates["late_message"])
+        self._invalid_date_bit = self._requirement(dates["invalid_message"])
+        self._ineligible_mask = ((1 << len(self.requirement_messages)) - 1) & ~self._invalid_date_bit
+
+        bonuses = rule_set["bonuses"]
+        self.domestic_content_minimum = bonuses["domestic_content"]["minimum_percentage"]
+        self.domestic_content_bonus = bonuses["domestic_content"]["bonus"]
+        self.energy_community_bonus = bonuses["energy_community"]["bonus"]
+        self._energy_community_strings = frozenset(bonuses["energy_community"]["true_strings"])
+
+        # Credit rate multipliers indexed by (domestic content, energy community)
+        self._multipliers = np.empty(4, dtype=np.float64)
+        for domestic in (0, 1):
+            for energy in (0, 1):
+                multiplier = 1.0
+                if domestic:
+                    multiplier += self.domestic_content_bonus
+                if energy:
+                    multiplier += self.energy_community_bonus
+                self._multipliers[domestic * 2 + energy] = multiplier
+
+        self._facility_cache: Dict[str, FacilityProfile] = {}
+        self._sequestration_cache: Dict[str, SequestrationProfile] = {}
+        self._date_cache: Dict[Any, Tuple[int, int]] = {}
+        self._message_cache: Dict[Tuple[int, int, Optional[str]], Tuple[List[str], ...]] = {}
+
+    def _requirement(self, message: str) -> int:
+        self.requirement_messages.append(message)
+        return 1 << (len(self.requirement_messages) - 1)
+
+    def _reason(self, message: str) -> int:
+        self.reason_messages.append(message)
+        return 1 << (len(self.reason_messages) - 1)
+
+    @staticmethod
+    def _cached(cache: Dict, key, build):
+        value = cache.get(key)
+        if value is None:
+            if len(cache) >= MAX_CACHED_VALUES:
+                cache.clear()
+            value = cache[key] = build(key)
+        return value
+
+    # Per-answer lookups
+
+    def facility_profile(self, facility_type: Any) -> FacilityProfile:
+        """Compiled rules for a facility type answer."""
+        return self._cached(self._facility_cache, _text(facility_type), self._build_facility_profile)
+
+    def _build_facility_profile(self, text: str) -> FacilityProfile:
+        matched = [c for c in self.facility_classes if any(keyword in text for keyword in c["match"])]
+        primary = matched[0] if matched else self.rule_set["default_facility_class"]
+        return FacilityProfile(
+            class_id=primary["id"],
+            provision=primary["provision"],
+            credit_rate=next((c["credit_rate"] for c in matched if "credit_rate" in c),
+                             self.rule_set["default_credit_rate"]),
+            capture_minimums=tuple(self._class_minimums[c["id"]] for c in matched if c["id"] in self._class_minimums),
+            recommendation=next((c["recommendation"] for c in matched if c.get("recommendation")), None),
+            carbon_intensity_bonus=next((c["carbon_intensity_bonus"] for c in matched
+                                         if "carbon_intensity_bonus" in c), 0.0)
+        )
+
+    def sequestration_profile(self, sequestration_method: Any) -> SequestrationProfile:
+        """Compiled rules for a sequestration method answer."""
+        return self._cached(self._sequestration_cache, _text(sequestration_method),
+                            self._build_sequestration_profile)
+
+    def _build_sequestration_profile(self, text: str) -> SequestrationProfile:
+        matched = [c for c in self.sequestration_categories if any(keyword in text for keyword in c["match"])]
+        if matched:
+            reason_bits, requirement_bits = self._sequestration_reason_bits[matched[0]["id"]], 0
+        else:
+            reason_bits, requirement_bits = 0, self._unqualified_sequestration_bit
+        return SequestrationProfile(
+            category=matched[0]["id"] if matched else None,
+            reason_bits=reason_bits,
+            requirement_bits=requirement_bits,
+            forecast_rate_factor=next((c["forecast_rate_factor"] for c in matched
+                                       if "forecast_rate_factor" in c), 1.0)
+        )
+
+    def _capture(self, value: Any) -> Tuple[int, Optional[float]]:
+        """Requirement bits for the general minimum and the amount for class minimums."""
+        if not value:
+            return 0, None
+        try:
+            amount = float(value)
+        except (ValueError, TypeError):
+            return self._capture_invalid_bit, None
+        bits = self._capture_bit if amount < self.capture_minimum else 0
+        # Class minimums only apply to a non-zero amount
+        return bits, amount or None
+
+    def _capture_columns(self, values: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """`_capture` over many values: requirement bits and amounts (NaN for none)."""
+        bits = np.zeros(len(values), dtype=np.int64)
+        amounts = np.full(len(values), np.nan)
+        truthy = np.fromiter(map(bool, values), dtype=bool, count=len(values))
+        try:
+            parsed = np.fromiter(values, dtype=object, count=len(values))[truthy].astype(np.float64)
+        except (ValueError, TypeError):
+            # Some value is not a number; fall back to checking them one by one
+            for i, value in enumerate(values):
+                bits[i], amount = self._capture(value)
+                if amount is not None:
+                    amounts[i] = amount
+            return bits, amounts
+
+        bits[truthy] = np.where(parsed < self.capture_minimum, self._capture_bit, 0)
+        amounts[truthy] = np.where(parsed != 0, parsed, np.nan)
+        return bits, amounts
+
+    def _operation_date(self, value: Any) -> Tuple[int, int]:
+        """(reason bits, requirement bits) for the operation date answer."""
+        if not value:
+            return 0, 0
+        try:
+            return self._cached(self._date_cache, value, self._build_operation_date)
+        except TypeError:
+            return self._build_operation_date(value)
+
+    def _build_operation_date(self, value: Any) -> Tuple[int, int]:
+        dates = self.rule_set["operation_date"]
+        try:
+            year = datetime.strptime(value, dates["format"]).year
+        except (ValueError, TypeError):
+            return 0, self._invalid_date_bit
+        if year < dates["early_before_year"]:
+            return self._early_bit, 0
+        if year > dates["latest_year"]:
+            return 0, self._late_bit
+        return 0, 0
+
+    def domestic_content_qualifies(self, value: Any) -> bool:
+        if not value:
+            return False
+        try:
+            return float(value) >= self.domestic_content_minimum
+        except (ValueError, TypeError):
+            return False
+
+    def energy_community_qualifies(self, value: Any) -> bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            return value.lower() in self._energy_community_strings
+        return False
+
+    # Single evaluation
+
+    def credit_rate(self, answers: Dict[str, Any]) -> float:
+        """Estimated $/ton credit rate including bonus multipliers."""
+        profile = self.facility_profile(answers.get("facility_type"))
+        return profile.credit_rate * self._multiplier(answers)
+
+    def _multiplier(self, answers: Dict[str, Any]) -> float:
+        return float(self._multipliers[
+            self.domestic_content_qualifies(answers.get("domestic_content")) * 2
+            + self.energy_community_qualifies(answers.get("energy_community"))
+        ])
+
+    def evaluate(self, answers: Dict[str, Any]) -> EligibilityResult:
+        """Eligibility result for one questionnaire answer set."""
+        requirement_bits, amount = self._capture(answers.get("annual_co2_captured"))
+        profile = self.facility_profile(answers.get("facility_type"))
+        if amount is not None:
+            for minimum, bit in profile.capture_minimums:
+                if amount < minimum:
+                    requirement_bits |= bit
+
+        sequestration = self.sequestration_profile(answers.get("sequestration_method"))
+        date_reasons, date_requirements = self._operation_date(answers.get("carbon_capture_operation_date"))
+        requirement_bits |= sequestration.requirement_bits | date_requirements
+        reason_bits = sequestration.reason_bits | date_reasons
+
+        return EligibilityResult(**self._result_fields(
+            requirement_bits, reason_bits, profile, profile.credit_rate * self._multiplier(answers)
+        ))
+
+    def _messages(self, requirement_bits: int, reason_bits: int,
+                  profile: FacilityProfile) -> Tuple[List[str], List[str], List[str]]:
+        """Reasons, unmet requirements and recommendations for a pair of bitmasks."""
+        key = (requirement_bits, reason_bits, profile.recommendation)
+        cached = self._message_cache.get(key)
+        if cached is None:
+            eligible = not requirement_bits & self._ineligible_mask
+            recommendations = [] if eligible else list(self.rule_set["ineligible_recommendations"])
+            recommendations += self.rule_set["general_recommendations"]
+            if profile.recommendation:
+                recommendations.append(profile.recommendation)
+            cached = (
+                [message for i, message in enumerate(self.reason_messages) if reason_bits >> i & 1],
+                [message for i, message in enumerate(self.requirement_messages) if requirement_bits >> i & 1],
+                recommendations
+            )
+            if len(self._message_cache) >= MAX_CACHED_VALUES:
+                self._message_cache.clear()
+            self._message_cache[key] = cached
+        return cached
+
+    def _result_fields(self, requirement_bits: int, reason_bits: int, profile: FacilityProfile,
+                       rate: float) -> Dict[str, Any]:
+        reasons, requirements, recommendations = self._messages(requirement_bits, reason_bits, profile)
+        return {
+            "is_eligible": not requirement_bits & self._ineligible_mask,
+            "applicable_provisions": [profile.provision],
+            "reasons": list(reasons),
+            "requirements_not_met": list(requirements),
+            "recommendations": list(recommendations),
+            "estimated_credit_rate": rate,
+            "confidence_score": self.rule_set["confidence_score"]
+        }
+
+    # Bulk evaluation
+
+    def score_many(self, rows: Sequence[Dict[str, Any]]) -> "EligibilityScores":
+        """Evaluate many answer sets column-wise.
+
+        Each distinct answer value is evaluated once; the results are then
+        gathered into per-row NumPy arrays.
+        """
+        facility_codes, facility_values = _factorize([row.get("facility_type") for row in rows])
+        profiles = [self.facility_profile(value) for value in facility_values]
+        credit_rates = np.array([profile.credit_rate for profile in profiles], dtype=np.float64)
+
+        capture_codes, capture_values = _factorize([row.get("annual_co2_captured") for row in rows])
+        capture_bits, amounts = self._capture_columns(capture_values)
+        requirement_bits = capture_bits[capture_codes]
+        amounts = amounts[capture_codes]
+
+        for minimum, bit in self._class_minimums.values():
+            applies = np.array([(minimum, bit) in p.capture_minimums for p in profiles], dtype=bool)
+            with np.errstate(invalid="ignore"):
+                below = applies[facility_codes] & (amounts < minimum)
+            requirement_bits |= np.where(below, bit, 0)
+
+        sequestration_codes, sequestration_values = _factorize([row.get("sequestration_method") for row in rows])
+        sequestrations = [self.sequestration_profile(value) for value in sequestration_values]
+        requirement_bits |= np.array([s.requirement_bits for s in sequestrations], dtype=np.int64)[sequestration_codes]
+        reason_bits = np.array([s.reason_bits for s in sequestrations], dtype=np.int64)[sequestration_codes]
+
+        date_codes, date_values = _factorize([row.get("carbon_capture_operation_date") for row in rows])
+        dates = [self._operation_date(value) for value in date_values]
+        reason_bits |= np.array([reasons for reasons, _ in dates], dtype=np.int64)[date_codes]
+        requirement_bits |= np.array([requirements for _, requirements in dates], dtype=np.int64)[date_codes]
+
+        domestic_codes, domestic_values = _factorize([row.get("domestic_content") for row in rows])
+        domestic = np.array([self.domestic_content_qualifies(v) for v in domestic_values], dtype=np.int64)
+        energy_codes, energy_values = _factorize([row.get("energy_community") for row in rows], typed=True)
+        energy = np.array([self.energy_community_qualifies(v) for v in energy_values], dtype=np.int64)
+        multipliers = self._multipliers[domestic[domestic_codes] * 2 + energy[energy_codes]]
+
+        return EligibilityScores(
+            rules=self,
+            is_eligible=(requirement_bits & self._ineligible_mask) == 0,
+            estimated_credit_rate=credit_rates[facility_codes] * multipliers,
+            requirement_bits=requirement_bits,
+            reason_bits=reason_bits,
+            facility_codes=facility_codes,
+            facility_profiles=profiles
+        )
+
+    def evaluate_many(self, rows: Sequence[Dict[str, Any]]) -> List[EligibilityResult]:
+        """Eligibility results for many answer sets, in input order."""
+        return self.score_many(rows).results()
+
+    # Forecasting
+
+    def forecast_base_rate(self, facility_type: Any, sequestration_method: Any) -> float:
+        """Base $/ton rate used for credit forecasts."""
+        return (self.facility_profile(facility_type).credit_rate
+                * self.sequestration_profile(sequestration_method).forecast_rate_factor)
+
+    def forecast_bonus_multipliers(self, domestic_content: Any, energy_community: Any,
+                                   facility_type: Any) -> Dict[str, float]:
+        """Bonus rate multipliers that apply to a forecast, by bonus type."""
+        multipliers = {}
+        if self.domestic_content_qualifies(domestic_content):
+            multipliers["domestic_content"] = self.domestic_content_bonus
+        if self.energy_community_qualifies(energy_community):
+            multipliers["energy_community"] = self.energy_community_bonus
+        carbon_intensity = self.facility_profile(facility_type).carbon_intensity_bonus
+        if carbon_intensity:
+            multipliers["carbon_intensity"] = carbon_intensity
+        return multipliers
+
+
+@dataclass
+class EligibilityScores:
+    """Column-wise results of `EligibilityRules.score_many`."""
+
+    rules: EligibilityRules
+    is_eligible: np.ndarray
+    estimated_credit_rate: np.ndarray
+    requirement_bits: np.ndarray
+    reason_bits: np.ndarray
+    facility_codes: np.ndarray
+    facility_profiles: List[FacilityProfile]
+
+    def __len__(self) -> int:
+        return len(self.is_eligible)
+
+    def result_dict(self, row: int) -> Dict[str, Any]:
+        """One row as a dict with the fields of `EligibilityResult`."""
+        profile = self.facility_profiles[self.facility_codes[row]]
+        return self.rules._result_fields(
+            int(self.requirement_bits[row]), int(self.reason_bits[row]),
+            profile, float(self.estimated_credit_rate[row])
+        )
+
+    def result_dicts(self):
+        for row in range(len(self)):
+            yield self.result_dict(row)
+
+    def results(self) -> List[EligibilityResult]:
+        return [EligibilityResult(**fields) for fields in self.result_dicts()]
+
+
+RULES = EligibilityRules()
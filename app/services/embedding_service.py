@@ -0,0 +1,144 @@
+import os
+import json
+import logging
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+class ONNXEmbeddings(Embeddings):
+    """Sentence-transformers model served through ONNX Runtime on CPU.
+
+    Reproduces the sentence-transformers pipeline (tokenize, transformer,
+    pooling, optional normalization) with `tokenizers` and `onnxruntime`, so
+    embedding a query needs neither PyTorch nor its import time.
+    """
+
+    def __init__(self, model_name: str, onnx_file: str, batch_size: int = 32):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX embedding backend requires `onnxruntime` and `tokenizers`. "
+                "Install them or set EMBEDDING_BACKEND=torch."
+            ) from e
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+        max_length = 256
+        sentence_config = self._load_json("sentence_bert_config.json")
+        if sentence_config:
+            max_length = sentence_config.get("max_seq_length", max_length)
+
+        pooling_config = self._load_json("1_Pooling/config.json") or {}
+        self.pooling = "cls" if pooling_config.get("pooling_mode_cls_token") else "mean"
+
+        modules = self._load_json("modules.json") or []
+        self.normalize = any(module.get("type", "").endswith("Normalize") for module in modules)
+
+        self.tokenizer = Tokenizer.from_file(self._resolve_file("tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        pad_token = "[PAD]" if self.tokenizer.token_to_id("[PAD]") is not None else "<pad>"
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            self._resolve_file(onnx_file),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _resolve_file(self, filename: str) -> str:
+        """Find a model file locally or in the Hugging Face cache/hub."""
+        if os.path.isdir(self.model_name):
+            return os.path.join(self.model_name, filename)
+
+        from huggingface_hub import hf_hub_download
+        return hf_hub_download(repo_id=self.model_name, filename=filename)
+
+    def _load_json(self, filename: str) -> Optional[object]:
+        try:
+            with open(self._resolve_file(filename), "r") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in length-sorted batches to keep padding small."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = []
+        for start in range(0, len(order), self.batch_size):
+            batch_texts = [texts[i] for i in order[start:start + self.batch_size]]
+            batches.append(self._embed_batch(batch_texts))
+
+        embeddings = np.empty((len(texts), batches[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(batches)
+        return embeddings
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        if self.pooling == "cls":
+            pooled = token_embeddings[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+        if self.normalize:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+
+def create_embeddings(backend: Optional[str] = None) -> Embeddings:
+    """Create the embedding model for the configured backend."""
+    backend = (backend or settings.embedding_backend).lower()
+
+    if backend == "torch":
+        # Imported here so the ONNX backends never pay for the torch import
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=settings.embedding_model,
+            model_kwargs={'device': 'cpu'}
+        )
+    elif backend == "onnx":
+        return ONNXEmbeddings(
+            settings.embedding_model,
+            settings.embedding_onnx_file,
+            batch_size=settings.embedding_batch_size
+        )
+    elif backend == "onnx-int8":
+        return ONNXEmbeddings(
+            settings.embedding_model,
+            settings.embedding_onnx_int8_file,
+            batch_size=settings.embedding_batch_size
+        )
+    else:
+        raise ValueError(f"Unsupported embedding backend: {backend}. Choose one of {', '.join(EMBEDDING_BACKENDS)}")
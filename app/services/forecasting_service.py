@@ -6,16 +6,18 @@ from app.models.forecasting import (
 )
 from app.services.rag_service import RAGService
 from app.services.llm_service import LLMService
+from app.services.eligibility_rules import RULES
 
 
 class ForecastingService:
     """Service for calculating 45Q tax credit forecasts."""
     
-    def __init__(self):
-        self.rag_service = RAGService()
-        self.llm_service = LLMService()
+    def __init__(self, rag_service: Optional[RAGService] = None, llm_service: Optional[LLMService] = None):
+        self.rag_service = rag_service or RAGService()
+        self.llm_service = llm_service or LLMService()
     
-    async def generate_forecast(self, facility_info: Dict[str, Any], forecasting_data: Dict[str, Any]) -> CreditForecast:
+    async def generate_forecast(self, facility_info: Dict[str, Any], forecasting_data: Dict[str, Any],
+                                rag_guidance: Optional[Dict[str, Any]] = None) -> CreditForecast:
         """Generate a comprehensive credit forecast."""
         
         # Extract key data
@@ -64,7 +66,7 @@ class ForecastingService:
         
         # Generate recommendations
         recommendations = await self._generate_recommendations(
-            facility_info, forecasting_data, forecast_periods
+            facility_info, forecasting_data, forecast_periods, rag_guidance
         )
         
         return CreditForecast(
@@ -83,19 +85,8 @@ class ForecastingService:
     
     def _calculate_base_credits(self, facility_info: Dict[str, Any], annual_co2: float, sequestration_method: str) -> CreditCalculation:
         """Calculate base credit rates and amounts."""
-        facility_type = facility_info.get("facility_type", "").lower()
-        capture_method = facility_info.get("capture_method", "").lower()
-        
-        # Determine base credit rate based on facility type and year
-        if "direct air capture" in facility_type:
-            base_rate = 85.0  # $85/ton for DAC
-        else:
-            base_rate = 60.0  # $60/ton for other facilities
-        
-        # Adjust for sequestration method
-        if "utilization" in sequestration_method.lower():
-            # Utilization credits are typically lower
-            base_rate *= 0.6
+        # Facility type rate, reduced for utilization (see eligibility_rules)
+        base_rate = RULES.forecast_base_rate(facility_info.get("facility_type"), sequestration_method)
         
         # Calculate annual credits
         annual_credits = annual_co2 * base_rate
@@ -112,23 +103,9 @@ class ForecastingService:
     
     def _calculate_bonus_credits(self, domestic_content: Optional[float], energy_community: bool, facility_info: Dict[str, Any]) -> Dict[str, float]:
         """Calculate bonus credit multipliers."""
-        bonus_multipliers = {}
-        
-        # Domestic content bonus
-        if domestic_content and domestic_content >= 40:
-            bonus_multipliers["domestic_content"] = 0.1  # 10% bonus
-        
-        # Energy community bonus
-        if energy_community:
-            bonus_multipliers["energy_community"] = 0.1  # 10% bonus
-        
-        # Carbon intensity bonus (simplified calculation)
-        facility_type = facility_info.get("facility_type", "").lower()
-        if "industrial" in facility_type:
-            # Industrial facilities might qualify for carbon intensity bonuses
-            bonus_multipliers["carbon_intensity"] = 0.05  # 5% bonus
-        
-        return bonus_multipliers
+        return RULES.forecast_bonus_multipliers(
+            domestic_content, energy_community, facility_info.get("facility_type")
+        )
     
     def _generate_forecast_periods(self, start_date: str, annual_co2: float, base_calc: CreditCalculation, bonus_multipliers: Dict[str, float]) -> List[ForecastPeriod]:
         """Generate forecast periods for the credit timeline."""
@@ -190,8 +167,7 @@ class ForecastingService:
             })
         
         # Carbon intensity opportunity
-        facility_type = facility_info.get("facility_type", "").lower()
-        if "industrial" in facility_type:
+        if RULES.facility_profile(facility_info.get("facility_type")).carbon_intensity_bonus:
             opportunities.append({
                 "type": "carbon_intensity",
                 "description": "Optimize carbon intensity for additional bonus",
@@ -216,12 +192,13 @@ class ForecastingService:
             "energy_community": forecasting_data.get("energy_community_eligible", False)
         }
     
-    async def _generate_recommendations(self, facility_info: Dict[str, Any], forecasting_data: Dict[str, Any], forecast_periods: List[ForecastPeriod]) -> List[str]:
+    async def _generate_recommendations(self, facility_info: Dict[str, Any], forecasting_data: Dict[str, Any], forecast_periods: List[ForecastPeriod], rag_guidance: Optional[Dict[str, Any]] = None) -> List[str]:
         """Generate recommendations for maximizing credits."""
         recommendations = []
         
-        # Get RAG-based guidance
-        rag_guidance = await self.rag_service.get_credit_calculation_guidance(facility_info)
+        # Get RAG-based guidance unless the caller already has it
+        if rag_guidance is None:
+            rag_guidance = await self.rag_service.get_credit_calculation_guidance(facility_info)
         
         # Add RAG-based recommendations
         if rag_guidance.get("answer"):
@@ -280,8 +257,11 @@ class ForecastingService:
     
     async def get_detailed_forecast_analysis(self, facility_info: Dict[str, Any], forecasting_data: Dict[str, Any]) -> Dict[str, Any]:
         """Get detailed forecast analysis with RAG guidance."""
+        # Get RAG-based analysis once and reuse it for the forecast recommendations
+        rag_analysis = await self.rag_service.get_credit_calculation_guidance(facility_info)
+
         # Generate basic forecast
-        forecast = await self.generate_forecast(facility_info, forecasting_data)
+        forecast = await self.generate_forecast(facility_info, forecasting_data, rag_guidance=rag_analysis)
         
         # Generate timeline projections
         timeline_projections = self.generate_timeline_projection(
@@ -289,9 +269,6 @@ class ForecastingService:
             initial_investment=forecasting_data.get("initial_investment", 0)
         )
         
-        # Get RAG-based analysis
-        rag_analysis = await self.rag_service.get_credit_calculation_guidance(facility_info)
-        
         return {
             "forecast": forecast,
             "timeline_projections": timeline_projections,
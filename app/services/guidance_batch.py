@@ -0,0 +1,404 @@
+"""
+Offline batch jobs for facility guidance.
+
+Guidance for hundreds of facilities is latency-insensitive, so instead of
+going through the interactive endpoints it is queued to disk and drained in
+the background. Each job lives in its own directory:
+
+    <directory>/<job_id>/job.json       job metadata and status
+    <directory>/<job_id>/items.jsonl    one queued facility per line
+    <directory>/<job_id>/results.jsonl  one line per finished item (the results store)
+    <directory>/<job_id>/lock           held by the worker process draining the job
+
+Items are answered either by a small worker pool shared by all jobs
+("workers" mode), which caps how much LLM capacity batch work takes from
+interactive traffic, or through the OpenAI Batch API ("openai_batch" mode),
+which runs them at batch pricing within 24 hours. Results are appended as
+items finish, so after a crash `resume()` re-queues only the items without
+a successful result; a submitted provider batch is polled again rather than
+resubmitted. With several worker processes sharing the directory, each job
+is drained by the one process holding its lock file; the others answer
+status requests from the files on disk.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import logging
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
+
+from langchain.schema import Document
+
+from app.config import settings
+from app.services.llm_usage import llm_usage_tags
+from app.services.rag_service import GUIDANCE_KINDS
+from app.utils.file_lock import FileLock
+from app.utils.prompts import build_prompt_messages
+
+logger = logging.getLogger(__name__)
+
+BATCH_MODES = ("workers", "openai_batch")
+FINISHED_STATUSES = ("completed", "failed")
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _read_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    if not path.exists():
+        return
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # A line cut short by a crash; its item is simply redone
+                continue
+
+
+class GuidanceBatchJob:
+    """Metadata and progress of one batch job."""
+
+    def __init__(self, directory: Path, meta: Dict[str, Any]):
+        self.directory = directory
+        self.meta = meta
+        # Held while this process drains the job
+        self.lock = FileLock(str(directory / "lock"))
+        self.succeeded: Set[int] = set()
+        self.failed: Set[int] = set()
+        # Items queued in this process and not yet finished
+        self.outstanding = 0
+        for line in _read_jsonl(directory / "results.jsonl"):
+            if line.get("status") == "succeeded":
+                self.succeeded.add(line["index"])
+                self.failed.discard(line["index"])
+            elif line["index"] not in self.succeeded:
+                self.failed.add(line["index"])
+
+    @property
+    def job_id(self) -> str:
+        return self.meta["job_id"]
+
+    @property
+    def finished(self) -> int:
+        return len(self.succeeded) + len(self.failed)
+
+    def save(self):
+        _write_json_atomic(self.directory / "job.json", self.meta)
+
+    def set_status(self, status: str, error: Optional[str] = None):
+        self.meta["status"] = status
+        if error is not None:
+            self.meta["error"] = error
+        if status in FINISHED_STATUSES:
+            self.meta["finished_at"] = datetime.now().isoformat()
+        self.save()
+        if status in FINISHED_STATUSES:
+            self.lock.release()
+
+    def items(self) -> Iterator[Dict[str, Any]]:
+        return _read_jsonl(self.directory / "items.jsonl")
+
+    def pending_items(self) -> List[Dict[str, Any]]:
+        return [item for item in self.items() if item["index"] not in self.succeeded]
+
+    def record_result(self, index: int, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        line = {"index": index, "status": "failed" if error else "succeeded", "finished_at": datetime.now().isoformat()}
+        if error:
+            line["error"] = error
+        else:
+            line["result"] = result
+        with open(self.directory / "results.jsonl", "a") as f:
+            f.write(json.dumps(line) + "\n")
+            f.flush()
+        if error:
+            self.failed.add(index)
+        else:
+            self.succeeded.add(index)
+            self.failed.discard(index)
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.meta["total"]
+        return {
+            **self.meta,
+            "succeeded": len(self.succeeded),
+            "failed": len(self.failed),
+            "progress": self.finished / total if total else 1.0
+        }
+
+
+class GuidanceBatchRunner:
+    """Queues guidance jobs to disk and drains them in the background."""
+
+    def __init__(self, rag_service: Any, directory: Optional[str] = None, concurrency: Optional[int] = None,
+                 mode: Optional[str] = None, poll_seconds: Optional[float] = None, openai_client: Any = None):
+        self.rag_service = rag_service
+        self.directory = Path(directory or settings.guidance_batch_dir)
+        self.concurrency = max(1, concurrency or settings.guidance_batch_concurrency)
+        self.mode = mode or settings.guidance_batch_mode
+        if self.mode not in BATCH_MODES:
+            raise ValueError(f"Unsupported guidance batch mode: {self.mode}. Choose one of {', '.join(BATCH_MODES)}")
+        self.poll_seconds = settings.guidance_batch_poll_seconds if poll_seconds is None else poll_seconds
+        self._openai_client = openai_client
+        self._jobs: Dict[str, GuidanceBatchJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def submit(self, facilities: Sequence[Dict[str, Any]], kinds: Sequence[str] = GUIDANCE_KINDS) -> Dict[str, Any]:
+        """Queue guidance for each facility and return the job; must be called from the event loop."""
+        for kind in kinds:
+            if kind not in GUIDANCE_KINDS:
+                raise ValueError(f"Unknown guidance kind: {kind}. Choose one of {', '.join(GUIDANCE_KINDS)}")
+        if len(facilities) > settings.guidance_batch_max_items:
+            raise ValueError(f"A guidance batch takes at most {settings.guidance_batch_max_items} facilities")
+
+        job_id = str(uuid.uuid4())
+        job_dir = self.directory / job_id
+        job_dir.mkdir(parents=True)
+        with open(job_dir / "items.jsonl", "w") as f:
+            for index, facility_info in enumerate(facilities):
+                f.write(json.dumps({"index": index, "facility_info": facility_info}) + "\n")
+        job = GuidanceBatchJob(job_dir, {
+            "job_id": job_id,
+            "status": "queued",
+            "mode": self.mode,
+            "kinds": list(kinds),
+            "total": len(facilities),
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "error": None
+        })
+        job.lock.acquire()
+        job.save()
+        self._jobs[job_id] = job
+        self._start(job)
+        return job.to_dict()
+
+    def _load(self, job_id: str) -> GuidanceBatchJob:
+        """A job drained here, or a fresh view from disk of one another worker owns."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            # Job ids become paths, so only accept ones we could have issued
+            try:
+                uuid.UUID(job_id)
+            except ValueError:
+                raise ValueError("Unknown guidance batch job")
+            meta_path = self.directory / job_id / "job.json"
+            if not meta_path.exists():
+                raise ValueError("Unknown guidance batch job")
+            # Not cached: the owning worker keeps appending results
+            with open(meta_path, "r") as f:
+                job = GuidanceBatchJob(meta_path.parent, json.load(f))
+        return job
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        return self._load(job_id).to_dict()
+
+    def iter_results(self, job_id: str) -> Iterator[str]:
+        """NDJSON lines of the job's results store, latest result per item."""
+        job = self._load(job_id)
+        latest: Dict[int, Dict[str, Any]] = {}
+        for line in _read_jsonl(job.directory / "results.jsonl"):
+            if line["index"] not in job.succeeded or line["status"] == "succeeded":
+                latest[line["index"]] = line
+        for index in sorted(latest):
+            yield json.dumps(latest[index]) + "\n"
+
+    def resume(self) -> List[str]:
+        """Restart the unfinished jobs no other worker is draining; returns their ids."""
+        resumed = []
+        if not self.directory.exists():
+            return resumed
+        for meta_path in sorted(self.directory.glob("*/job.json")):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta["status"] in FINISHED_STATUSES or meta["job_id"] in self._jobs:
+                continue
+            lock = FileLock(str(meta_path.parent / "lock"))
+            if not lock.acquire():
+                continue
+            # Re-read under the lock: the previous owner may have finished it meanwhile
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta["status"] in FINISHED_STATUSES:
+                lock.release()
+                continue
+            job = self._jobs[meta["job_id"]] = GuidanceBatchJob(meta_path.parent, meta)
+            job.lock = lock
+            logger.info(f"Resuming guidance batch {job.job_id}: {job.finished}/{meta['total']} items done")
+            self._start(job)
+            resumed.append(job.job_id)
+        return resumed
+
+    async def shutdown(self):
+        """Stop the background work; unfinished jobs resume on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        # Let another worker pick up what is left; from now on it is read from disk
+        for job_id, job in list(self._jobs.items()):
+            job.lock.release()
+            if job.meta["status"] not in FINISHED_STATUSES:
+                del self._jobs[job_id]
+
+    def _start(self, job: GuidanceBatchJob):
+        if job.meta["mode"] == "openai_batch":
+            self._tasks.append(asyncio.create_task(self._run_provider_batch(job)))
+            return
+
+        pending = job.pending_items()
+        if not pending:
+            job.set_status("completed")
+            return
+        job.outstanding = len(pending)
+        job.set_status("running")
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks.extend(asyncio.create_task(self._worker()) for _ in range(self.concurrency))
+        for item in pending:
+            self._queue.put_nowait((job, item))
+
+    async def _worker(self):
+        while True:
+            job, item = await self._queue.get()
+            try:
+                with llm_usage_tags(endpoint="/guidance-batch"):
+                    result = await self.rag_service.get_guidance(item["facility_info"], job.meta["kinds"])
+                job.record_result(item["index"], result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Guidance batch {job.job_id} item {item['index']} failed: {e}")
+                job.record_result(item["index"], error=str(e))
+            finally:
+                self._queue.task_done()
+            job.outstanding -= 1
+            if job.outstanding == 0:
+                job.set_status("completed")
+
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            from openai import AsyncOpenAI
+            self._openai_client = AsyncOpenAI(api_key=settings.openai_api_key)
+        return self._openai_client
+
+    async def _run_provider_batch(self, job: GuidanceBatchJob):
+        """Answer a job's pending items through the OpenAI Batch API."""
+        try:
+            requests_path = job.directory / "batch_requests.jsonl"
+            if not job.meta.get("provider_batch_id"):
+                pending = job.pending_items()
+                if not pending:
+                    job.set_status("completed")
+                    return
+                await self._submit_provider_batch(job, pending, requests_path)
+
+            batch = await self._wait_for_provider_batch(job)
+            if batch.status != "completed":
+                job.set_status("failed", f"OpenAI batch {batch.id} ended with status {batch.status}")
+                return
+
+            answers: Dict[str, str] = {}
+            errors: Dict[str, str] = {}
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if not file_id:
+                    continue
+                content = await self.openai_client.files.content(file_id)
+                for line in content.text.splitlines():
+                    if not line.strip():
+                        continue
+                    output = json.loads(line)
+                    response = output.get("response") or {}
+                    if response.get("status_code") == 200:
+                        answers[output["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+                    else:
+                        errors[output["custom_id"]] = json.dumps(output.get("error") or response.get("body"))
+
+            self._record_provider_results(job, requests_path, answers, errors)
+            job.meta["provider_batch_id"] = None
+            job.set_status("completed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Guidance batch {job.job_id} failed: {e}")
+            job.set_status("failed", str(e))
+
+    async def _submit_provider_batch(self, job: GuidanceBatchJob, pending: List[Dict[str, Any]], requests_path: Path):
+        # Retrieval runs locally in one batched pass; only the LLM calls go to the batch
+        prompts = [
+            (item["index"], kind, *self.rag_service.guidance_prompt(kind, item["facility_info"]))
+            for item in pending for kind in job.meta["kinds"]
+        ]
+        # Embedding every query of the job is CPU-bound; keep it off the event loop
+        retrieved = await asyncio.to_thread(self.rag_service.retrieve_many, [query for _, _, query, _ in prompts])
+        model = settings.openai_model
+        with open(requests_path, "w") as requests_file, open(job.directory / "batch_input.jsonl", "w") as input_file:
+            for (index, kind, query, instructions), docs in zip(prompts, retrieved):
+                custom_id = f"{index}:{kind}"
+                context = self.rag_service.context_from_documents(docs)
+                requests_file.write(json.dumps({
+                    "custom_id": custom_id, "query": query, "context": context,
+                    "documents": [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+                }) + "\n")
+                input_file.write(json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {"model": model, "messages": build_prompt_messages(instructions, context, query)}
+                }) + "\n")
+
+        with open(job.directory / "batch_input.jsonl", "rb") as f:
+            input_file = await self.openai_client.files.create(file=f, purpose="batch")
+        batch = await self.openai_client.batches.create(
+            input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window="24h"
+        )
+        job.meta["provider_batch_id"] = batch.id
+        job.set_status("submitted")
+        logger.info(f"Guidance batch {job.job_id} submitted as OpenAI batch {batch.id}")
+
+    async def _wait_for_provider_batch(self, job: GuidanceBatchJob):
+        while True:
+            batch = await self.openai_client.batches.retrieve(job.meta["provider_batch_id"])
+            job.meta["provider_status"] = batch.status
+            job.save()
+            if batch.status in ("completed", "failed", "expired", "cancelled"):
+                return batch
+            await asyncio.sleep(self.poll_seconds)
+
+    def _record_provider_results(self, job: GuidanceBatchJob, requests_path: Path,
+                                 answers: Dict[str, str], errors: Dict[str, str]):
+        by_index: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        for request in _read_jsonl(requests_path):
+            by_index.setdefault(int(request["custom_id"].split(":")[0]), {})[request["custom_id"]] = request
+
+        for index, requests in sorted(by_index.items()):
+            if index in job.succeeded:
+                continue
+            missing = [custom_id for custom_id in requests if custom_id not in answers]
+            if missing:
+                job.record_result(index, error="; ".join(
+                    f"{custom_id}: {errors.get(custom_id, 'no result in batch output')}" for custom_id in missing
+                ))
+                continue
+            result = {}
+            for custom_id, request in requests.items():
+                docs = [Document(**doc) for doc in request["documents"]]
+                result[custom_id.split(":", 1)[1]] = self.rag_service.package_answer(
+                    request["query"], answers[custom_id], request["context"], docs
+                )
+            job.record_result(index, result)
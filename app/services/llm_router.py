@@ -0,0 +1,228 @@
+"""
+Latency-aware routing across several LLM providers.
+
+`LLMRouter` implements `BaseLLMService` on top of one service per provider.
+It keeps an exponentially weighted moving average (EWMA) of each provider's
+latency and error rate and sends every call to the fastest healthy provider,
+failing over to the next one when a call errors. With hedging on, a call
+that is still running after the provider's recent p95 latency is raced
+against the next provider; the first success wins and the other is
+cancelled.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.llm_service import BaseLLMService
+
+logger = logging.getLogger(__name__)
+
+# Recent successful latencies kept per provider for the hedge delay
+LATENCY_SAMPLES = 100
+MIN_HEDGE_SAMPLES = 20
+
+
+class LLMRoutingError(RuntimeError):
+    """Raised when every provider failed a call."""
+
+
+class ProviderStats:
+    """Latency and error-rate EWMAs for one provider."""
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.latency_ewma: Optional[float] = None
+        self.error_rate_ewma = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.hedges_won = 0
+        self.last_failure: Optional[float] = None
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def record_success(self, seconds: float):
+        self.calls += 1
+        self.latencies.append(seconds)
+        if self.latency_ewma is None:
+            self.latency_ewma = seconds
+        else:
+            self.latency_ewma += self.alpha * (seconds - self.latency_ewma)
+        self.error_rate_ewma *= 1 - self.alpha
+
+    def record_failure(self):
+        self.calls += 1
+        self.failures += 1
+        self.last_failure = time.monotonic()
+        self.error_rate_ewma += self.alpha * (1 - self.error_rate_ewma)
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "latency_ewma_ms": self.latency_ewma * 1000 if self.latency_ewma is not None else None,
+            "p95_ms": p95 * 1000 if p95 is not None else None,
+            "error_rate_ewma": self.error_rate_ewma,
+            "calls": self.calls,
+            "failures": self.failures,
+            "hedges_won": self.hedges_won
+        }
+
+
+class LLMRouter(BaseLLMService):
+    """Routes each call to the fastest healthy provider, with failover and optional hedging."""
+
+    def __init__(self, providers: Dict[str, BaseLLMService], hedge: Optional[bool] = None,
+                 alpha: Optional[float] = None, unhealthy_error_rate: Optional[float] = None,
+                 cooldown_seconds: Optional[float] = None, default_hedge_delay: Optional[float] = None):
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.providers = dict(providers)
+        self.hedge = settings.llm_hedge_requests if hedge is None else hedge
+        self.unhealthy_error_rate = (settings.llm_unhealthy_error_rate
+                                     if unhealthy_error_rate is None else unhealthy_error_rate)
+        self.cooldown_seconds = settings.llm_unhealthy_cooldown_seconds if cooldown_seconds is None else cooldown_seconds
+        self.default_hedge_delay = (settings.llm_hedge_default_delay_ms / 1000
+                                    if default_hedge_delay is None else default_hedge_delay)
+        alpha = settings.llm_ewma_alpha if alpha is None else alpha
+        self.stats = {name: ProviderStats(alpha) for name in self.providers}
+
+    def _healthy(self, name: str, now: float) -> bool:
+        stats = self.stats[name]
+        if stats.error_rate_ewma < self.unhealthy_error_rate:
+            return True
+        # Probe an unhealthy provider again once it has been quiet for a while
+        return stats.last_failure is None or now - stats.last_failure >= self.cooldown_seconds
+
+    def ranked_providers(self) -> List[str]:
+        """Providers in the order a call would try them."""
+        now = time.monotonic()
+
+        def latency(name: str) -> float:
+            # Providers without samples go first so each gets measured
+            ewma = self.stats[name].latency_ewma
+            return ewma if ewma is not None else 0.0
+
+        healthy = sorted((name for name in self.providers if self._healthy(name, now)), key=latency)
+        unhealthy = sorted((name for name in self.providers if name not in healthy),
+                           key=lambda name: self.stats[name].error_rate_ewma)
+        return healthy + unhealthy
+
+    def hedge_delay(self, name: str) -> float:
+        p95 = self.stats[name].p95()
+        return p95 if p95 is not None else self.default_hedge_delay
+
+    async def _timed(self, name: str, method: str, *args) -> Any:
+        start = time.perf_counter()
+        try:
+            result = await getattr(self.providers[name], method)(*args)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.stats[name].record_failure()
+            raise
+        self.stats[name].record_success(time.perf_counter() - start)
+        return result
+
+    async def _route(self, method: str, *args) -> Any:
+        return (await self._route_named(method, *args))[1]
+
+    async def _route_named(self, method: str, *args) -> Tuple[str, Any]:
+        """The result of the first provider to succeed, with its name."""
+        order = self.ranked_providers()
+        pending: Dict[asyncio.Task, str] = {}
+        errors = []
+        next_provider = 0
+
+        def launch():
+            nonlocal next_provider
+            name = order[next_provider]
+            next_provider += 1
+            pending[asyncio.ensure_future(self._timed(name, method, *args))] = name
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and len(pending) == 1 and next_provider < len(order):
+                    timeout = self.hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # The call is slower than usual for this provider; race the next one
+                    launch()
+                    continue
+
+                winner = None
+                for task in done:
+                    name = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        winner = winner or (name, task)
+                        continue
+                    errors.append(f"{name}: {error}")
+                    logger.warning(f"LLM provider {name} failed {method}: {error}")
+                if winner is not None:
+                    name, task = winner
+                    if pending and name != order[0]:
+                        self.stats[name].hedges_won += 1
+                    return name, task.result()
+
+                if not pending and next_provider < len(order):
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise LLMRoutingError(f"All LLM providers failed: {'; '.join(errors)}")
+
+    async def generate_response(self, prompt: str, context: Optional[str] = None) -> str:
+        return await self._route("generate_response", prompt, context)
+
+    async def generate_structured_response(self, prompt: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._route("generate_structured_response", prompt, schema)
+
+    async def chat_completion(self, messages: List[Dict[str, str]]) -> str:
+        return await self._route("chat_completion", messages)
+
+    async def chat_completion_with_model(self, messages: List[Dict[str, str]]) -> Tuple[str, str]:
+        name, answer = await self._route_named("chat_completion", messages)
+        return answer, self.providers[name].model_id
+
+    def model_ids(self) -> List[str]:
+        return [model_id for name in self.ranked_providers() for model_id in self.providers[name].model_ids()]
+
+    async def stream_response(self, prompt: str, context: Optional[str] = None) -> AsyncIterator[str]:
+        # Streams are not hedged; a provider can only be failed over before its first chunk
+        errors = []
+        for name in self.ranked_providers():
+            start = time.perf_counter()
+            started = False
+            try:
+                async for chunk in self.providers[name].stream_response(prompt, context):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self.stats[name].record_failure()
+                if started:
+                    raise
+                errors.append(f"{name}: {e}")
+                continue
+            self.stats[name].record_success(time.perf_counter() - start)
+            return
+        raise LLMRoutingError(f"All LLM providers failed: {'; '.join(errors)}")
+
+    def provider_stats(self) -> Dict[str, Any]:
+        """Per-provider routing statistics, in routing order."""
+        return {
+            "order": self.ranked_providers(),
+            "hedging": self.hedge,
+            "providers": {name: self.stats[name].to_dict() for name in self.providers}
+        }
@@ -1,13 +1,43 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 import json
+import random
+import asyncio
+import hashlib
+import logging
+import time
+import openai
 from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
-from app.config import get_llm_config
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+from app.config import LOCAL_LLM_MODEL, settings, get_llm_config, configured_providers
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.llm_usage import extract_token_usage, llm_usage
+from app.utils.structured_output import (
+    Schema, StructuredOutputError, schema_example, schema_prompt_example, structured_output_metrics,
+    validate_structured
+)
+
+logger = logging.getLogger(__name__)
+
+# Sampling temperature for every OpenAI request made through the service
+DEFAULT_TEMPERATURE = 0.1
 
 
 class BaseLLMService(ABC):
     """Abstract base class for LLM services."""
+
+    # Recorded with each call's token usage
+    provider: str = "unknown"
+    model: str = "unknown"
+
+    @property
+    def model_id(self) -> str:
+        """"provider:model", e.g. for keying cached completions."""
+        return f"{self.provider}:{self.model}"
+
+    def model_ids(self) -> List[str]:
+        """Every model a call may be answered by, in the order they are tried."""
+        return [self.model_id]
     
     @abstractmethod
     async def generate_response(self, prompt: str, context: Optional[str] = None) -> str:
@@ -24,16 +54,42 @@ class BaseLLMService(ABC):
         """Generate a chat completion response."""
         pass
 
+    async def chat_completion_with_model(self, messages: List[Dict[str, str]]) -> Tuple[str, str]:
+        """A chat completion and the model_id of the model that produced it."""
+        return await self.chat_completion(messages), self.model_id
 
-class OpenAILLMService(BaseLLMService):
-    """OpenAI LLM service implementation."""
-    
-    def __init__(self, api_key: str, model: str):
-        self.llm = ChatOpenAI(
-            openai_api_key=api_key,
-            model_name=model,
-            temperature=0.1
-        )
+    async def stream_response(self, prompt: str, context: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream a response in chunks; by default the whole response is one chunk."""
+        yield await self.generate_response(prompt, context)
+
+
+class ChatModelLLMService(BaseLLMService):
+    """LLM service backed by a LangChain chat model in `self.llm`."""
+
+    llm: Any
+    # Same model constrained to emit JSON, when the provider has such a mode
+    json_llm: Any = None
+
+    def _model(self, json_mode: bool = False) -> Any:
+        return self.json_llm if json_mode and self.json_llm is not None else self.llm
+
+    async def _invoke(self, messages: List[Any], json_mode: bool = False) -> Any:
+        """Run one model call; subclasses add deadlines and retries here."""
+        return await self._model(json_mode).agenerate(messages)
+
+    async def _agenerate(self, messages: List[Any], json_mode: bool = False) -> Any:
+        start = time.perf_counter()
+        try:
+            response = await self._invoke(messages, json_mode)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            llm_usage.record(self.provider, self.model, 0, 0, time.perf_counter() - start, error=True)
+            raise
+        prompt_tokens, completion_tokens, cached_tokens = extract_token_usage(response)
+        llm_usage.record(self.provider, self.model, prompt_tokens, completion_tokens, time.perf_counter() - start,
+                         cached_prompt_tokens=cached_tokens)
+        return response
     
     async def generate_response(self, prompt: str, context: Optional[str] = None) -> str:
         if context:
@@ -41,47 +97,330 @@ class OpenAILLMService(BaseLLMService):
         else:
             full_prompt = prompt
         
-        # Use HumanMessage for ChatOpenAI
-        from langchain.schema import HumanMessage
-        response = await self.llm.agenerate([[HumanMessage(content=full_prompt)]])
+        response = await self._agenerate([[HumanMessage(content=full_prompt)]])
         return response.generations[0][0].text
     
-    async def generate_structured_response(self, prompt: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_structured_response(self, prompt: str, schema: Schema) -> Dict[str, Any]:
+        """Generate JSON matching `schema` (an example dict or a pydantic model).
+
+        Uses the provider's JSON mode when available. A response that does
+        not parse or validate is sent back with the error (up to
+        LLM_STRUCTURED_RETRIES times) so the model can correct it, instead
+        of the caller repeating the whole request.
+        """
         structured_prompt = f"""
         Please provide a response in the following JSON format:
-        {json.dumps(schema, indent=2)}
+        {json.dumps(schema_prompt_example(schema), indent=2)}
         
         Question: {prompt}
         
         Response (JSON only):
         """
         
-        response = await self.llm.agenerate([[structured_prompt]])
-        response_text = response.generations[0][0].text.strip()
-        
-        try:
-            # Extract JSON from response
-            if response_text.startswith("```json"):
-                response_text = response_text[7:-3]
-            elif response_text.startswith("```"):
-                response_text = response_text[3:-3]
-            
-            return json.loads(response_text)
-        except json.JSONDecodeError:
-            raise ValueError(f"Failed to parse structured response: {response_text}")
+        messages = [HumanMessage(content=structured_prompt)]
+        json_mode = self.json_llm is not None
+        for attempt in range(settings.llm_structured_retries + 1):
+            response = await self._agenerate([messages], json_mode=json_mode)
+            response_text = response.generations[0][0].text
+            structured_output_metrics.record_response(json_mode)
+            try:
+                return validate_structured(response_text, schema)
+            except StructuredOutputError as e:
+                retrying = attempt < settings.llm_structured_retries
+                structured_output_metrics.record_error(e, retrying)
+                if not retrying:
+                    raise
+                messages = messages + [
+                    AIMessage(content=response_text),
+                    HumanMessage(content=f"{e}. Reply with the corrected JSON only.")
+                ]
     
+    def _system_message(self, content: str) -> SystemMessage:
+        return SystemMessage(content=content)
+
     async def chat_completion(self, messages: List[Dict[str, str]]) -> str:
         langchain_messages = []
         for msg in messages:
             if msg["role"] == "system":
-                langchain_messages.append(SystemMessage(content=msg["content"]))
+                langchain_messages.append(self._system_message(msg["content"]))
+            elif msg["role"] == "assistant":
+                langchain_messages.append(AIMessage(content=msg["content"]))
             else:
                 langchain_messages.append(HumanMessage(content=msg["content"]))
         
-        response = await self.llm.agenerate([langchain_messages])
+        response = await self._agenerate([langchain_messages])
         return response.generations[0][0].text
 
 
+# Errors worth another attempt; anything else (bad request, auth, ...) fails at once
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+# OpenAI models that accept response_format={"type": "json_object"}
+JSON_MODE_MODEL_PREFIXES = ("gpt-4o", "gpt-4-turbo", "gpt-4-1106", "gpt-4-0125", "gpt-4.1", "gpt-5",
+                            "gpt-3.5-turbo", "o1", "o3", "o4")
+
+
+def supports_json_mode(model: str) -> bool:
+    """Whether structured responses from `model` use OpenAI's JSON mode."""
+    if settings.llm_json_mode != "auto":
+        return settings.llm_json_mode == "on"
+    return model.startswith(JSON_MODE_MODEL_PREFIXES) and model not in ("gpt-3.5-turbo-0613", "gpt-3.5-turbo-16k")
+
+
+class OpenAILLMService(ChatModelLLMService):
+    """OpenAI LLM service implementation.
+
+    Every call has a deadline covering all of its attempts. Retryable errors
+    are retried with jittered exponential backoff while the deadline allows,
+    and a circuit breaker fails calls fast while OpenAI keeps failing.
+    """
+    
+    def __init__(self, api_key: str, model: str, timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, backoff_seconds: Optional[float] = None,
+                 max_backoff_seconds: Optional[float] = None, circuit_breaker: Optional[CircuitBreaker] = None):
+        self.provider, self.model = "openai", model
+        self.timeout = settings.llm_request_timeout_seconds if timeout is None else timeout
+        self.max_retries = settings.llm_max_retries if max_retries is None else max_retries
+        self.backoff_seconds = settings.llm_retry_backoff_seconds if backoff_seconds is None else backoff_seconds
+        self.max_backoff_seconds = (settings.llm_retry_max_backoff_seconds
+                                    if max_backoff_seconds is None else max_backoff_seconds)
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            "openai",
+            failure_threshold=settings.llm_circuit_failure_threshold,
+            reset_seconds=settings.llm_circuit_reset_seconds
+        )
+        self.llm = ChatOpenAI(
+            openai_api_key=api_key,
+            model_name=model,
+            temperature=DEFAULT_TEMPERATURE,
+            # Retries and deadlines are handled in _invoke
+            request_timeout=self.timeout,
+            max_retries=0
+        )
+        if supports_json_mode(model):
+            self.json_llm = ChatOpenAI(
+                openai_api_key=api_key,
+                model_name=model,
+                temperature=DEFAULT_TEMPERATURE,
+                request_timeout=self.timeout,
+                max_retries=0,
+                model_kwargs={"response_format": {"type": "json_object"}}
+            )
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_seconds * (2 ** attempt), self.max_backoff_seconds)
+        return delay * random.uniform(0.5, 1.5)
+
+    async def _invoke(self, messages: List[Any], json_mode: bool = False) -> Any:
+        self.circuit_breaker.before_call()
+        try:
+            response = await self._invoke_with_retries(messages, json_mode)
+        except asyncio.CancelledError:
+            self.circuit_breaker.record_abandoned()
+            raise
+        except RETRYABLE_ERRORS:
+            # One failure per call, once its retries are used up
+            self.circuit_breaker.record_failure()
+            raise
+        except Exception:
+            # The provider answered; a bad request says nothing about its health either way
+            self.circuit_breaker.record_abandoned()
+            raise
+        self.circuit_breaker.record_success()
+        return response
+
+    async def _invoke_with_retries(self, messages: List[Any], json_mode: bool) -> Any:
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                return await asyncio.wait_for(self._model(json_mode).agenerate(messages), remaining)
+            except RETRYABLE_ERRORS as e:
+                delay = self._backoff(attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise asyncio.TimeoutError(f"OpenAI call exceeded its {self.timeout:.0f}s deadline") from e
+                    raise
+                attempt += 1
+                logger.warning(f"OpenAI call failed ({type(e).__name__}); retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+
+class AnthropicLLMService(ChatModelLLMService):
+    """Anthropic LLM service implementation (requires `langchain-anthropic`)."""
+
+    def __init__(self, api_key: str, model: str):
+        try:
+            from langchain_anthropic import ChatAnthropic
+        except ImportError as e:
+            raise ImportError(
+                "The Anthropic provider requires `langchain-anthropic`. "
+                "Install it or remove anthropic from LLM_PROVIDERS."
+            ) from e
+        self.provider, self.model = "anthropic", model
+        self.llm = ChatAnthropic(api_key=api_key, model=model, temperature=DEFAULT_TEMPERATURE)
+
+    def _system_message(self, content: str) -> SystemMessage:
+        # Anthropic only caches prompt prefixes marked with a cache breakpoint
+        return SystemMessage(content=[{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}])
+
+
+class GoogleLLMService(ChatModelLLMService):
+    """Google Gemini LLM service implementation (requires `langchain-google-genai`)."""
+
+    def __init__(self, api_key: str, model: str):
+        try:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+        except ImportError as e:
+            raise ImportError(
+                "The Google provider requires `langchain-google-genai`. "
+                "Install it or remove google from LLM_PROVIDERS."
+            ) from e
+        self.provider, self.model = "google", model
+        self.llm = ChatGoogleGenerativeAI(google_api_key=api_key, model=model, temperature=DEFAULT_TEMPERATURE)
+
+
+class LocalLLMError(RuntimeError):
+    """A failure injected by the local stand-in provider."""
+
+
+class LocalLLMService(BaseLLMService):
+    """Deterministic offline stand-in for a hosted model.
+
+    The text of a response depends only on the prompt, so repeated runs see
+    the same output. Canned responses are picked by prompt substring; any
+    other prompt gets a template response built from its own words. Latency
+    (time to first token plus tokens per second) and failures are drawn from
+    a seeded generator, so a load test against the whole app needs no
+    network, API key or billing.
+    """
+
+    LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+    provider, model = "local", LOCAL_LLM_MODEL
+
+    def __init__(self, latency_distribution: str = "lognormal", latency_ms: float = 800.0,
+                 latency_spread: float = 0.5, tokens_per_second: float = 0.0, response_tokens: int = 200,
+                 error_rate: float = 0.0, seed: int = 0, canned_responses: Optional[Dict[str, str]] = None):
+        if latency_distribution not in self.LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unsupported latency distribution: {latency_distribution}. "
+                             f"Choose one of {', '.join(self.LATENCY_DISTRIBUTIONS)}")
+        self.latency_distribution = latency_distribution
+        self.latency_ms = latency_ms
+        self.latency_spread = latency_spread
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.canned_responses = canned_responses or {}
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_settings(cls) -> "LocalLLMService":
+        canned_responses = None
+        if settings.local_llm_responses_path:
+            with open(settings.local_llm_responses_path, "r") as f:
+                canned_responses = json.load(f)
+        return cls(
+            latency_distribution=settings.local_llm_latency_distribution,
+            latency_ms=settings.local_llm_latency_ms,
+            latency_spread=settings.local_llm_latency_spread,
+            tokens_per_second=settings.local_llm_tokens_per_second,
+            response_tokens=settings.local_llm_response_tokens,
+            error_rate=settings.local_llm_error_rate,
+            seed=settings.local_llm_seed,
+            canned_responses=canned_responses
+        )
+
+    def _first_token_seconds(self) -> float:
+        if self.latency_distribution == "fixed":
+            latency = self.latency_ms
+        elif self.latency_distribution == "uniform":
+            latency = self.latency_ms * self._rng.uniform(1 - self.latency_spread, 1 + self.latency_spread)
+        else:
+            # latency_ms is the median; latency_spread is sigma of the underlying normal
+            latency = self.latency_ms * self._rng.lognormvariate(0.0, self.latency_spread)
+        return max(latency, 0.0) / 1000
+
+    def _maybe_fail(self):
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise LocalLLMError("Injected local LLM failure")
+
+    def _response_tokens(self, prompt: str) -> List[str]:
+        for marker, response in self.canned_responses.items():
+            if marker in prompt:
+                return response.split(" ")
+
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        words = prompt.split() or ["45Q"]
+        rng = random.Random(digest)
+        first_line = next((line.strip() for line in prompt.splitlines() if line.strip()), "")
+        header = f"[local:{digest[:8]}] Response to: {first_line[:80]}".split(" ")
+        return header + [rng.choice(words) for _ in range(max(self.response_tokens - len(header), 0))]
+
+    async def _tokens(self, prompt: str) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        # Whitespace-separated words stand in for tokens in the usage records
+        prompt_tokens = len(prompt.split())
+        await asyncio.sleep(self._first_token_seconds())
+        try:
+            self._maybe_fail()
+        except LocalLLMError:
+            llm_usage.record(self.provider, self.model, prompt_tokens, 0, time.perf_counter() - start, error=True)
+            raise
+        tokens = self._response_tokens(prompt)
+        for i, token in enumerate(tokens):
+            if self.tokens_per_second and i:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield token if i == len(tokens) - 1 else token + " "
+        llm_usage.record(self.provider, self.model, prompt_tokens, len(tokens), time.perf_counter() - start)
+
+    @staticmethod
+    def _full_prompt(prompt: str, context: Optional[str]) -> str:
+        return f"Context: {context}\n\nQuestion: {prompt}" if context else prompt
+
+    async def generate_response(self, prompt: str, context: Optional[str] = None) -> str:
+        return "".join([token async for token in self._tokens(self._full_prompt(prompt, context))])
+
+    async def stream_response(self, prompt: str, context: Optional[str] = None) -> AsyncIterator[str]:
+        async for token in self._tokens(self._full_prompt(prompt, context)):
+            yield token
+
+    async def generate_structured_response(self, prompt: str, schema: Schema) -> Dict[str, Any]:
+        # Answer with an example of the expected JSON, checked like a real model's response
+        await asyncio.sleep(self._first_token_seconds())
+        self._maybe_fail()
+        response_text = json.dumps(schema_example(schema))
+        structured_output_metrics.record_response(native_json_mode=False)
+        try:
+            return validate_structured(response_text, schema)
+        except StructuredOutputError as e:
+            structured_output_metrics.record_error(e, retrying=False)
+            raise
+
+    async def chat_completion(self, messages: List[Dict[str, str]]) -> str:
+        prompt = "\n\n".join(message["content"] for message in messages)
+        return "".join([token async for token in self._tokens(prompt)])
+
+
+def create_llm_service(provider: str) -> BaseLLMService:
+    """Build the LLM service for one configured provider."""
+    config = get_llm_config(provider)
+    if config["provider"] == "openai":
+        return OpenAILLMService(config["api_key"], config["model"])
+    if config["provider"] == "anthropic":
+        return AnthropicLLMService(config["api_key"], config["model"])
+    if config["provider"] == "google":
+        return GoogleLLMService(config["api_key"], config["model"])
+    return LocalLLMService.from_settings()
+
+
 class LLMService:
     """Model-agnostic LLM service factory."""
     
@@ -90,31 +429,60 @@ class LLMService:
         self._initialize_service()
     
     def _initialize_service(self):
-        """Initialize the appropriate LLM service based on configuration."""
-        config = get_llm_config()
-        provider = config["provider"]
-        
-        if provider == "openai":
-            self._service = OpenAILLMService(config["api_key"], config["model"])
+        """Initialize the appropriate LLM service based on configuration.
+
+        With several LLM_PROVIDERS, calls go through a router that picks the
+        fastest healthy provider and fails over (or hedges) to the others.
+        """
+        providers = configured_providers()
+        if len(providers) == 1:
+            self._service = create_llm_service(providers[0])
         else:
-            raise ValueError(f"Only OpenAI is supported for now. Configured provider: {provider}")
+            from app.services.llm_router import LLMRouter
+            self._service = LLMRouter({provider: create_llm_service(provider) for provider in providers})
     
     async def generate_response(self, prompt: str, context: Optional[str] = None) -> str:
         """Generate a response from the configured LLM."""
         return await self._service.generate_response(prompt, context)
     
-    async def generate_structured_response(self, prompt: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_structured_response(self, prompt: str, schema: Schema) -> Dict[str, Any]:
         """Generate a structured response following a specific schema."""
         return await self._service.generate_structured_response(prompt, schema)
     
     async def chat_completion(self, messages: List[Dict[str, str]]) -> str:
         """Generate a chat completion response."""
         return await self._service.chat_completion(messages)
+
+    async def chat_completion_with_model(self, messages: List[Dict[str, str]]) -> Tuple[str, str]:
+        """A chat completion and the "provider:model" that answered it, which routing decides per call."""
+        return await self._service.chat_completion_with_model(messages)
+
+    def model_ids(self) -> List[str]:
+        """Every "provider:model" a call may be answered by; cache lookups try each."""
+        return self._service.model_ids()
+
+    async def stream_response(self, prompt: str, context: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream a response from the configured LLM in chunks."""
+        async for chunk in self._service.stream_response(prompt, context):
+            yield chunk
     
-    def get_provider_info(self) -> Dict[str, str]:
+    def get_provider_info(self) -> Dict[str, Any]:
         """Get information about the current LLM provider."""
-        config = get_llm_config()
-        return {
+        config = get_llm_config(configured_providers()[0])
+        info = {
             "provider": config["provider"],
             "model": config["model"]
+        }
+        if hasattr(self._service, "provider_stats"):
+            info["routing"] = self._service.provider_stats()
+        info["structured_output"] = structured_output_metrics.to_dict()
+        return info
+
+    def get_circuit_breakers(self) -> Dict[str, Dict[str, Any]]:
+        """Circuit breaker state of each provider that has one."""
+        services = getattr(self._service, "providers", None) or {configured_providers()[0]: self._service}
+        return {
+            name: service.circuit_breaker.to_dict()
+            for name, service in services.items()
+            if getattr(service, "circuit_breaker", None) is not None
         } 
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+Token, latency and cost accounting for LLM calls.
+
+Every provider call records an `LLMCall` in the process-wide `llm_usage`
+tracker, tagged with the endpoint and session it was made for. The tags
+come from a context variable, so services deep below an endpoint (RAG,
+forecasting) need no extra arguments: `LLMUsageRoute` tags each request
+with its route (reusing the match the router already made), and endpoints that know a session id add it with
+`llm_usage_tags(session_id=...)`. Prompt tokens the provider served from
+its prompt cache are recorded separately and billed at the cached rate.
+Calls are kept for a rolling window and aggregated per endpoint, provider
+and session on read.
+"""
+
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.config import settings
+
+# USD per million (prompt, completion) tokens; the longest matching model prefix wins
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "claude-3-opus": (15.00, 75.00),
+    "claude-3-sonnet": (3.00, 15.00),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-haiku": (0.25, 1.25),
+    "gemini-pro": (0.50, 1.50),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+}
+
+# Share of the prompt price charged for prompt tokens served from the provider's cache
+CACHED_PROMPT_PRICE_FACTORS: Dict[str, float] = {"gpt": 0.5, "o1": 0.5, "o3": 0.5, "claude": 0.1, "gemini": 0.25}
+
+_tags: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("llm_usage_tags", default={})
+
+
+@contextmanager
+def llm_usage_tags(**tags: Optional[str]) -> Iterator[None]:
+    """Tag the LLM calls made inside the block, e.g. with an endpoint or session id."""
+    merged = dict(_tags.get())
+    merged.update({key: value for key, value in tags.items() if value is not None})
+    token = _tags.set(merged)
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+class LLMUsageRoute(APIRoute):
+    """Route that tags the LLM calls of its endpoint with the route path and any session_id path parameter."""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        path = self.path
+
+        async def tagged_handler(request: Request) -> Response:
+            with llm_usage_tags(endpoint=path, session_id=request.path_params.get("session_id")):
+                return await handler(request)
+
+        return tagged_handler
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_prompt_tokens: int = 0) -> float:
+    matches = [prefix for prefix in MODEL_PRICES if model.startswith(prefix)]
+    if not matches:
+        return 0.0
+    prompt_price, completion_price = MODEL_PRICES[max(matches, key=len)]
+    cached_factor = next((factor for prefix, factor in CACHED_PROMPT_PRICE_FACTORS.items()
+                          if model.startswith(prefix)), 1.0)
+    # cached_prompt_tokens are part of prompt_tokens, billed at the discounted rate
+    prompt_cost = (prompt_tokens - cached_prompt_tokens + cached_prompt_tokens * cached_factor) * prompt_price
+    return (prompt_cost + completion_tokens * completion_price) / 1_000_000
+
+
+def extract_token_usage(response: Any) -> Tuple[int, int, int]:
+    """(prompt, completion, cached prompt) tokens reported in a LangChain LLMResult, or zeros."""
+    prompt_tokens = completion_tokens = cached_tokens = 0
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+                cached_tokens += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+    if prompt_tokens or completion_tokens:
+        return prompt_tokens, completion_tokens, cached_tokens
+
+    token_usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+    cached_tokens = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0) or 0
+    return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0), cached_tokens
+
+
+@dataclass
+class LLMCall:
+    timestamp: float
+    endpoint: str
+    session_id: Optional[str]
+    provider: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cached_prompt_tokens: int
+    latency: float
+    cost: float
+    error: bool
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_prompt_tokens": 0,
+            "max_prompt_tokens": 0, "cost_usd": 0.0, "latency_seconds": 0.0}
+
+
+def _add(totals: Dict[str, Any], call: LLMCall):
+    totals["calls"] += 1
+    totals["errors"] += int(call.error)
+    totals["prompt_tokens"] += call.prompt_tokens
+    totals["completion_tokens"] += call.completion_tokens
+    totals["cached_prompt_tokens"] += call.cached_prompt_tokens
+    totals["max_prompt_tokens"] = max(totals["max_prompt_tokens"], call.prompt_tokens)
+    totals["cost_usd"] += call.cost
+    totals["latency_seconds"] += call.latency
+
+
+def _finish(totals: Dict[str, Any]) -> Dict[str, Any]:
+    calls = totals["calls"]
+    latency = totals.pop("latency_seconds")
+    totals["total_tokens"] = totals["prompt_tokens"] + totals["completion_tokens"]
+    totals["avg_prompt_tokens"] = totals["prompt_tokens"] / calls if calls else 0.0
+    totals["prompt_cache_hit_rate"] = (totals["cached_prompt_tokens"] / totals["prompt_tokens"]
+                                       if totals["prompt_tokens"] else 0.0)
+    totals["avg_latency_ms"] = latency * 1000 / calls if calls else 0.0
+    totals["cost_usd"] = round(totals["cost_usd"], 6)
+    return totals
+
+
+class LLMUsageTracker:
+    """Rolling window of LLM calls with per-endpoint, provider and session totals."""
+
+    def __init__(self, window_seconds: float = 3600.0, max_calls: int = 100_000):
+        self.window_seconds = window_seconds
+        self._calls: Deque[LLMCall] = deque(maxlen=max_calls)
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._calls and self._calls[0].timestamp < cutoff:
+            self._calls.popleft()
+
+    def record(self, provider: str, model: str, prompt_tokens: int, completion_tokens: int,
+               latency: float, error: bool = False, cached_prompt_tokens: int = 0):
+        tags = _tags.get()
+        call = LLMCall(
+            timestamp=time.time(),
+            endpoint=tags.get("endpoint", "unknown"),
+            session_id=tags.get("session_id"),
+            provider=provider,
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_prompt_tokens=cached_prompt_tokens,
+            latency=latency,
+            cost=estimate_cost(model, prompt_tokens, completion_tokens, cached_prompt_tokens),
+            error=error
+        )
+        with self._lock:
+            self._calls.append(call)
+            self._prune(call.timestamp)
+
+    def summary(self, window_seconds: Optional[float] = None, top_sessions: int = 20) -> Dict[str, Any]:
+        """Totals over the last `window_seconds` (at most the tracker's window).
+
+        Groups are ranked by cost, then prompt tokens; sessions are cut to
+        `top_sessions`.
+        """
+        window = min(window_seconds or self.window_seconds, self.window_seconds)
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            calls = [call for call in self._calls if call.timestamp >= now - window]
+
+        total = _empty_totals()
+        groups: Dict[str, Dict[str, Dict[str, Any]]] = {"endpoints": {}, "providers": {}, "sessions": {}}
+        for call in calls:
+            _add(total, call)
+            _add(groups["endpoints"].setdefault(call.endpoint, _empty_totals()), call)
+            _add(groups["providers"].setdefault(f"{call.provider}:{call.model}", _empty_totals()), call)
+            if call.session_id:
+                _add(groups["sessions"].setdefault(call.session_id, _empty_totals()), call)
+
+        def ranked(group: Dict[str, Dict[str, Any]], limit: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+            keys = sorted(group, key=lambda key: (group[key]["cost_usd"], group[key]["prompt_tokens"]),
+                          reverse=True)[:limit]
+            return {key: _finish(group[key]) for key in keys}
+
+        return {
+            "window_seconds": window,
+            "total": _finish(total),
+            "endpoints": ranked(groups["endpoints"]),
+            "providers": ranked(groups["providers"]),
+            "sessions": ranked(groups["sessions"], top_sessions)
+        }
+
+
+llm_usage = LLMUsageTracker(settings.llm_usage_window_seconds)
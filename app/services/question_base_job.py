@@ -0,0 +1,300 @@
+"""
+Background regeneration of the question base and assessment prompt.
+
+`QuestionBaseRegenerator` runs generate_question_base.py as an asyncio
+subprocess, so its LLM calls never block the event loop. The script writes
+into a staging directory next to the live files; only when it succeeds are
+the generated files moved into place with `os.replace`, so readers see either
+the old or the new version of each file, never a partial one. At most one
+regeneration runs at a time, across all workers sharing the target
+directory (a lock file there is held for the whole run), and a running one
+can be cancelled.
+
+Job state is saved as `<target_dir>/.question_base_jobs/<job_id>.json`, so
+any worker can report on a job. A worker that does not run the job cancels
+it by leaving a `<job_id>.cancel` file there, which the running worker polls
+for.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+import tempfile
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from app.utils.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+GENERATED_FILES = ("question_base.json", "assessment_prompt.json")
+LOCK_FILE = ".question_base.lock"
+JOBS_DIR = ".question_base_jobs"
+# Saved job state lags the running job's output by at most this long
+SAVE_INTERVAL_SECONDS = 1.0
+
+# (marker printed by the script, progress once seen, stage name)
+PROGRESS_STAGES = (
+    ("Starting 45Q Question Base Generation", 0.05, "starting"),
+    ("Analyzing documents", 0.1, "analyzing_documents"),
+    ("Analysis complete", 0.6, "question_base_generated"),
+    ("Generating Improved Assessment Prompt", 0.7, "generating_prompt"),
+    ("Improved assessment prompt generated", 0.9, "prompt_generated"),
+)
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class RegenerationInProgress(Exception):
+    """Raised when a regeneration is requested while another one runs."""
+
+    def __init__(self, job: Dict[str, Any]):
+        super().__init__(f"Question base regeneration {job['job_id']} is already running")
+        self.job = job
+
+
+class QuestionBaseJob:
+    """State of one regeneration run: running, succeeded, failed or cancelled."""
+
+    def __init__(self, output_lines: int = 200):
+        self.job_id = str(uuid.uuid4())
+        self.status = "running"
+        self.stage = "pending"
+        self.progress = 0.0
+        self.started_at = datetime.now().isoformat()
+        self.finished_at: Optional[str] = None
+        self.error: Optional[str] = None
+        self.files: List[str] = []
+        self.output: Deque[str] = deque(maxlen=output_lines)
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.task: Optional[asyncio.Task] = None
+        self.saved_at = 0.0
+
+    def record_line(self, line: str) -> bool:
+        """Keep an output line; returns whether it moved the job to a new stage."""
+        self.output.append(line)
+        for marker, progress, stage in PROGRESS_STAGES:
+            if marker in line and progress > self.progress:
+                self.progress, self.stage = progress, stage
+                return True
+        return False
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.stage = status
+        self.error = error
+        self.finished_at = datetime.now().isoformat()
+        if status == "succeeded":
+            self.progress = 1.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "files": list(self.files),
+            "output": list(self.output)
+        }
+
+
+class QuestionBaseRegenerator:
+    """Runs and tracks question base regenerations, one at a time."""
+
+    def __init__(self, script: str = "generate_question_base.py", target_dir: str = ".",
+                 command: Optional[List[str]] = None, max_jobs: int = 20, cancel_poll_seconds: float = 1.0):
+        self.target_dir = target_dir
+        self.command = command or [sys.executable, script]
+        self.max_jobs = max_jobs
+        self.cancel_poll_seconds = cancel_poll_seconds
+        self.jobs_dir = os.path.join(target_dir, JOBS_DIR)
+        # Jobs started by this worker; others are read from jobs_dir
+        self._jobs: Dict[str, QuestionBaseJob] = {}
+        self._current: Optional[QuestionBaseJob] = None
+        self._lock = FileLock(os.path.join(target_dir, LOCK_FILE))
+
+    def _job_path(self, job_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.jobs_dir, job_id + suffix)
+
+    def _save(self, job: QuestionBaseJob):
+        _write_json_atomic(self._job_path(job.job_id), job.to_dict())
+        job.saved_at = time.monotonic()
+
+    def _read(self, job_id: str) -> Dict[str, Any]:
+        # Job ids become paths, so only accept ones we could have issued
+        try:
+            uuid.UUID(job_id)
+        except ValueError:
+            raise ValueError("Unknown regeneration job")
+        try:
+            with open(self._job_path(job_id), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError("Unknown regeneration job")
+
+    def _prune_saved(self):
+        saved = sorted((entry for entry in os.scandir(self.jobs_dir) if entry.name.endswith(".json")),
+                       key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in saved[self.max_jobs:]:
+            os.unlink(entry.path)
+
+    def start(self) -> Dict[str, Any]:
+        """Start a regeneration in the background and return its state.
+
+        Must be called from the event loop. Raises RegenerationInProgress if
+        one is already running.
+        """
+        if self._lock.held:
+            # acquire() would succeed on a lock this worker already holds
+            raise RegenerationInProgress(self._current.to_dict())
+
+        job = QuestionBaseJob()
+        if not self._lock.acquire({"job_id": job.job_id, "pid": os.getpid(), "started_at": job.started_at}):
+            # Another worker is regenerating into the same directory
+            owner = self._lock.owner() or {"job_id": "unknown"}
+            raise RegenerationInProgress({**owner, "status": "running"})
+        self._current = job
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.max_jobs:
+            del self._jobs[next(iter(self._jobs))]
+        try:
+            os.makedirs(self.jobs_dir, exist_ok=True)
+            self._save(job)
+            self._prune_saved()
+        except OSError:
+            self._lock.release()
+            raise
+
+        job.task = asyncio.create_task(self._run(job))
+        return job.to_dict()
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return self._read(job_id)
+        return job.to_dict()
+
+    async def cancel(self, job_id: str, timeout: float = 10.0) -> Dict[str, Any]:
+        """Stop a running job; the live files are left untouched.
+
+        A job running on another worker is asked to stop; its state is
+        returned once it has, or after `timeout` seconds.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return await self._cancel_elsewhere(job_id, timeout)
+        if job.status == "running" and job.task is not None:
+            job.task.cancel()
+            try:
+                await job.task
+            except asyncio.CancelledError:
+                pass
+            if job.status == "running":
+                # Cancelled before _run started, so nothing else will finish it
+                job.finish("cancelled")
+                self._save(job)
+                self._lock.release()
+        return job.to_dict()
+
+    async def _cancel_elsewhere(self, job_id: str, timeout: float) -> Dict[str, Any]:
+        state = self._read(job_id)
+        if state["status"] != "running":
+            return state
+        open(self._job_path(job_id, ".cancel"), "w").close()
+        deadline = time.monotonic() + timeout
+        while state["status"] == "running" and time.monotonic() < deadline:
+            await asyncio.sleep(min(self.cancel_poll_seconds, 0.2))
+            state = self._read(job_id)
+        return state
+
+    async def _watch_for_cancel(self, job: QuestionBaseJob):
+        """Cancel the job once another worker asks for it."""
+        while not os.path.exists(self._job_path(job.job_id, ".cancel")):
+            await asyncio.sleep(self.cancel_poll_seconds)
+        logger.info(f"Question base regeneration {job.job_id} cancelled by another worker")
+        job.task.cancel()
+
+    async def shutdown(self):
+        """Cancel a running job, e.g. when the worker exits."""
+        if self._current is not None and self._current.status == "running":
+            await self.cancel(self._current.job_id)
+
+    async def _run(self, job: QuestionBaseJob):
+        staging_dir = tempfile.mkdtemp(prefix=".question_base_", dir=self.target_dir)
+        watcher = asyncio.create_task(self._watch_for_cancel(job))
+        try:
+            job.process = await asyncio.create_subprocess_exec(
+                *self.command, "--output-dir", staging_dir,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                limit=1024 * 1024  # the script prints the whole generated framework
+            )
+            async for raw_line in job.process.stdout:
+                new_stage = job.record_line(raw_line.decode("utf-8", errors="replace").rstrip())
+                if new_stage or time.monotonic() - job.saved_at >= SAVE_INTERVAL_SECONDS:
+                    self._save(job)
+            returncode = await job.process.wait()
+
+            if returncode != 0:
+                job.finish("failed", f"Question base generation exited with code {returncode}")
+                return
+            missing = [name for name in GENERATED_FILES if not os.path.exists(os.path.join(staging_dir, name))]
+            if missing:
+                job.finish("failed", f"Question base generation did not write {', '.join(missing)}")
+                return
+
+            for name in GENERATED_FILES:
+                os.replace(os.path.join(staging_dir, name), os.path.join(self.target_dir, name))
+            job.files = list(GENERATED_FILES)
+            job.finish("succeeded")
+            logger.info(f"Question base regeneration {job.job_id} finished")
+        except asyncio.CancelledError:
+            await self._terminate(job.process)
+            job.finish("cancelled")
+            logger.info(f"Question base regeneration {job.job_id} cancelled")
+            raise
+        except Exception as e:
+            await self._terminate(job.process)
+            job.finish("failed", str(e))
+            logger.error(f"Question base regeneration {job.job_id} failed: {e}")
+        finally:
+            watcher.cancel()
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            try:
+                os.unlink(self._job_path(job.job_id, ".cancel"))
+            except FileNotFoundError:
+                pass
+            try:
+                self._save(job)
+            finally:
+                # No await since finish(), so a new start() cannot hold the lock yet
+                self._lock.release()
+
+    @staticmethod
+    async def _terminate(process: Optional[asyncio.subprocess.Process], timeout: float = 5.0):
+        if process is None or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
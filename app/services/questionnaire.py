@@ -0,0 +1,320 @@
+"""
+The eligibility questionnaire, defined once and shared by every assessment.
+
+Assessments store only the questionnaire version they were started with, so
+the question models are never copied, validated or serialized per session.
+The version is a hash of the question definitions, so editing a question
+yields a new version automatically.
+
+`Questionnaire.validate` checks a complete answer map against the question
+definitions in one pass, for clients that submit every answer at once.
+
+A question with `depends_on` only applies once the question it depends on has
+been answered. Its optional `condition` narrows that further with one of:
+    {"equals": value}, {"in": [values]}, {"not_in": [values]},
+    {"contains": "text"}, {"not_contains": "text"}
+The text operators are case-insensitive substring matches, as in the rule set.
+A question can only depend on an earlier one, so the questions form a DAG
+that is checked and compiled when the questionnaire is built; the step-by-step
+flow uses it to jump over questions that do not apply.
+"""
+
+import json
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.models.eligibility import EligibilityQuestion, QuestionType
+
+BOOLEAN_STRINGS = frozenset(["true", "false", "yes", "no", "1", "0"])
+
+
+def _is_blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def compile_condition(condition: Optional[Dict[str, Any]]) -> Callable[[Any], bool]:
+    """A predicate over the parent answer for a question's condition."""
+    if not condition:
+        return lambda value: True
+    if "equals" in condition:
+        expected = condition["equals"]
+        return lambda value: value == expected
+    if "in" in condition:
+        allowed = list(condition["in"])
+        return lambda value: value in allowed
+    if "not_in" in condition:
+        excluded = list(condition["not_in"])
+        return lambda value: value not in excluded
+    if "contains" in condition:
+        text = str(condition["contains"]).lower()
+        return lambda value: text in str(value).lower()
+    if "not_contains" in condition:
+        text = str(condition["not_contains"]).lower()
+        return lambda value: text not in str(value).lower()
+    raise ValueError(f"Unsupported question condition: {condition}")
+
+
+def answer_error(question: EligibilityQuestion, value: Any) -> Optional[str]:
+    """Why an answer does not fit its question, or None if it does."""
+    if question.type == QuestionType.NUMBER:
+        if isinstance(value, bool):
+            return "Expected a number"
+        try:
+            float(value)
+        except (ValueError, TypeError):
+            return "Expected a number"
+    elif question.type == QuestionType.BOOLEAN:
+        if not isinstance(value, bool) and not (isinstance(value, str) and value.lower() in BOOLEAN_STRINGS):
+            return "Expected true or false"
+    elif question.type == QuestionType.SELECT:
+        if question.options and value not in question.options:
+            return f"Expected one of: {', '.join(question.options)}"
+    elif question.type == QuestionType.MULTI_SELECT:
+        if not isinstance(value, list):
+            return "Expected a list of options"
+        invalid = [option for option in value if question.options and option not in question.options]
+        if invalid:
+            return f"Unknown options: {', '.join(map(str, invalid))}"
+    elif not isinstance(value, str):
+        return "Expected text"
+    return None
+
+
+class Questionnaire:
+    """An immutable, versioned list of eligibility questions."""
+
+    def __init__(self, questions: Tuple[EligibilityQuestion, ...]):
+        self.questions = tuple(questions)
+        self.by_id: Dict[str, EligibilityQuestion] = {question.id: question for question in self.questions}
+        definition = json.dumps([question.model_dump(mode="json") for question in self.questions], sort_keys=True)
+        self.version = hashlib.sha256(definition.encode("utf-8")).hexdigest()[:12]
+
+        # (parent question id, predicate) per conditional question, by position
+        self._conditions: List[Optional[Tuple[str, Callable[[Any], bool]]]] = []
+        positions = {question.id: i for i, question in enumerate(self.questions)}
+        for i, question in enumerate(self.questions):
+            if not question.depends_on:
+                self._conditions.append(None)
+                continue
+            if positions.get(question.depends_on, i) >= i:
+                raise ValueError(f"Question {question.id} must depend on an earlier question, "
+                                 f"not {question.depends_on}")
+            self._conditions.append((question.depends_on, compile_condition(question.condition)))
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def __getitem__(self, index: int) -> EligibilityQuestion:
+        return self.questions[index]
+
+    def _applies_at(self, index: int, answers: Dict[str, Any]) -> bool:
+        condition = self._conditions[index]
+        if condition is None:
+            return True
+        parent_id, predicate = condition
+        value = answers.get(parent_id)
+        return not _is_blank(value) and predicate(value)
+
+    def next_index(self, after: int, answers: Dict[str, Any]) -> int:
+        """Position of the next applicable question after `after` (len() when done)."""
+        index = after + 1
+        while index < len(self.questions) and not self._applies_at(index, answers):
+            index += 1
+        return index
+
+    def path_length(self, answers: Dict[str, Any]) -> int:
+        """Number of questions on the path through the questionnaire.
+
+        A question whose parent is on the path but not answered yet still
+        counts, so progress computed against the path never overshoots.
+        """
+        on_path: Dict[str, bool] = {}
+        for index, question in enumerate(self.questions):
+            condition = self._conditions[index]
+            if condition is None:
+                on_path[question.id] = True
+            elif condition[0] not in answers:
+                on_path[question.id] = on_path[condition[0]]
+            else:
+                on_path[question.id] = self._applies_at(index, answers)
+        return sum(on_path.values())
+
+    def progress(self, index: int, answers: Dict[str, Any]) -> float:
+        """Fraction of the path answered when positioned at question `index`."""
+        if index >= len(self.questions):
+            return 1.0
+        done = sum(1 for i in range(index) if self._applies_at(i, answers))
+        return done / self.path_length(answers)
+
+    def validate(self, answers: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Validation errors for a full answer map, in question order.
+
+        Each error is {"question_id", "message"}. Questions that do not apply
+        are not required; answers to unknown question ids are reported last.
+        """
+        errors = []
+        for index, question in enumerate(self.questions):
+            if not self._applies_at(index, answers):
+                continue
+            value = answers.get(question.id)
+            if _is_blank(value):
+                if question.required:
+                    errors.append({"question_id": question.id, "message": "Answer is required"})
+                continue
+            message = answer_error(question, value)
+            if message:
+                errors.append({"question_id": question.id, "message": message})
+
+        for question_id in answers:
+            if question_id not in self.by_id:
+                errors.append({"question_id": question_id, "message": "Unknown question"})
+        return errors
+
+
+ELIGIBILITY_QUESTIONS = (
+    EligibilityQuestion(
+        id="facility_name",
+        question="What is the name of your facility/project?",
+        type=QuestionType.TEXT,
+        required=True,
+        help_text="Enter the official name of your facility or project"
+    ),
+    EligibilityQuestion(
+        id="location_city",
+        question="What city is your project located in?",
+        type=QuestionType.TEXT,
+        required=True
+    ),
+    EligibilityQuestion(
+        id="location_state",
+        question="What state is your project located in?",
+        type=QuestionType.TEXT,
+        required=True
+    ),
+    EligibilityQuestion(
+        id="facility_type",
+        question="What type of facility is this?",
+        type=QuestionType.SELECT,
+        required=True,
+        options=[
+            "Electric generation facility",
+            "Industrial facility (cement, steel, chemicals, etc.)",
+            "Direct air capture facility",
+            "Other"
+        ],
+        help_text="Select the primary type of facility"
+    ),
+    EligibilityQuestion(
+        id="ownership",
+        question="Who owns the facility?",
+        type=QuestionType.SELECT,
+        required=True,
+        options=[
+            "You (the taxpayer)",
+            "Your client",
+            "A third party"
+        ]
+    ),
+    EligibilityQuestion(
+        id="technology_ownership",
+        question="Who owns the carbon capture technology?",
+        type=QuestionType.SELECT,
+        required=True,
+        options=[
+            "You (the taxpayer)",
+            "Licensed from another party",
+            "Owned by a third party"
+        ]
+    ),
+    EligibilityQuestion(
+        id="capture_method",
+        question="What method is used to capture CO2?",
+        type=QuestionType.SELECT,
+        required=True,
+        options=[
+            "Post-combustion capture",
+            "Pre-combustion capture",
+            "Oxy-fuel combustion",
+            "Direct air capture",
+            "Other"
+        ]
+    ),
+    EligibilityQuestion(
+        id="annual_co2_captured",
+        question="How much CO2 do you capture annually (in metric tons)?",
+        type=QuestionType.NUMBER,
+        required=True,
+        help_text="Enter the estimated annual CO2 capture in metric tons"
+    ),
+    EligibilityQuestion(
+        id="capture_efficiency",
+        question="What is the capture efficiency percentage?",
+        type=QuestionType.NUMBER,
+        required=False,
+        # Direct air capture has no source emissions to measure efficiency against
+        depends_on="facility_type",
+        condition={"not_contains": "direct air capture"},
+        help_text="Enter the percentage of CO2 captured from the total emissions"
+    ),
+    EligibilityQuestion(
+        id="facility_construction_date",
+        question="When was the facility originally constructed? (YYYY-MM-DD)",
+        type=QuestionType.TEXT,
+        required=False,
+        help_text="Enter the date when the facility was first constructed"
+    ),
+    EligibilityQuestion(
+        id="carbon_capture_operation_date",
+        question="When did/will carbon capture operations begin? (YYYY-MM-DD)",
+        type=QuestionType.TEXT,
+        required=True,
+        help_text="Enter the date when carbon capture operations started or will start"
+    ),
+    EligibilityQuestion(
+        id="sequestration_method",
+        question="How is the captured CO2 sequestered?",
+        type=QuestionType.SELECT,
+        required=True,
+        options=[
+            "Geologic storage (underground injection)",
+            "Enhanced oil recovery (EOR)",
+            "Utilization in products",
+            "Other"
+        ]
+    ),
+    EligibilityQuestion(
+        id="sequestration_location",
+        question="Where is the CO2 sequestered?",
+        type=QuestionType.TEXT,
+        required=True,
+        help_text="Describe the location where CO2 is stored or utilized"
+    ),
+    EligibilityQuestion(
+        id="domestic_content",
+        question="What percentage of the facility components are manufactured in the US?",
+        type=QuestionType.NUMBER,
+        required=False,
+        help_text="Enter the percentage of domestic content (0-100)"
+    ),
+    EligibilityQuestion(
+        id="energy_community",
+        question="Is the facility located in an energy community?",
+        type=QuestionType.BOOLEAN,
+        required=False,
+        help_text="Energy communities include areas with coal mine/plant closures or high unemployment"
+    )
+)
+
+CURRENT_QUESTIONNAIRE = Questionnaire(ELIGIBILITY_QUESTIONS)
+
+_QUESTIONNAIRES: Dict[str, Questionnaire] = {CURRENT_QUESTIONNAIRE.version: CURRENT_QUESTIONNAIRE}
+
+
+def get_questionnaire(version: Optional[str] = None) -> Questionnaire:
+    """Look up a questionnaire by version (the current one by default)."""
+    if version is None:
+        return CURRENT_QUESTIONNAIRE
+    try:
+        return _QUESTIONNAIRES[version]
+    except KeyError:
+        raise ValueError(f"Unknown questionnaire version: {version}")
@@ -1,5 +1,9 @@
 import os
-from typing import List, Dict, Any, Optional
+import time
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import (
     PyPDFLoader,
@@ -7,40 +11,100 @@ from langchain_community.document_loaders import (
     Docx2txtLoader,
     DirectoryLoader
 )
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
 from langchain.retrievers import ContextualCompressionRetriever
 from langchain.retrievers.document_compressors import LLMChainExtractor
 from app.config import settings
 from app.services.llm_service import LLMService
+from app.services.embedding_service import create_embeddings
+from app.utils.prompts import (
+    CREDIT_CALCULATION_PROMPT, ELIGIBILITY_ANALYSIS_PROMPT, RAG_QUERY_PROMPT, build_prompt_messages
+)
+from app.utils.vector_index import (
+    hnsw_collection_metadata,
+    resolve_live_path,
+    collection_stats,
+    new_generation_path,
+    activate_generation,
+    prune_generations,
+    rebuild_lock
+)
+from app.utils.vector_snapshot import VectorSnapshot, export_collection_snapshot
+
+# Kinds of facility guidance, in the order get_guidance returns them by default
+GUIDANCE_KINDS = ("eligibility", "credit_calculation")
+
+logger = logging.getLogger(__name__)
+
+
+class IndexRebuildInProgress(Exception):
+    """Raised when a rebuild is requested while another process is rebuilding the index."""
+
+    def __init__(self, owner: Optional[Dict[str, Any]]):
+        super().__init__("The knowledge base index is already being rebuilt")
+        self.owner = owner
 
 
 class RAGService:
     """RAG service for document retrieval and question answering."""
 
-    def __init__(self):
+    def __init__(self, embeddings: Optional[Embeddings] = None, llm_service: Optional[LLMService] = None):
         self.vector_store = None
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=settings.embedding_model,
-            model_kwargs={'device': 'cpu'}
-        )
-        self.llm_service = LLMService()
+        self.persist_directory = None
+        self.snapshot = None
+        self._last_generation_check = 0.0
+        self.embeddings = embeddings or create_embeddings()
+        self.llm_service = llm_service or LLMService()
         self._initialize_vector_store()
 
     def _initialize_vector_store(self):
         """Initialize the vector store."""
-        if os.path.exists(settings.vector_db_path):
-            self.vector_store = Chroma(
-                persist_directory=settings.vector_db_path,
-                embedding_function=self.embeddings
-            )
-        else:
-            # Create empty vector store
-            self.vector_store = Chroma(
-                persist_directory=settings.vector_db_path,
-                embedding_function=self.embeddings
-            )
+        # Open the resolved generation directory so a later swap of the live
+        # path does not change the files under an already open client.
+        self.persist_directory = resolve_live_path()
+        self.vector_store = self._open_vector_store(self.persist_directory)
+        self._last_generation_check = time.monotonic()
+
+        if settings.retrieval_backend == "snapshot":
+            self._open_snapshot()
+            if self.snapshot is None:
+                logger.warning(
+                    f"No vector snapshot at {settings.vector_snapshot_path}; "
+                    "run `python manage_index.py export-snapshot`. Falling back to Chroma."
+                )
+
+    def _open_snapshot(self):
+        """Memory-map the live snapshot generation if it changed."""
+        snapshot_path = resolve_live_path(settings.vector_snapshot_path)
+        if self.snapshot is not None and self.snapshot.path == snapshot_path:
+            return
+        if (snapshot_path / "manifest.json").exists():
+            self.snapshot = VectorSnapshot(snapshot_path)
+
+    def _open_vector_store(self, path) -> Chroma:
+        """Open (or create) the Chroma collection stored at a path."""
+        return Chroma(
+            persist_directory=str(path),
+            embedding_function=self.embeddings,
+            collection_metadata=hnsw_collection_metadata()
+        )
+
+    def _refresh_vector_store(self):
+        """Switch to newer index generations activated by another process."""
+        now = time.monotonic()
+        if now - self._last_generation_check < settings.index_reload_check_seconds:
+            return
+        self._last_generation_check = now
+
+        if settings.retrieval_backend == "snapshot":
+            self._open_snapshot()
+
+        live_path = resolve_live_path()
+        if live_path != self.persist_directory and live_path.exists():
+            logger.info(f"Vector index generation changed, reopening {live_path}")
+            self.vector_store, self.persist_directory = self._open_vector_store(live_path), live_path
 
     def load_documents(self, directory_path: str) -> List[Document]:
         """Load documents from a directory."""
@@ -91,35 +155,75 @@ class RAGService:
         return text_splitter.split_documents(documents)
 
     def add_documents(self, documents: List[Document]):
-        """Add documents to the vector store."""
+        """Split documents and add them to the vector store."""
         if not documents:
             return
 
-        # Split documents into chunks
-        chunks = self.split_documents(documents)
+        self.add_chunks(self.split_documents(documents))
 
-        # Add to vector store (Chroma automatically persists)
-        self.vector_store.add_documents(chunks)
+    def add_chunks(self, chunks: List[Document], batch_size: int = 500):
+        """Add already split chunks to the vector store."""
+        self._add_in_batches(self.vector_store, chunks, batch_size)
 
-    def update_knowledge_base(self, documents_directory: str) -> Dict[str, Any]:
-        """Update the knowledge base with new documents."""
-        documents = self.load_documents(documents_directory)
-        chunks = self.split_documents(documents)
+    def _add_in_batches(self, vector_store: Chroma, chunks: List[Document], batch_size: int):
+        """Add chunks in batches below Chroma's maximum batch size."""
+        # Chroma automatically persists each batch
+        for i in range(0, len(chunks), batch_size):
+            vector_store.add_documents(chunks[i:i + batch_size])
 
-        # Clear existing documents and add new ones
-        self.vector_store = Chroma(
-            persist_directory=settings.vector_db_path,
-            embedding_function=self.embeddings
-        )
+    def rebuild_index(self, chunks: List[Document], batch_size: int = 500) -> Dict[str, Any]:
+        """Build a fresh collection from chunks and swap it in atomically.
 
-        self.add_documents(documents)
+        The new collection is written to its own index generation next to the
+        live one. Queries keep hitting the previous collection until the build
+        has finished, then the live path and this service switch over at once.
+        One rebuild runs at a time across processes; raises
+        IndexRebuildInProgress if another one holds the rebuild lock.
+        """
+        if not chunks:
+            return {"total_chunks": 0, "vector_db_updated": False}
+
+        lock = rebuild_lock()
+        if not lock.acquire({"pid": os.getpid(), "started_at": time.time()}):
+            raise IndexRebuildInProgress(lock.owner())
+        try:
+            return self._rebuild_index(chunks, batch_size)
+        finally:
+            lock.release()
+
+    def _rebuild_index(self, chunks: List[Document], batch_size: int) -> Dict[str, Any]:
+        start = time.perf_counter()
+        generation = new_generation_path()
+        new_store = self._open_vector_store(generation)
+        self._add_in_batches(new_store, chunks, batch_size)
+
+        activate_generation(generation)
+        # A single assignment, so concurrent readers see either index, never a mix
+        self.vector_store, self.persist_directory = new_store, generation.resolve()
+        removed = prune_generations()
+
+        if settings.retrieval_backend == "snapshot":
+            # Workers serve from the snapshot, so it has to follow the new collection
+            export_collection_snapshot(new_store._collection)
+            self._open_snapshot()
 
         return {
-            "documents_processed": len(documents),
             "total_chunks": len(chunks),
-            "vector_db_updated": True
+            "vector_db_updated": True,
+            "generation": str(generation),
+            "generations_removed": len(removed),
+            "rebuild_seconds": time.perf_counter() - start
         }
 
+    def update_knowledge_base(self, documents_directory: str) -> Dict[str, Any]:
+        """Rebuild the knowledge base from the documents in a directory."""
+        documents = self.load_documents(documents_directory)
+        chunks = self.split_documents(documents)
+
+        result = self.rebuild_index(chunks)
+        result["documents_processed"] = len(documents)
+        return result
+
     def retrieve_relevant_documents(self, query: str, top_k: int = None) -> List[Document]:
         """Retrieve relevant documents for a query."""
         if top_k is None:
@@ -128,6 +232,13 @@ class RAGService:
         if not self.vector_store:
             return []
 
+        self._refresh_vector_store()
+
+        if self.snapshot is not None:
+            # Read-only memory-mapped index shared by all workers on the node
+            query_embedding = self.embeddings.embed_query(query)
+            return self.snapshot.similarity_search_by_vector(query_embedding, top_k)
+
         # Create retriever with contextual compression
         base_retriever = self.vector_store.as_retriever(
             search_type="similarity",
@@ -138,18 +249,87 @@ class RAGService:
         # to avoid the LLM service access issue
         return base_retriever.get_relevant_documents(query)
 
-    async def answer_question(self, question: str, context: Optional[str] = None) -> Dict[str, Any]:
-        """Answer a question using RAG."""
-        relevant_docs = []
+    def retrieve_many(self, queries: List[str], top_k: int = None) -> List[List[Document]]:
+        """Retrieve relevant documents for several queries at once.
+
+        All queries are embedded in one forward pass and searched with a single
+        batched similarity query, which is much cheaper per query than calling
+        `retrieve_relevant_documents` in a loop. Results are in query order.
+        """
+        if top_k is None:
+            top_k = settings.top_k_retrieval
+
+        if not queries or not self.vector_store:
+            return [[] for _ in queries]
+
+        self._refresh_vector_store()
+        query_embeddings = self.embeddings.embed_documents(list(queries))
+
+        if self.snapshot is not None:
+            return [
+                [self.snapshot.document(row) for row, _ in hits]
+                for hits in self.snapshot.search(np.asarray(query_embeddings), top_k)
+            ]
+
+        results = self.vector_store._collection.query(
+            query_embeddings=query_embeddings,
+            n_results=top_k,
+            include=["documents", "metadatas"]
+        )
+        return [
+            [
+                Document(page_content=text or "", metadata=metadata or {}, id=chunk_id)
+                for chunk_id, text, metadata in zip(ids, texts, metadatas)
+            ]
+            for ids, texts, metadatas in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+
+    def get_source(self, chunk_id: str) -> Optional[Document]:
+        """A stored chunk by id, or None if the index has no such chunk."""
+        if not self.vector_store:
+            return None
+
+        self._refresh_vector_store()
+
+        if self.snapshot is not None:
+            row = self.snapshot.row_of(chunk_id)
+            if row is not None:
+                return self.snapshot.document(row)
+
+        result = self.vector_store.get(ids=[chunk_id], include=["documents", "metadatas"])
+        if not result["ids"]:
+            return None
+        return Document(page_content=result["documents"][0] or "", metadata=result["metadatas"][0] or {},
+                        id=result["ids"][0])
+
+    async def answer_question(self, question: str, context: Optional[str] = None,
+                              relevant_docs: Optional[List[Document]] = None,
+                              instructions: str = RAG_QUERY_PROMPT) -> Dict[str, Any]:
+        """Answer a question using RAG.
+
+        The prompt is laid out instructions first, then the context, then
+        the question, so calls with the same instructions share a cacheable
+        prefix.
+        """
+        relevant_docs = relevant_docs or []
         
         if not context:
-            # Retrieve relevant documents
-            relevant_docs = self.retrieve_relevant_documents(question)
-            context = "\n\n".join([doc.page_content for doc in relevant_docs])
+            # Retrieve relevant documents unless a batched caller already did
+            if not relevant_docs:
+                relevant_docs = self.retrieve_relevant_documents(question)
+            context = self.context_from_documents(relevant_docs)
 
         # Generate answer using LLM
-        answer = await self.llm_service.generate_response(question, context)
+        answer = await self.llm_service.chat_completion(build_prompt_messages(instructions, context, question))
+        return self.package_answer(question, answer, context, relevant_docs)
 
+    @staticmethod
+    def context_from_documents(relevant_docs: List[Document]) -> str:
+        return "\n\n".join([doc.page_content for doc in relevant_docs])
+
+    def package_answer(self, question: str, answer: str, context: str,
+                       relevant_docs: List[Document]) -> Dict[str, Any]:
+        """The answer_question result for an answer generated elsewhere (e.g. a provider batch)."""
         # Calculate confidence score (simplified)
         confidence_score = self._calculate_confidence(question, answer, context)
 
@@ -157,9 +337,23 @@ class RAGService:
             "answer": answer,
             "context": context,
             "confidence_score": confidence_score,
-            "sources": [{"content": doc.page_content, "metadata": doc.metadata} for doc in relevant_docs]
+            "sources": [{"id": doc.id, "content": doc.page_content, "metadata": doc.metadata} for doc in relevant_docs]
         }
 
+    async def answer_questions(self, questions: List[str],
+                               instructions: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Answer several questions with one batched retrieval and concurrent LLM calls.
+
+        `instructions` optionally gives each question its own static instructions.
+        """
+        # Embedding and search are CPU-bound; keep them off the event loop
+        retrieved = await asyncio.to_thread(self.retrieve_many, questions)
+        instructions = instructions or [RAG_QUERY_PROMPT] * len(questions)
+        return await asyncio.gather(*[
+            self.answer_question(question, relevant_docs=docs, instructions=question_instructions)
+            for question, docs, question_instructions in zip(questions, retrieved, instructions)
+        ])
+
     def _calculate_confidence(self, question: str, answer: str, context: str) -> float:
         """Calculate confidence score for the answer."""
         # Simple heuristic-based confidence calculation
@@ -186,58 +380,57 @@ class RAGService:
 
         return min(confidence, 1.0)
 
+    def _eligibility_query(self, facility_info: Dict[str, Any]) -> str:
+        # Only facility data: the instructions are the static ELIGIBILITY_ANALYSIS_PROMPT
+        return f"""Determine 45Q tax credit eligibility for this facility:
+
+Facility Type: {facility_info.get('facility_type', 'Unknown')}
+Location: {facility_info.get('location_state', 'Unknown')}
+Ownership: {facility_info.get('ownership', 'Unknown')}
+Technology Ownership: {facility_info.get('technology_ownership', 'Unknown')}
+Capture Method: {facility_info.get('capture_method', 'Unknown')}
+Annual CO2 Captured: {facility_info.get('annual_co2_captured', 'Unknown')} metric tons"""
+
+    def _credit_calculation_query(self, facility_info: Dict[str, Any]) -> str:
+        # Only facility data: the instructions are the static CREDIT_CALCULATION_PROMPT
+        return f"""Provide 45Q credit calculation guidance for this facility:
+
+Facility Type: {facility_info.get('facility_type', 'Unknown')}
+Annual CO2 Captured: {facility_info.get('annual_co2_captured', 'Unknown')} metric tons
+Capture Method: {facility_info.get('capture_method', 'Unknown')}
+Sequestration Method: {facility_info.get('sequestration_method', 'Unknown')}"""
+
+    def guidance_prompt(self, kind: str, facility_info: Dict[str, Any]) -> Tuple[str, str]:
+        """(query, instructions) for one of GUIDANCE_KINDS."""
+        if kind == "eligibility":
+            return self._eligibility_query(facility_info), ELIGIBILITY_ANALYSIS_PROMPT
+        if kind == "credit_calculation":
+            return self._credit_calculation_query(facility_info), CREDIT_CALCULATION_PROMPT
+        raise ValueError(f"Unknown guidance kind: {kind}. Choose one of {', '.join(GUIDANCE_KINDS)}")
+
+    async def get_guidance(self, facility_info: Dict[str, Any],
+                           kinds: Sequence[str] = GUIDANCE_KINDS) -> Dict[str, Dict[str, Any]]:
+        """Guidance of several kinds for one facility in one batched pass."""
+        prompts = [self.guidance_prompt(kind, facility_info) for kind in kinds]
+        answers = await self.answer_questions([query for query, _ in prompts],
+                                              [instructions for _, instructions in prompts])
+        return dict(zip(kinds, answers))
+
     async def get_eligibility_guidance(self, facility_info: Dict[str, Any]) -> Dict[str, Any]:
         """Get specific guidance for 45Q eligibility based on facility information."""
-        query = f"""
-        Based on the following facility information, determine 45Q tax credit eligibility:
-
-        Facility Type: {facility_info.get('facility_type', 'Unknown')}
-        Location: {facility_info.get('location_state', 'Unknown')}
-        Ownership: {facility_info.get('ownership', 'Unknown')}
-        Technology Ownership: {facility_info.get('technology_ownership', 'Unknown')}
-        Capture Method: {facility_info.get('capture_method', 'Unknown')}
-        Annual CO2 Captured: {facility_info.get('annual_co2_captured', 'Unknown')} metric tons
-
-        Please provide:
-        1. Eligibility determination
-        2. Applicable 45Q provisions
-        3. Requirements that must be met
-        4. Estimated credit rates
-        5. Recommendations for qualification
-        """
-
-        return await self.answer_question(query)
+        return (await self.get_guidance(facility_info, ["eligibility"]))["eligibility"]
 
     async def get_credit_calculation_guidance(self, facility_info: Dict[str, Any]) -> Dict[str, Any]:
         """Get guidance for credit calculation and forecasting."""
-        query = f"""
-        For a facility with the following characteristics, provide detailed 45Q credit calculation guidance:
-
-        Facility Type: {facility_info.get('facility_type', 'Unknown')}
-        Annual CO2 Captured: {facility_info.get('annual_co2_captured', 'Unknown')} metric tons
-        Capture Method: {facility_info.get('capture_method', 'Unknown')}
-        Sequestration Method: {facility_info.get('sequestration_method', 'Unknown')}
-
-        Please provide:
-        1. Base credit rates for different time periods
-        2. Bonus credit opportunities
-        3. Calculation methodology
-        4. Timeline considerations
-        5. Documentation requirements
-        """
-
-        return await self.answer_question(query)
+        return (await self.get_guidance(facility_info, ["credit_calculation"]))["credit_calculation"]
 
-    def get_vector_store_stats(self) -> Dict[str, Any]:
+    def get_vector_store_stats(self, recall_sample_size: Optional[int] = None) -> Dict[str, Any]:
         """Get statistics about the vector store."""
         if not self.vector_store:
             return {"total_documents": 0, "collection_name": None}
 
-        collection = self.vector_store._collection
-        metadata = collection.metadata if hasattr(collection, 'metadata') else {}
-        
-        return {
-            "total_documents": collection.count(),
-            "collection_name": collection.name,
-            "embedding_dimension": metadata.get("hnsw:space", "unknown") if metadata else "unknown"
-        } 
\ No newline at end of file
+        return collection_stats(
+            self.vector_store._collection,
+            self.persist_directory,
+            recall_sample_size=recall_sample_size
+        )
@@ -0,0 +1,253 @@
+"""
+Session stores for eligibility assessments.
+
+`InMemorySessionStore` keeps assessments in a bounded LRU with a sliding TTL,
+so abandoned questionnaires are evicted instead of accumulating for the life
+of the process. `SQLiteSessionStore` persists them in a SQLite database in WAL
+mode that every worker on a node can share, so sessions survive restarts and
+load-balancer hops. It writes through by default, so every worker reads the
+latest answers; buffering writes in batches is an option for a single worker.
+"""
+
+import time
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+from app.models.eligibility import EligibilityAssessment
+
+logger = logging.getLogger(__name__)
+
+SESSION_STORE_BACKENDS = ("memory", "sqlite")
+
+
+class SessionStore(ABC):
+    """Storage for in-progress and completed assessments."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[EligibilityAssessment]:
+        """Return the assessment for a session, or None if unknown or expired."""
+
+    @abstractmethod
+    def put(self, assessment: EligibilityAssessment):
+        """Store (or replace) an assessment."""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Forget a session."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of live sessions."""
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def flush(self):
+        """Write buffered changes to durable storage."""
+
+    def close(self):
+        """Flush and release resources."""
+        self.flush()
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local LRU store with a sliding time-to-live.
+
+    Entries are kept in access order, so the least recently used session is
+    both the first to be evicted for capacity and the first to expire.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 86400):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, Tuple[float, EligibilityAssessment]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now: float):
+        while self._sessions:
+            session_id, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            del self._sessions[session_id]
+
+    def get(self, session_id: str) -> Optional[EligibilityAssessment]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._sessions[session_id]
+                return None
+            self._sessions[session_id] = (now + self.ttl_seconds, entry[1])
+            self._sessions.move_to_end(session_id)
+            return entry[1]
+
+    def put(self, assessment: EligibilityAssessment):
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[assessment.session_id] = (now + self.ttl_seconds, assessment)
+            self._sessions.move_to_end(assessment.session_id)
+            self._purge_expired(now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite-backed store shared by all workers that point at the same file.
+
+    With `flush_interval_seconds` 0 (the default) every put is committed at
+    once, so another worker sees the change on its next read; only purging
+    expired sessions is batched, at most once a minute. A positive interval
+    buffers writes in memory and flushes them in one transaction once
+    `flush_batch_size` sessions are pending or the interval has passed. Reads
+    check only the local buffer, so use that with a single worker only.
+
+    Calls block on SQLite (up to its 5s busy timeout), so async callers run
+    them in a thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 86400,
+        flush_interval_seconds: float = 0.0,
+        flush_batch_size: int = 200
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_batch_size = max(1, flush_batch_size)
+
+        self._pending: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._closed = threading.Event()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS assessments ("
+            "session_id TEXT PRIMARY KEY, expires_at REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS assessments_expires_at ON assessments (expires_at)")
+
+        self._flusher = None
+        if flush_interval_seconds > 0:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="session-store-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval_seconds):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to flush sessions to {self.path}: {e}")
+
+    def get(self, session_id: str) -> Optional[EligibilityAssessment]:
+        now = time.time()
+        with self._lock:
+            pending = self._pending.get(session_id)
+            if pending is None:
+                row = self._conn.execute(
+                    "SELECT expires_at, data FROM assessments WHERE session_id = ?",
+                    (session_id,)
+                ).fetchone()
+                pending = tuple(row) if row else None
+
+        if pending is None or pending[0] <= now:
+            return None
+        return EligibilityAssessment.model_validate_json(pending[1])
+
+    def put(self, assessment: EligibilityAssessment):
+        entry = (time.time() + self.ttl_seconds, assessment.model_dump_json())
+        with self._lock:
+            self._pending[assessment.session_id] = entry
+            if self.flush_interval_seconds > 0 and len(self._pending) < self.flush_batch_size:
+                return
+            self._flush_locked()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._pending.pop(session_id, None)
+            self._conn.execute("DELETE FROM assessments WHERE session_id = ?", (session_id,))
+
+    def __len__(self) -> int:
+        self.flush()
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM assessments WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        now = time.time()
+        purge = now - self._last_purge >= 60
+        if not self._pending and not purge:
+            return
+
+        rows = [(session_id, expires_at, data) for session_id, (expires_at, data) in self._pending.items()]
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO assessments (session_id, expires_at, data) VALUES (?, ?, ?)",
+                rows
+            )
+            if purge:
+                self._conn.execute("DELETE FROM assessments WHERE expires_at <= ?", (now,))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+        self._pending.clear()
+        if purge:
+            self._last_purge = now
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        self._conn.close()
+
+
+def create_session_store(backend: Optional[str] = None) -> SessionStore:
+    """Create the session store for the configured backend."""
+    backend = (backend or settings.session_store_backend).lower()
+
+    if backend == "memory":
+        return InMemorySessionStore(
+            max_sessions=settings.session_max_sessions,
+            ttl_seconds=settings.session_ttl_seconds
+        )
+    elif backend == "sqlite":
+        return SQLiteSessionStore(
+            settings.session_db_path,
+            ttl_seconds=settings.session_ttl_seconds,
+            flush_interval_seconds=settings.session_flush_interval_seconds,
+            flush_batch_size=settings.session_flush_batch_size
+        )
+    else:
+        raise ValueError(f"Unsupported session store: {backend}. Choose one of {', '.join(SESSION_STORE_BACKENDS)}")
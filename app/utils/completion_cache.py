@@ -0,0 +1,122 @@
+"""
+Content-addressed on-disk cache of LLM completions for the generator scripts
+(and the enhanced assessment endpoint).
+
+An entry is keyed by a hash of everything that determines the completion:
+the model, the prompt (including any retrieved context or system message),
+the temperature and other request parameters. Changing one category's
+context therefore misses for that category only; an interrupted run
+resumes from the entries it already wrote. Entries are written atomically
+as `<directory>/<key[:2]>/<key>.json` and can be shared by several scripts.
+
+A cache can be bounded by age (`max_age_seconds`) and size (`max_entries`);
+writes then prune expired and least recently written entries every
+`prune_interval_seconds`. Deleting the directory purges it.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+
+class CompletionCache:
+    """Maps (model, prompt, temperature, params) to a stored completion.
+
+    With `force`, lookups always miss so every request goes upstream, but the
+    fresh completions still replace the cached ones.
+    """
+
+    def __init__(self, directory: str, force: bool = False, max_age_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = None, prune_interval_seconds: float = 300.0):
+        self.directory = Path(directory)
+        self.force = force
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        self.prune_interval_seconds = prune_interval_seconds
+        self._last_prune = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, prompt: Any, temperature: float, **params: Any) -> str:
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "temperature": temperature, "params": params},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _read(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            if self.max_age_seconds is not None and time.time() - path.stat().st_mtime > self.max_age_seconds:
+                return None
+            with open(path, "r") as f:
+                return json.load(f)["completion"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def get(self, key: str) -> Optional[Any]:
+        """The cached completion for a key, or None."""
+        return self.get_any([key])
+
+    def get_any(self, keys: Iterable[str]) -> Optional[Any]:
+        """The completion cached under the first of `keys` that has one, or None.
+
+        For a request several models could answer; counts as one lookup.
+        """
+        if not self.force:
+            for key in keys:
+                completion = self._read(key)
+                if completion is not None:
+                    self.hits += 1
+                    return completion
+        self.misses += 1
+        return None
+
+    def put(self, key: str, completion: Any):
+        """Store a JSON-serializable completion."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"created_at": datetime.now().isoformat(), "completion": completion}, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if ((self.max_age_seconds is not None or self.max_entries is not None)
+                and time.time() - self._last_prune >= self.prune_interval_seconds):
+            self.prune()
+
+    def prune(self) -> int:
+        """Delete expired entries, then the oldest beyond `max_entries`; returns how many went."""
+        self._last_prune = time.time()
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                pass
+        entries.sort(reverse=True)
+
+        keep = len(entries) if self.max_entries is None else self.max_entries
+        if self.max_age_seconds is not None:
+            cutoff = self._last_prune - self.max_age_seconds
+            keep = min(keep, sum(1 for mtime, _ in entries if mtime >= cutoff))
+        removed = 0
+        for _, path in entries[keep:]:
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
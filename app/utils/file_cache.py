@@ -0,0 +1,77 @@
+"""
+In-memory cache for JSON files that the API serves on every request.
+
+`CachedJSONFile` parses a file once, passes the parsed data through a
+`build` function that shapes the response payload, and keeps the payload
+serialized together with a strong ETag. Each lookup costs one `os.stat`;
+the file is re-read only when its mtime or size changes, and re-parsed only
+when its content hash changes too, so rewriting identical content (as the
+question base generators may do) keeps the same ETag.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+
+from app.utils.json_response import dumps
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A response payload serialized once, with its strong ETag."""
+
+    data: Any
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_data(cls, data: Any) -> "CachedResponse":
+        body = dumps(data)
+        return cls(data=data, body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value covers `etag`."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class CachedJSONFile:
+    """A JSON file parsed on first use and reloaded when it changes on disk."""
+
+    def __init__(self, path: str, build: Callable[[Any], Any] = lambda data: data):
+        self.path = path
+        self.build = build
+        self._lock = threading.Lock()
+        self._stat: Optional[Tuple[int, int]] = None
+        self._content_hash: Optional[str] = None
+        self._response: Optional[CachedResponse] = None
+
+    def get(self) -> Optional[CachedResponse]:
+        """The cached response, or None if the file does not exist."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            with self._lock:
+                self._stat = self._content_hash = self._response = None
+            return None
+
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key == self._stat and self._response is not None:
+                return self._response
+
+            with open(self.path, "rb") as f:
+                content = f.read()
+            content_hash = hashlib.sha256(content).hexdigest()
+            if content_hash != self._content_hash or self._response is None:
+                # Parse before updating any state, so a half-written file is retried next time
+                response = CachedResponse.from_data(self.build(json.loads(content)))
+                self._response, self._content_hash = response, content_hash
+            self._stat = key
+            return self._response
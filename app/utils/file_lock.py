@@ -0,0 +1,71 @@
+"""
+Advisory locks that serialize work across worker processes on one node.
+
+A `FileLock` is held on an open file descriptor, so the operating system
+drops it when the holding process exits or crashes and a lock file left on
+disk is never stale. The holder can record who it is in the file (e.g. a
+job id) for the processes that fail to take the lock.
+"""
+
+import os
+import json
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Non-blocking exclusive lock on a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, owner: Optional[Dict[str, Any]] = None) -> bool:
+        """Take the lock if no other holder has it, recording `owner` in the file."""
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        if owner is not None:
+            os.ftruncate(fd, 0)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, json.dumps(owner).encode("utf-8"))
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def owner(self) -> Optional[Dict[str, Any]]:
+        """What the current holder recorded, if readable."""
+        try:
+            with open(self.path, "r") as f:
+                return json.loads(f.read() or "null")
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,88 @@
+"""
+Fast JSON serialization and compression for API responses.
+
+`FastJSONResponse` is the app's default response class. Endpoints with
+large payloads return it directly, which skips FastAPI's `jsonable_encoder`
+pass: pydantic models are serialized by pydantic-core (`model_dump_json`)
+and everything else by orjson, which handles datetimes, dataclasses and
+numpy values natively and nested pydantic models through `default`. Without
+orjson installed, compact stdlib `json` is used instead.
+
+`add_compression` installs brotli compression (with gzip fallback) when
+`brotli-asgi` is installed, otherwise gzip, for bodies over a threshold.
+"""
+
+import json
+import logging
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import PydanticSerializationError
+from starlette.middleware.gzip import GZipMiddleware
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+COMPRESSION_MODES = ("auto", "gzip", "off")
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, "tolist"):
+        # numpy scalars and arrays on the stdlib path
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize response content to compact UTF-8 JSON."""
+    if isinstance(content, BaseModel):
+        try:
+            return content.model_dump_json().encode("utf-8")
+        except PydanticSerializationError:
+            # e.g. numpy values inside a Dict[str, Any] field
+            content = content.model_dump()
+    if orjson is not None:
+        return orjson.dumps(content, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with pydantic-core / orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def add_compression(app):
+    """Compress response bodies of at least RESPONSE_COMPRESSION_MIN_BYTES."""
+    mode = settings.response_compression
+    if mode not in COMPRESSION_MODES:
+        raise ValueError(f"Unsupported response compression: {mode}. Choose one of {', '.join(COMPRESSION_MODES)}")
+    if mode == "off":
+        return
+    if mode == "auto":
+        try:
+            from brotli_asgi import BrotliMiddleware
+        except ImportError:
+            logger.info("brotli-asgi is not installed; compressing responses with gzip only")
+        else:
+            app.add_middleware(BrotliMiddleware, minimum_size=settings.response_compression_min_bytes,
+                               quality=settings.response_brotli_quality, gzip_fallback=True)
+            return
+    app.add_middleware(GZipMiddleware, minimum_size=settings.response_compression_min_bytes,
+                       compresslevel=settings.response_gzip_level)
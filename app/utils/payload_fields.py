@@ -0,0 +1,75 @@
+"""
+Field selection for the guidance and forecast analysis payloads.
+
+RAG answers carry the full retrieved context and the full text of every
+source chunk, which the UI does not show. By default `select_fields`
+replaces each answer's sources with short summaries (chunk id, title,
+snippet) and drops its context; clients fetch full chunks on demand from
+`/sources/{chunk_id}`. `include` brings the heavy parts back and `fields`
+limits the payload to some of its top-level keys.
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.config import settings
+
+# "context": the retrieved context string; "source_text": full source chunks
+INCLUDE_OPTIONS = ("context", "source_text")
+
+
+def parse_field_list(value: Optional[str]) -> List[str]:
+    """A comma separated query parameter as a list, ignoring blanks."""
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def source_title(metadata: Dict[str, Any]) -> str:
+    title = (metadata.get("title") or metadata.get("file_name")
+             or os.path.basename(metadata.get("source", "")) or "Untitled")
+    page = metadata.get("page")
+    return f"{title} (page {page})" if page not in (None, "") else title
+
+
+def summarize_source(source: Dict[str, Any], snippet_chars: Optional[int] = None) -> Dict[str, Any]:
+    """Chunk id, title and a short snippet of a RAG source."""
+    snippet_chars = settings.source_snippet_chars if snippet_chars is None else snippet_chars
+    content = " ".join(source.get("content", "").split())
+    if len(content) > snippet_chars:
+        # Cut at the last word boundary within the limit
+        content = content[:snippet_chars + 1].rsplit(" ", 1)[0][:snippet_chars] + "…"
+    return {"id": source.get("id"), "title": source_title(source.get("metadata") or {}), "snippet": content}
+
+
+def compact_answer(answer: Dict[str, Any], include: Iterable[str] = ()) -> Dict[str, Any]:
+    """A RAG answer without the parts `include` does not ask for."""
+    include = set(include)
+    compact = {key: value for key, value in answer.items() if key not in ("context", "sources")}
+    if "context" in include and "context" in answer:
+        compact["context"] = answer["context"]
+    if "sources" in answer:
+        compact["sources"] = (answer["sources"] if "source_text" in include
+                              else [summarize_source(source) for source in answer["sources"]])
+    return compact
+
+
+def select_fields(data: Dict[str, Any], answer_keys: Iterable[str], fields: Optional[str] = None,
+                  include: Optional[str] = None) -> Dict[str, Any]:
+    """Shape a payload whose `answer_keys` entries are RAG answers.
+
+    Raises ValueError for unknown fields or include options.
+    """
+    selected = parse_field_list(fields)
+    included = parse_field_list(include)
+    unknown = [field for field in selected if field not in data]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Choose from {', '.join(data)}")
+    unknown = [option for option in included if option not in INCLUDE_OPTIONS]
+    if unknown:
+        raise ValueError(f"Unknown include options: {', '.join(unknown)}. Choose from {', '.join(INCLUDE_OPTIONS)}")
+
+    answer_keys = set(answer_keys)
+    return {
+        key: compact_answer(value, included) if key in answer_keys and isinstance(value, dict) else value
+        for key, value in data.items()
+        if not selected or key in selected
+    }
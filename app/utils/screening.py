@@ -0,0 +1,116 @@
+"""
+Incremental parsing of bulk eligibility screening uploads.
+
+Facility lists arrive as JSON lines (one answer dict per line) or CSV with a
+header row. `ScreeningParser` turns raw text lines into answer dicts batch by
+batch, so an upload can be screened while it is still streaming in.
+"""
+
+import csv
+import json
+import codecs
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+SCREENING_FORMATS = ("ndjson", "csv")
+
+# A parsed row: (1-based row number, answers dict or an error message)
+ParsedRow = Tuple[int, Union[Dict[str, Any], str]]
+
+
+def detect_format(content_type: Optional[str], requested: Optional[str] = None) -> str:
+    """Pick the upload format from an explicit choice or the Content-Type."""
+    if requested:
+        requested = requested.lower()
+        if requested not in SCREENING_FORMATS:
+            raise ValueError(f"Unsupported format: {requested}. Choose one of {', '.join(SCREENING_FORMATS)}")
+        return requested
+    if content_type and "csv" in content_type.lower():
+        return "csv"
+    return "ndjson"
+
+
+async def iter_line_batches(chunks: AsyncIterator[bytes], batch_lines: int) -> AsyncIterator[List[str]]:
+    """Split a streamed body into batches of complete text lines."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    batch: List[str] = []
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        if "\n" not in pending:
+            continue
+        lines = pending.split("\n")
+        pending = lines.pop()
+        batch.extend(lines)
+        if len(batch) >= batch_lines:
+            yield batch
+            batch = []
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        batch.append(pending)
+    if batch:
+        yield batch
+
+
+class ScreeningParser:
+    """Stateful line parser; feed it batches of lines in upload order."""
+
+    def __init__(self, format: str):
+        self.format = format
+        self.rows_seen = 0
+        self._header: Optional[List[str]] = None
+        self._partial_record = ""
+
+    def parse(self, lines: List[str]) -> List[ParsedRow]:
+        if self.format == "csv":
+            return self._parse_csv(lines)
+        return self._parse_ndjson(lines)
+
+    def finish(self) -> List[ParsedRow]:
+        """Rows still buffered at the end of the upload (an unterminated quote)."""
+        if not self._partial_record:
+            return []
+        records, self._partial_record = [self._partial_record.rstrip("\n")], ""
+        return self._csv_rows(records)
+
+    def _parse_ndjson(self, lines: List[str]) -> List[ParsedRow]:
+        rows = []
+        for line in lines:
+            if not line.strip():
+                continue
+            self.rows_seen += 1
+            try:
+                answers = json.loads(line)
+            except ValueError as e:
+                rows.append((self.rows_seen, f"Invalid JSON: {e}"))
+                continue
+            if not isinstance(answers, dict):
+                rows.append((self.rows_seen, "Each line must be a JSON object of answers"))
+                continue
+            rows.append((self.rows_seen, answers))
+        return rows
+
+    def _parse_csv(self, lines: List[str]) -> List[ParsedRow]:
+        # Re-join lines that belong to one record (a quoted field with a newline);
+        # escaped quotes come in pairs, so an odd count means the quote is open
+        records = []
+        for line in lines:
+            record = self._partial_record + line if self._partial_record else line
+            if record.count('"') % 2:
+                self._partial_record = record + "\n"
+                continue
+            self._partial_record = ""
+            if record.strip():
+                records.append(record)
+
+        return self._csv_rows(records)
+
+    def _csv_rows(self, records: List[str]) -> List[ParsedRow]:
+        rows = []
+        for values in csv.reader(records):
+            if self._header is None:
+                self._header = [name.strip() for name in values]
+                continue
+            self.rows_seen += 1
+            rows.append((self.rows_seen, dict(zip(self._header, values))))
+        return rows
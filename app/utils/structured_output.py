@@ -0,0 +1,206 @@
+"""
+Parsing and validation of structured (JSON) LLM responses.
+
+`parse_json` tolerates what models wrap around their JSON: code fences,
+leading prose and trailing commas. It decodes with the C `raw_decode`
+from the first bracket and only rewrites the text when that fails.
+`validate_structured` checks the result against a pydantic model; for the
+example-dict schemas the services accept, `schema_model` derives (and
+caches) a model whose fields and types follow the example.
+"""
+
+import re
+import json
+import threading
+from typing import Any, Dict, List, Optional, Type, Union
+
+from pydantic import BaseModel, ConfigDict, ValidationError, create_model
+
+Schema = Union[Dict[str, Any], Type[BaseModel]]
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_decoder = json.JSONDecoder()
+
+
+class StructuredOutputError(ValueError):
+    """A structured response could not be parsed or failed validation."""
+
+    def __init__(self, message: str, text: str, kind: str):
+        super().__init__(message)
+        self.text = text
+        self.kind = kind  # "parse" or "validation"
+
+
+def _strip_trailing_commas(text: str) -> str:
+    # Commas before a closing bracket, outside string literals
+    parts = re.split(r'("(?:[^"\\]|\\.)*")', text)
+    return "".join(part if i % 2 else _TRAILING_COMMA.sub(r"\1", part) for i, part in enumerate(parts))
+
+
+def _decode_from_bracket(text: str) -> Any:
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("no JSON object or array found")
+    value, _ = _decoder.raw_decode(text, min(starts))
+    return value
+
+
+def parse_json(text: str) -> Any:
+    """Decode the JSON value in a model response.
+
+    Raises StructuredOutputError (kind "parse") when no JSON can be recovered.
+    """
+    candidate = text.strip()
+    fenced = _FENCE.search(candidate)
+    if fenced:
+        candidate = fenced.group(1).strip()
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        pass
+
+    for attempt in (candidate, _strip_trailing_commas(candidate)):
+        try:
+            return _decode_from_bracket(attempt)
+        except ValueError as e:
+            error = e
+    raise StructuredOutputError(f"Failed to parse structured response: {error}", text, "parse")
+
+
+def _example_type(value: Any, name: str) -> Any:
+    if isinstance(value, bool):
+        return bool
+    if isinstance(value, (int, float)):
+        return Union[int, float]
+    if isinstance(value, str):
+        return str
+    if isinstance(value, dict):
+        return _model_from_example(value, name)
+    if isinstance(value, list):
+        return List[_example_type(value[0], name)] if value else List[Any]
+    return Any
+
+
+def _model_from_example(example: Dict[str, Any], name: str) -> Type[BaseModel]:
+    fields = {}
+    for key, value in example.items():
+        # Explicit nulls in the example mark optional fields
+        if value is None:
+            fields[key] = (Optional[Any], None)
+        else:
+            fields[key] = (_example_type(value, f"{name}_{key}"), ...)
+    return create_model(name, __config__=ConfigDict(extra="allow"), **fields)
+
+
+_models: Dict[str, Type[BaseModel]] = {}
+_models_lock = threading.Lock()
+
+
+def schema_model(schema: Schema) -> Type[BaseModel]:
+    """The pydantic model a structured response is validated against."""
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        return schema
+    if not isinstance(schema, dict):
+        raise TypeError("A structured response schema must be an example dict or a pydantic model")
+    key = json.dumps(schema, sort_keys=True, default=str)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            model = _models[key] = _model_from_example(schema, "StructuredResponse")
+        return model
+
+
+def schema_prompt_example(schema: Schema) -> Dict[str, Any]:
+    """What to show the model as the expected JSON."""
+    if isinstance(schema, dict):
+        return schema
+    return schema.model_json_schema()
+
+
+_JSON_SCHEMA_PLACEHOLDERS = {"string": "", "integer": 0, "number": 0.0, "boolean": False, "null": None}
+
+
+def _json_schema_example(node: Dict[str, Any], defs: Dict[str, Any]) -> Any:
+    if "$ref" in node:
+        return _json_schema_example(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+    if "default" in node:
+        return node["default"]
+    if "enum" in node:
+        return node["enum"][0]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in node:
+            options = [option for option in node[key] if option.get("type") != "null"] or node[key]
+            return _json_schema_example(options[0], defs)
+    kind = node.get("type", "object")
+    if kind == "object":
+        return {name: _json_schema_example(child, defs) for name, child in node.get("properties", {}).items()}
+    if kind == "array":
+        return []
+    return _JSON_SCHEMA_PLACEHOLDERS.get(kind)
+
+
+def schema_example(schema: Schema) -> Dict[str, Any]:
+    """A placeholder value that validates against `schema` (used by the offline stand-in model)."""
+    if isinstance(schema, dict):
+        return schema
+    json_schema = schema_prompt_example(schema)
+    return _json_schema_example(json_schema, json_schema.get("$defs", {}))
+
+
+def validate_structured(text: str, schema: Schema) -> Dict[str, Any]:
+    """Parse a response and validate it, returning the validated data as a dict."""
+    data = parse_json(text)
+    try:
+        return schema_model(schema).model_validate(data).model_dump()
+    except ValidationError as e:
+        errors = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'response'}: {error['msg']}"
+            for error in e.errors()
+        )
+        raise StructuredOutputError(f"Structured response failed validation: {errors}", text, "validation")
+
+
+class StructuredOutputMetrics:
+    """Counts of structured responses, parse/validation failures and retries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.native_json_mode = 0
+        self.parse_failures = 0
+        self.validation_failures = 0
+        self.retries = 0
+        self.failed_requests = 0
+
+    def record_response(self, native_json_mode: bool):
+        with self._lock:
+            self.responses += 1
+            self.native_json_mode += int(native_json_mode)
+
+    def record_error(self, error: StructuredOutputError, retrying: bool):
+        with self._lock:
+            if error.kind == "parse":
+                self.parse_failures += 1
+            else:
+                self.validation_failures += 1
+            if retrying:
+                self.retries += 1
+            else:
+                self.failed_requests += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            failures = self.parse_failures + self.validation_failures
+            return {
+                "responses": self.responses,
+                "native_json_mode": self.native_json_mode,
+                "parse_failures": self.parse_failures,
+                "validation_failures": self.validation_failures,
+                "failure_rate": failures / self.responses if self.responses else 0.0,
+                "retries": self.retries,
+                "failed_requests": self.failed_requests
+            }
+
+
+structured_output_metrics = StructuredOutputMetrics()
@@ -0,0 +1,301 @@
+"""
+Helpers for managing the persisted Chroma vector index.
+
+The live index is addressed through ``settings.vector_db_path``. Rebuilt
+indexes are written to a sibling ``<vector_db_path>.generations/`` directory
+and swapped in by atomically repointing ``vector_db_path`` (a symlink) at the
+new generation, so readers never open a half-built collection. A generation
+that stops being live is kept until every worker has had time to notice.
+"""
+
+import os
+import shutil
+import time
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import chromadb
+
+from app.config import settings
+from app.utils.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+# Collection name used by langchain_chroma when none is given
+COLLECTION_NAME = "langchain"
+
+
+def hnsw_collection_metadata() -> Dict[str, Any]:
+    """Chroma collection metadata carrying the configured HNSW parameters."""
+    return {
+        "hnsw:space": settings.hnsw_space,
+        "hnsw:M": settings.hnsw_m,
+        "hnsw:construction_ef": settings.hnsw_ef_construction,
+        "hnsw:search_ef": settings.hnsw_ef_search,
+    }
+
+
+def resolve_live_path(live_path: Optional[str] = None) -> Path:
+    """Resolve the directory currently serving as the live index."""
+    return Path(os.path.realpath(live_path or settings.vector_db_path))
+
+
+def generations_dir(live_path: Optional[str] = None) -> Path:
+    """Directory holding all index generations for a live path."""
+    live = Path(live_path or settings.vector_db_path)
+    return live.with_name(live.name + ".generations")
+
+
+def new_generation_path(live_path: Optional[str] = None, suffix: str = "") -> Path:
+    """Return a fresh, not yet existing generation directory path."""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = generations_dir(live_path) / f"{stamp}-{os.getpid()}{suffix}"
+    counter = 1
+    while path.exists():
+        path = generations_dir(live_path) / f"{stamp}-{os.getpid()}-{counter}{suffix}"
+        counter += 1
+    return path
+
+
+def rebuild_lock(live_path: Optional[str] = None) -> FileLock:
+    """Lock serializing the processes that build and swap in generations of a live path."""
+    live = Path(live_path or settings.vector_db_path)
+    live.parent.mkdir(parents=True, exist_ok=True)
+    return FileLock(str(live.with_name(live.name + ".rebuild.lock")))
+
+
+def activate_generation(generation_path: Path, live_path: Optional[str] = None) -> Path:
+    """Atomically point the live path at a generation directory."""
+    live = Path(live_path or settings.vector_db_path)
+    generation = Path(generation_path).resolve()
+    previous = resolve_live_path(str(live)) if live.is_symlink() else None
+
+    if live.exists() and not live.is_symlink():
+        # One-time migration of a plain directory into the generations layout
+        legacy = new_generation_path(str(live), suffix="-legacy")
+        legacy.parent.mkdir(parents=True, exist_ok=True)
+        os.rename(live, legacy)
+        logger.info(f"Moved existing index {live} to {legacy}")
+
+    tmp_link = live.with_name(live.name + ".tmp-link")
+    if tmp_link.is_symlink() or tmp_link.exists():
+        tmp_link.unlink()
+    os.symlink(os.path.relpath(generation, live.parent.resolve()), tmp_link, target_is_directory=True)
+    os.replace(tmp_link, live)
+    if previous is not None and previous != generation and previous.exists():
+        # Its mtime now says when it was retired, for prune_generations
+        os.utime(previous)
+
+    logger.info(f"Activated index generation {generation}")
+    return generation
+
+
+def prune_generations(keep: Optional[int] = None, live_path: Optional[str] = None,
+                      min_age_seconds: Optional[float] = None) -> List[Path]:
+    """Delete old generations, keeping the active one and the newest `keep` others.
+
+    Generations retired less than `min_age_seconds` ago are kept too: other
+    workers only re-check the live path every INDEX_RELOAD_CHECK_SECONDS and
+    may still be reading them.
+    """
+    if keep is None:
+        keep = settings.index_generations_to_keep
+    if min_age_seconds is None:
+        # One check interval to notice the swap, one more for queries already running
+        min_age_seconds = 2 * settings.index_reload_check_seconds
+
+    root = generations_dir(live_path)
+    if not root.exists():
+        return []
+
+    active = resolve_live_path(live_path)
+    candidates = sorted(
+        (path for path in root.iterdir() if path.is_dir() and path.resolve() != active),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True
+    )
+
+    removed = []
+    now = time.time()
+    for path in candidates[keep:]:
+        if now - path.stat().st_mtime < min_age_seconds:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(path)
+    return removed
+
+
+def directory_size(path: Path) -> int:
+    """Total size in bytes of all files below a directory."""
+    total = 0
+    for root, _, files in os.walk(os.path.realpath(path)):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def open_collection(path: Path, create: bool = True):
+    """Open the Chroma collection stored at `path` without an embedding function."""
+    client = chromadb.PersistentClient(path=str(path))
+    if create:
+        return client.get_or_create_collection(
+            COLLECTION_NAME,
+            metadata=hnsw_collection_metadata(),
+            embedding_function=None
+        )
+    return client.get_collection(COLLECTION_NAME, embedding_function=None)
+
+
+def _distances(vectors: np.ndarray, queries: np.ndarray, space: str = "l2") -> np.ndarray:
+    """Distance of each query to each vector, lower is closer."""
+    if space == "cosine":
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        return -(queries @ vectors.T)
+    if space == "ip":
+        return -(queries @ vectors.T)
+    # Squared L2 without materialising the pairwise difference tensor
+    return (
+        np.sum(queries * queries, axis=1, keepdims=True)
+        - 2.0 * (queries @ vectors.T)
+        + np.sum(vectors * vectors, axis=1)[None, :]
+    )
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k lowest scores of each row, lowest first."""
+    top = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def brute_force_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, space: str = "l2") -> np.ndarray:
+    """Exact top-k row indices of `vectors` for each query, best first."""
+    k = min(k, len(vectors))
+    if k == 0:
+        return np.empty((len(queries), 0), dtype=np.int64)
+    return _top_k(_distances(vectors, queries, space), k)
+
+
+def brute_force_top_k_ids(collection, queries: np.ndarray, k: int, space: str = "l2",
+                          batch_size: int = 1000) -> List[List[str]]:
+    """Exact top-k ids of a collection for each query, reading its embeddings one batch at a time."""
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    best_ids = np.empty((len(queries), 0), dtype=object)
+    offset = 0
+    while True:
+        batch = collection.get(limit=batch_size, offset=offset, include=["embeddings"])
+        if not batch["ids"]:
+            break
+        offset += len(batch["ids"])
+        scores = np.concatenate([best_scores, _distances(np.asarray(batch["embeddings"], dtype=np.float32),
+                                                         queries, space)], axis=1)
+        ids = np.concatenate([best_ids, np.tile(np.asarray(batch["ids"], dtype=object), (len(queries), 1))], axis=1)
+        top = _top_k(scores, min(k, scores.shape[1]))
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+    return best_ids.tolist()
+
+
+def measure_recall(collection, k: Optional[int] = None, sample_size: Optional[int] = None) -> Optional[float]:
+    """Recall@k of the HNSW index against brute force, using stored vectors as queries.
+
+    Only the sampled embeddings are loaded at once; the exact search streams
+    the rest of the collection in batches. It still reads every embedding,
+    so callers keep it off the event loop.
+    """
+    if k is None:
+        k = settings.top_k_retrieval
+    if sample_size is None:
+        sample_size = settings.index_recall_sample_size
+    sample_size = min(sample_size, settings.index_recall_max_sample_size)
+
+    ids = collection.get(include=[])["ids"]
+    if not ids or sample_size <= 0:
+        return None
+
+    rng = np.random.default_rng(0)
+    sample_ids = [ids[index] for index in rng.choice(len(ids), size=min(sample_size, len(ids)), replace=False)]
+    queries = np.asarray(collection.get(ids=sample_ids, include=["embeddings"])["embeddings"], dtype=np.float32)
+    k = min(k, len(ids))
+
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    exact = brute_force_top_k_ids(collection, queries, k, space)
+    approx = collection.query(query_embeddings=queries, n_results=k, include=[])
+
+    hits = 0
+    for exact_ids, approx_ids in zip(exact, approx["ids"]):
+        hits += len(set(exact_ids) & set(approx_ids))
+    return hits / (len(queries) * k)
+
+
+def collection_stats(collection, persist_directory: Path, recall_sample_size: Optional[int] = None) -> Dict[str, Any]:
+    """Size, configuration and recall statistics for a collection."""
+    metadata = collection.metadata or {}
+    count = collection.count()
+
+    embedding_dimension = None
+    if count:
+        peek = collection.get(limit=1, include=["embeddings"])
+        embedding_dimension = len(peek["embeddings"][0])
+
+    if recall_sample_size is None:
+        recall_sample_size = settings.index_recall_sample_size
+    recall_sample_size = max(min(recall_sample_size, settings.index_recall_max_sample_size), 0)
+
+    return {
+        "total_documents": count,
+        "element_count": count,
+        "collection_name": collection.name,
+        "embedding_dimension": embedding_dimension,
+        "hnsw": {
+            "space": metadata.get("hnsw:space", "l2"),
+            "M": metadata.get("hnsw:M"),
+            "ef_construction": metadata.get("hnsw:construction_ef"),
+            "ef_search": metadata.get("hnsw:search_ef"),
+        },
+        "persist_directory": str(persist_directory),
+        "index_size_bytes": directory_size(persist_directory),
+        "recall_at_k": measure_recall(collection, sample_size=recall_sample_size) if count and recall_sample_size else None,
+        "recall_k": min(settings.top_k_retrieval, count),
+        "recall_sample_size": min(recall_sample_size, count),
+    }
+
+
+def compact_collection(source_path: Path, target_path: Path, batch_size: int = 500) -> Dict[str, Any]:
+    """Copy every record of a collection into a freshly built one, without re-embedding."""
+    source = open_collection(source_path, create=False)
+    target_path.mkdir(parents=True, exist_ok=True)
+    target = open_collection(target_path)
+
+    copied = 0
+    offset = 0
+    while True:
+        batch = source.get(
+            limit=batch_size,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        if not batch["ids"]:
+            break
+        target.add(
+            ids=batch["ids"],
+            embeddings=batch["embeddings"],
+            documents=batch["documents"],
+            metadatas=batch["metadatas"]
+        )
+        copied += len(batch["ids"])
+        offset += batch_size
+
+    return {
+        "source": str(source_path),
+        "target": str(target_path),
+        "records_copied": copied,
+        "source_size_bytes": directory_size(source_path),
+        "target_size_bytes": directory_size(target_path),
+    }
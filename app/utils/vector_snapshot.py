@@ -0,0 +1,303 @@
+"""
+Read-only, memory-mapped snapshot of the vector index for multi-worker serving.
+
+A snapshot directory holds:
+    vectors.bin     row-major float16/float32 embedding matrix
+    norms.npy       squared L2 norm of every row (float32)
+    texts.bin       UTF-8 chunk texts, concatenated
+    offsets.npy     byte offsets into texts.bin (count + 1 entries)
+    centroids.npy   IVF centroids (only when built with IVF lists)
+    manifest.json   dtype, dimension, metric, chunk ids (row order),
+                    metadata and IVF list boundaries
+
+All large files are opened with mmap, so every worker on a node shares one
+page-cached copy instead of holding its own index in RAM. Search is brute
+force (or IVF-probed) NumPy over the mapped matrix.
+"""
+
+import os
+import json
+import mmap
+import shutil
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+from app.config import settings
+from app.utils.vector_index import new_generation_path, activate_generation, prune_generations
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Rows scored per matrix multiply; bounds the float32 temporaries per query batch
+SEARCH_BLOCK_ROWS = 65536
+
+
+def _kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means returning the centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _nearest_centroids(vectors, centroids)
+        for list_id in range(n_lists):
+            members = vectors[assignments == list_id]
+            if len(members):
+                centroids[list_id] = members.mean(axis=0)
+    return centroids
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    distances = (
+        np.sum(centroids * centroids, axis=1)[None, :]
+        - 2.0 * (vectors @ centroids.T)
+    )
+    return distances.argmin(axis=1)
+
+
+def write_snapshot(
+    output_dir: Path,
+    ids: List[str],
+    vectors: np.ndarray,
+    documents: List[str],
+    metadatas: List[Optional[Dict[str, Any]]],
+    space: str = "l2",
+    dtype: Optional[str] = None,
+    ivf_lists: int = 0
+) -> Dict[str, Any]:
+    """Write a snapshot directory from in-memory chunk data."""
+    dtype = dtype or settings.vector_snapshot_dtype
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if space == "cosine":
+        # Pre-normalise so cosine search is a plain dot product
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    order = np.arange(len(ids))
+    list_offsets = None
+    ivf_lists = min(ivf_lists, len(ids))
+    if ivf_lists > 1:
+        centroids = _kmeans(vectors, ivf_lists)
+        assignments = _nearest_centroids(vectors, centroids)
+        # Lay rows out list by list so each IVF list is one contiguous slice
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=ivf_lists)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).tolist()
+        np.save(output_dir / "centroids.npy", centroids.astype(np.float32))
+
+    stored = vectors[order].astype(dtype)
+    stored.tofile(output_dir / "vectors.bin")
+    rounded = stored.astype(np.float32)
+    np.save(output_dir / "norms.npy", np.sum(rounded * rounded, axis=1))
+
+    offsets = [0]
+    with open(output_dir / "texts.bin", "wb") as f:
+        for row in order:
+            encoded = (documents[row] or "").encode("utf-8")
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    np.save(output_dir / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "dtype": dtype,
+        "dimension": int(vectors.shape[1]) if len(vectors) else 0,
+        "count": len(ids),
+        "space": space,
+        "ids": [ids[row] for row in order],
+        "metadatas": [metadatas[row] or {} for row in order],
+        "ivf_list_offsets": list_offsets
+    }
+    with open(output_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f)
+
+    return {
+        "path": str(output_dir),
+        "count": len(ids),
+        "dtype": dtype,
+        "ivf_lists": ivf_lists if list_offsets else 0,
+        "vectors_bytes": os.path.getsize(output_dir / "vectors.bin")
+    }
+
+
+def export_collection_snapshot(
+    collection,
+    live_path: Optional[str] = None,
+    dtype: Optional[str] = None,
+    ivf_lists: Optional[int] = None,
+    batch_size: int = 1000
+) -> Dict[str, Any]:
+    """Export a Chroma collection to a new snapshot generation and activate it."""
+    live_path = live_path or settings.vector_snapshot_path
+    dtype = dtype or settings.vector_snapshot_dtype
+    if ivf_lists is None:
+        ivf_lists = settings.vector_snapshot_ivf_lists
+
+    ids, vectors, documents, metadatas = [], [], [], []
+    offset = 0
+    while True:
+        batch = collection.get(
+            limit=batch_size,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        if not batch["ids"]:
+            break
+        ids.extend(batch["ids"])
+        vectors.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        documents.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+        offset += batch_size
+
+    if not ids:
+        raise ValueError("Collection is empty; nothing to export")
+
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    generation = new_generation_path(live_path)
+    try:
+        result = write_snapshot(
+            generation, ids, np.concatenate(vectors), documents, metadatas,
+            space=space, dtype=dtype, ivf_lists=ivf_lists
+        )
+    except Exception:
+        shutil.rmtree(generation, ignore_errors=True)
+        raise
+
+    activate_generation(generation, live_path)
+    prune_generations(live_path=live_path)
+    return result
+
+
+class VectorSnapshot:
+    """Memory-mapped, read-only view of a snapshot directory."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / "manifest.json", "r") as f:
+            manifest = json.load(f)
+
+        if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {self.path}")
+
+        self.space = manifest["space"]
+        self.dimension = manifest["dimension"]
+        self.ids: List[str] = manifest["ids"]
+        self.metadatas: List[Dict[str, Any]] = manifest["metadatas"]
+        self.ivf_list_offsets = manifest.get("ivf_list_offsets")
+        self._row_by_id: Optional[Dict[str, int]] = None
+
+        self.vectors = np.memmap(
+            self.path / "vectors.bin",
+            dtype=manifest["dtype"],
+            mode="r",
+            shape=(manifest["count"], self.dimension)
+        )
+        self.norms = np.load(self.path / "norms.npy", mmap_mode="r")
+        self.offsets = np.load(self.path / "offsets.npy", mmap_mode="r")
+        self.centroids = None
+        if self.ivf_list_offsets:
+            self.centroids = np.load(self.path / "centroids.npy")
+
+        with open(self.path / "texts.bin", "rb") as f:
+            self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row_of(self, chunk_id: str) -> Optional[int]:
+        """Row offset of a chunk id."""
+        if self._row_by_id is None:
+            self._row_by_id = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        return self._row_by_id.get(chunk_id)
+
+    def document(self, row: int) -> Document:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return Document(
+            page_content=self._texts[start:end].decode("utf-8"),
+            metadata=dict(self.metadatas[row]),
+            id=self.ids[row]
+        )
+
+    def _scores(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        """Distances (lower is better) between queries and rows [start, end)."""
+        block = np.asarray(self.vectors[start:end], dtype=np.float32)
+        dots = queries @ block.T
+        if self.space == "l2":
+            return (
+                np.sum(queries * queries, axis=1, keepdims=True)
+                - 2.0 * dots
+                + np.asarray(self.norms[start:end])[None, :]
+            )
+        # cosine (rows are pre-normalised) and inner product
+        return 1.0 - dots
+
+    def _candidate_ranges(self, queries: np.ndarray, nprobe: int) -> List[List[Tuple[int, int]]]:
+        """Row ranges each query should scan."""
+        if self.centroids is None:
+            ranges = [(start, min(start + SEARCH_BLOCK_ROWS, len(self)))
+                      for start in range(0, len(self), SEARCH_BLOCK_ROWS)]
+            return [ranges] * len(queries)
+
+        nprobe = min(nprobe, len(self.centroids))
+        probes = np.argsort(_centroid_distances(queries, self.centroids), axis=1)[:, :nprobe]
+        offsets = self.ivf_list_offsets
+        return [
+            [(offsets[list_id], offsets[list_id + 1]) for list_id in row if offsets[list_id + 1] > offsets[list_id]]
+            for row in probes
+        ]
+
+    def search(self, queries: np.ndarray, k: int, nprobe: Optional[int] = None) -> List[List[Tuple[int, float]]]:
+        """Top-k (row, distance) pairs for each query vector, best first."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.space == "cosine":
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        if nprobe is None:
+            nprobe = settings.vector_snapshot_nprobe
+
+        if self.centroids is None:
+            # Exact search: score every query against each block in one multiply
+            best_rows = np.empty((len(queries), 0), dtype=np.int64)
+            best_scores = np.empty((len(queries), 0), dtype=np.float32)
+            for start, end in self._candidate_ranges(queries[:1], nprobe)[0]:
+                scores = np.concatenate([best_scores, self._scores(queries, start, end)], axis=1)
+                rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), (len(queries), end - start))], axis=1)
+                best_rows, best_scores = _top_k(rows, scores, k)
+            return [list(zip(rows.tolist(), scores.tolist())) for rows, scores in zip(best_rows, best_scores)]
+
+        results = []
+        for query, ranges in zip(queries, self._candidate_ranges(queries, nprobe)):
+            if not ranges:
+                results.append([])
+                continue
+            rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+            scores = np.concatenate([self._scores(query[None, :], start, end)[0] for start, end in ranges])
+            top_rows, top_scores = _top_k(rows[None, :], scores[None, :], k)
+            results.append(list(zip(top_rows[0].tolist(), top_scores[0].tolist())))
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int) -> List[Document]:
+        return [self.document(row) for row, _ in self.search(np.asarray([embedding]), k)[0]]
+
+
+def _centroid_distances(queries: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.sum(centroids * centroids, axis=1)[None, :] - 2.0 * (queries @ centroids.T)
+
+
+def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the k lowest scores per row of a (queries, candidates) matrix, sorted."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return rows[:, :0], scores[:, :0]
+    top = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = top_scores.argsort(axis=1)
+    return (
+        np.take_along_axis(np.take_along_axis(rows, top, axis=1), order, axis=1),
+        np.take_along_axis(top_scores, order, axis=1)
+    )
@@ -0,0 +1,677 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the 45Q Tax Credit application.
+
+Each subcommand measures one hot path in isolation and prints a short report.
+Measurements that compare two implementations run each side in a fresh
+subprocess so peak memory figures do not bleed into each other.
+
+Usage:
+    python benchmark.py rebuild [--documents app/data/documents] [--fake-embeddings]
+    python benchmark.py embeddings [--backends torch,onnx,onnx-int8] [--queries 200]
+    python benchmark.py retrieval [--documents app/data/documents] [--queries 200]
+    python benchmark.py batch-retrieval [--documents app/data/documents] [--batch-sizes 1,4,16,64] [--fake-embeddings]
+    python benchmark.py sessions [--backends unbounded,memory,sqlite] [--sessions 1000000]
+    python benchmark.py start-assessment [--sessions 100000]
+    python benchmark.py rules [--rows 100000]
+    python benchmark.py screening [--rows 100000] [--format ndjson]
+    python benchmark.py load [--endpoint complete-enhanced-assessment] [--requests 500] [--concurrency 50]
+    python benchmark.py serialization [--repeat 200]
+"""
+
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import multiprocessing
+
+# Services construct an LLM client on start-up; benchmarks never call it
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-placeholder")
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _current_rss_mb() -> float:
+    """Current (not peak) resident set size of this process in MB."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+
+
+def _make_rag_service(fake_embeddings: bool):
+    from app.services.rag_service import RAGService
+
+    embeddings = None
+    if fake_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        embeddings = DeterministicFakeEmbedding(size=384)
+    return RAGService(embeddings=embeddings)
+
+
+def _legacy_update_knowledge_base(rag_service, documents_directory: str):
+    """The pre-rebuild update path: split twice and append to the live collection."""
+    from langchain_chroma import Chroma
+    from app.config import settings
+
+    documents = rag_service.load_documents(documents_directory)
+    chunks = rag_service.split_documents(documents)
+    rag_service.vector_store = Chroma(
+        persist_directory=settings.vector_db_path,
+        embedding_function=rag_service.embeddings
+    )
+    rag_service.vector_store.add_documents(rag_service.split_documents(documents))
+    return len(chunks)
+
+
+def _run_isolated(target, *args) -> dict:
+    """Run a measurement function in a fresh interpreter and return its result."""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_report_to_queue, args=(queue, target) + args)
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _report_to_queue(queue, target, *args):
+    try:
+        queue.put(target(*args))
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def _run_rebuild(path: str, documents: str, fake_embeddings: bool) -> dict:
+    from app.config import settings
+
+    with tempfile.TemporaryDirectory() as workdir:
+        settings.vector_db_path = os.path.join(workdir, "vector_db")
+        rag_service = _make_rag_service(fake_embeddings)
+
+        baseline_rss = _peak_rss_mb()
+        tracemalloc.start()
+        start = time.perf_counter()
+        if path == "legacy":
+            chunks = _legacy_update_knowledge_base(rag_service, documents)
+        else:
+            chunks = rag_service.update_knowledge_base(documents)["total_chunks"]
+        elapsed = time.perf_counter() - start
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "chunks": chunks,
+            "seconds": elapsed,
+            "python_peak_mb": traced_peak / (1024 * 1024),
+            "rss_growth_mb": _peak_rss_mb() - baseline_rss
+        }
+
+
+def bench_rebuild(args):
+    """Compare the legacy append-based update with the blue/green rebuild."""
+    print(f"Rebuild benchmark on {args.documents} "
+          f"({'fake' if args.fake_embeddings else 'model'} embeddings)")
+    print(f"{'path':<10}{'chunks':>8}{'seconds':>10}{'py peak MB':>12}{'RSS +MB':>10}")
+
+    for path in ("legacy", "rebuild"):
+        result = _run_isolated(_run_rebuild, path, args.documents, args.fake_embeddings)
+        if "error" in result:
+            print(f"{path:<10}failed: {result['error'][:120]}")
+            continue
+        print(f"{path:<10}{result['chunks']:>8}{result['seconds']:>10.2f}"
+              f"{result['python_peak_mb']:>12.1f}{result['rss_growth_mb']:>10.1f}")
+
+
+def _run_embeddings(backend: str, queries: int) -> dict:
+    # Cold start covers module imports, model load and the first query
+    start = time.perf_counter()
+    from app.services.embedding_service import create_embeddings
+    embeddings = create_embeddings(backend)
+    embeddings.embed_query("45Q credit for direct air capture")
+    cold_start = time.perf_counter() - start
+
+    texts = [f"What is the 45Q credit rate for facility {i} capturing {i * 1000} tons?" for i in range(queries)]
+    start = time.perf_counter()
+    for text in texts:
+        embeddings.embed_query(text)
+    elapsed = time.perf_counter() - start
+
+    return {"cold_start": cold_start, "qps": queries / elapsed, "rss_mb": _peak_rss_mb()}
+
+
+def bench_embeddings(args):
+    """Query embedding throughput and cold-start time per embedding backend."""
+    print(f"Embedding benchmark: {args.queries} single queries per backend")
+    print(f"{'backend':<12}{'cold start s':>14}{'queries/s':>12}{'peak RSS MB':>13}")
+
+    for backend in args.backends.split(","):
+        result = _run_isolated(_run_embeddings, backend, args.queries)
+        if "error" in result:
+            print(f"{backend:<12}failed: {result['error'][:120]}")
+            continue
+        print(f"{backend:<12}{result['cold_start']:>14.2f}{result['qps']:>12.1f}{result['rss_mb']:>13.0f}")
+
+
+def _run_retrieval(backend: str, workdir: str, queries: int) -> dict:
+    from app.config import settings
+
+    settings.vector_db_path = os.path.join(workdir, "vector_db")
+    settings.vector_snapshot_path = os.path.join(workdir, "vector_snapshot")
+    settings.retrieval_backend = backend
+
+    rag_service = _make_rag_service(fake_embeddings=True)
+    baseline_rss = _current_rss_mb()
+    rag_service.retrieve_relevant_documents("45Q credit for direct air capture")
+    loaded_rss = _current_rss_mb()
+
+    texts = [f"What is the 45Q credit rate for facility {i}?" for i in range(queries)]
+    start = time.perf_counter()
+    for text in texts:
+        rag_service.retrieve_relevant_documents(text)
+    elapsed = time.perf_counter() - start
+
+    return {"rss_growth_mb": loaded_rss - baseline_rss, "qps": queries / elapsed}
+
+
+def _prepare_retrieval_index(workdir: str, documents: str, fake_embeddings: bool = True) -> int:
+    from app.config import settings
+    from app.utils.vector_index import open_collection, resolve_live_path
+    from app.utils.vector_snapshot import export_collection_snapshot
+
+    settings.vector_db_path = os.path.join(workdir, "vector_db")
+    settings.vector_snapshot_path = os.path.join(workdir, "vector_snapshot")
+    chunks = _make_rag_service(fake_embeddings).update_knowledge_base(documents)["total_chunks"]
+    export_collection_snapshot(open_collection(resolve_live_path(), create=False))
+    return chunks
+
+
+def bench_retrieval(args):
+    """Per-worker memory and query speed of Chroma versus the mmap snapshot."""
+    with tempfile.TemporaryDirectory() as workdir:
+        chunks = _run_isolated(_prepare_retrieval_index, workdir, args.documents)
+        if isinstance(chunks, dict):
+            print(f"Index build failed: {chunks['error'][:120]}")
+            return 1
+
+        print(f"Retrieval benchmark: {chunks} chunks, {args.queries} queries (fake embeddings)")
+        print(f"{'backend':<10}{'index RSS +MB':>15}{'queries/s':>12}")
+        for backend in ("chroma", "snapshot"):
+            result = _run_isolated(_run_retrieval, backend, workdir, args.queries)
+            if "error" in result:
+                print(f"{backend:<10}failed: {result['error'][:120]}")
+                continue
+            print(f"{backend:<10}{result['rss_growth_mb']:>15.1f}{result['qps']:>12.1f}")
+
+
+def _run_batch_retrieval(workdir: str, batch_sizes: list, fake_embeddings: bool) -> dict:
+    from app.config import settings
+
+    settings.vector_db_path = os.path.join(workdir, "vector_db")
+    rag_service = _make_rag_service(fake_embeddings)
+    texts = [f"What is the 45Q credit rate for facility {i} capturing {i * 1000} tons?"
+             for i in range(max(batch_sizes) * 4)]
+    rag_service.retrieve_many(texts[:2])
+
+    timings = {}
+    start = time.perf_counter()
+    for text in texts:
+        rag_service.retrieve_relevant_documents(text)
+    timings["loop"] = (time.perf_counter() - start) / len(texts)
+
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            rag_service.retrieve_many(texts[i:i + batch_size])
+        timings[batch_size] = (time.perf_counter() - start) / len(texts)
+    return timings
+
+
+def bench_batch_retrieval(args):
+    """Per-query retrieval cost of single queries versus retrieve_many batches."""
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    with tempfile.TemporaryDirectory() as workdir:
+        chunks = _run_isolated(_prepare_retrieval_index, workdir, args.documents, args.fake_embeddings)
+        if isinstance(chunks, dict):
+            print(f"Index build failed: {chunks['error'][:120]}")
+            return 1
+
+        result = _run_isolated(_run_batch_retrieval, workdir, batch_sizes, args.fake_embeddings)
+        if "error" in result:
+            print(f"Batch retrieval failed: {result['error'][:120]}")
+            return 1
+
+    print(f"Batch retrieval benchmark: {chunks} chunks "
+          f"({'fake' if args.fake_embeddings else 'model'} embeddings)")
+    print(f"{'mode':<14}{'ms/query':>10}")
+    print(f"{'single loop':<14}{result.pop('loop') * 1000:>10.2f}")
+    for batch_size, seconds in result.items():
+        print(f"{'batch ' + str(batch_size):<14}{seconds * 1000:>10.2f}")
+
+
+def _run_sessions(backend: str, sessions: int, workdir: str) -> dict:
+    from app.config import settings
+    from app.services.eligibility_service import EligibilityService
+    from app.services.session_store import InMemorySessionStore, create_session_store
+
+    settings.vector_db_path = os.path.join(workdir, "vector_db")
+    settings.session_db_path = os.path.join(workdir, f"sessions-{os.getpid()}.db")
+    if backend == "unbounded":
+        # The previous behaviour: a plain dict that never forgets a session
+        store = InMemorySessionStore(max_sessions=sessions, ttl_seconds=float("inf"))
+    else:
+        store = create_session_store(backend)
+    eligibility_service = EligibilityService(sessions=store, rag_service=_make_rag_service(fake_embeddings=True))
+
+    checkpoints = {}
+    baseline_rss = _current_rss_mb()
+    start = time.perf_counter()
+    for i in range(1, sessions + 1):
+        eligibility_service.start_assessment()
+        if i % (sessions // 10 or 1) == 0:
+            checkpoints[i] = _current_rss_mb() - baseline_rss
+    elapsed = time.perf_counter() - start
+    store.close()
+
+    return {"sessions_per_second": sessions / elapsed, "rss_growth_mb": checkpoints}
+
+
+def bench_sessions(args):
+    """Memory growth while starting many assessments that are never finished."""
+    print(f"Session soak test: {args.sessions:,} started assessments per store")
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend in args.backends.split(","):
+            result = _run_isolated(_run_sessions, backend, args.sessions, workdir)
+            if "error" in result:
+                print(f"{backend:<10}failed: {result['error'][:120]}")
+                continue
+            growth = result["rss_growth_mb"]
+            trail = "  ".join(f"{count // 1000}k:{mb:.0f}" for count, mb in growth.items())
+            print(f"{backend:<10}{result['sessions_per_second']:>9.0f}/s  RSS +MB  {trail}")
+
+
+def _run_start_assessment(variant: str, sessions: int) -> dict:
+    import uuid
+    from typing import List
+    from app.models.eligibility import EligibilityAssessment, EligibilityQuestion
+    from app.services.session_store import InMemorySessionStore
+    from app.services.questionnaire import get_questionnaire
+
+    questionnaire = get_questionnaire()
+    store = InMemorySessionStore(max_sessions=sessions, ttl_seconds=float("inf"))
+
+    if variant == "legacy":
+        # Every assessment carried its own copy of the question list
+        class LegacyAssessment(EligibilityAssessment):
+            questionnaire_version: str = ""
+            questions: List[EligibilityQuestion]
+
+        def start():
+            assessment = LegacyAssessment(session_id=str(uuid.uuid4()), questions=list(questionnaire.questions))
+            store.put(assessment)
+            return assessment
+    else:
+        def start():
+            assessment = EligibilityAssessment(session_id=str(uuid.uuid4()), questionnaire_version=questionnaire.version)
+            store.put(assessment)
+            return assessment
+
+    baseline_rss = _current_rss_mb()
+    latencies = []
+    for _ in range(sessions):
+        start_time = time.perf_counter()
+        start()
+        latencies.append(time.perf_counter() - start_time)
+    rss_growth = _current_rss_mb() - baseline_rss
+
+    # What a persistent session store writes on every answer
+    serialized = start().model_dump_json()
+
+    latencies.sort()
+    return {
+        "bytes_per_session": rss_growth * 1024 * 1024 / sessions,
+        "json_bytes": len(serialized),
+        "mean_us": sum(latencies) / sessions * 1e6,
+        "p99_us": latencies[int(sessions * 0.99)] * 1e6
+    }
+
+
+def bench_start_assessment(args):
+    """Per-session memory and start_assessment latency with and without shared questions."""
+    print(f"start_assessment benchmark: {args.sessions:,} sessions held in memory")
+    print(f"{'variant':<10}{'bytes/session':>15}{'JSON bytes':>12}{'mean us':>10}{'p99 us':>10}")
+    for variant in ("legacy", "shared"):
+        result = _run_isolated(_run_start_assessment, variant, args.sessions)
+        if "error" in result:
+            print(f"{variant:<10}failed: {result['error'][:120]}")
+            continue
+        print(f"{variant:<10}{result['bytes_per_session']:>15.0f}{result['json_bytes']:>12}"
+              f"{result['mean_us']:>10.1f}{result['p99_us']:>10.1f}")
+
+
+def _screening_rows(count: int) -> list:
+    """Synthetic questionnaire answer sets covering every rule branch."""
+    import random
+    from app.services.questionnaire import get_questionnaire
+
+    questions = get_questionnaire().by_id
+    rng = random.Random(45)
+    return [
+        {
+            "facility_type": rng.choice(questions["facility_type"].options),
+            "sequestration_method": rng.choice(questions["sequestration_method"].options),
+            "annual_co2_captured": str(rng.choice([0.5, 10, 5000, 250000]) * rng.random()),
+            "carbon_capture_operation_date": f"{rng.randint(2015, 2036)}-{rng.randint(1, 12):02d}-01",
+            "domestic_content": str(rng.randint(0, 100)),
+            "energy_community": rng.choice(["Yes", "No"])
+        }
+        for _ in range(count)
+    ]
+
+
+def bench_rules(args):
+    """Single and bulk evaluation speed of the compiled eligibility rules."""
+    from app.services.eligibility_rules import RULES
+
+    rows = _screening_rows(args.rows)
+    print(f"Eligibility rules benchmark: {args.rows:,} answer sets")
+    print(f"{'mode':<16}{'seconds':>10}{'rows/ms':>10}")
+
+    timings = [
+        ("evaluate", lambda: [RULES.evaluate(row) for row in rows]),
+        ("score_many", lambda: RULES.score_many(rows)),
+        ("evaluate_many", lambda: RULES.evaluate_many(rows)),
+    ]
+    for name, run in timings:
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<16}{elapsed:>10.3f}{args.rows / elapsed / 1000:>10.1f}")
+
+
+def _run_screening(rows: int, upload_format: str, workdir: str) -> dict:
+    import csv
+    import io
+    import json
+    from app.config import settings
+
+    settings.vector_db_path = os.path.join(workdir, "vector_db")
+    import asyncio
+    import httpx
+    from app.main import app
+
+    answer_sets = _screening_rows(rows)
+    for i, answers in enumerate(answer_sets):
+        answers["facility_id"] = str(1000000 + i)
+
+    if upload_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(answer_sets[0]))
+        writer.writeheader()
+        writer.writerows(answer_sets)
+        body, content_type = buffer.getvalue().encode(), "text/csv"
+    else:
+        body = "".join(json.dumps(answers) + "\n" for answers in answer_sets).encode()
+        content_type = "application/x-ndjson"
+
+    async def post():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            return await client.post("/screen-eligibility/batch", content=body, headers={"content-type": content_type})
+
+    start = time.perf_counter()
+    response = asyncio.run(post())
+    elapsed = time.perf_counter() - start
+    lines = response.text.splitlines()
+
+    return {
+        "status": response.status_code,
+        "results": len(lines) - 1,
+        "summary": json.loads(lines[-1])["summary"],
+        "seconds": elapsed,
+        "upload_mb": len(body) / (1024 * 1024)
+    }
+
+
+def bench_screening(args):
+    """End-to-end /screen-eligibility/batch throughput."""
+    with tempfile.TemporaryDirectory() as workdir:
+        result = _run_isolated(_run_screening, args.rows, args.format, workdir)
+    if "error" in result:
+        print(f"Screening failed: {result['error'][:120]}")
+        return 1
+
+    summary = result["summary"]
+    print(f"Screening benchmark: {args.rows:,} {args.format} rows ({result['upload_mb']:.1f} MB upload)")
+    print(f"HTTP {result['status']}, {result['results']:,} results, {summary['eligible']:,} eligible")
+    print(f"request {result['seconds']:.2f}s, server {summary['seconds']:.2f}s "
+          f"({summary['rows_per_second']:,.0f} rows/s)")
+
+
+LOAD_ENDPOINTS = {
+    "complete-enhanced-assessment": lambda i: ("/complete-enhanced-assessment", {
+        "session_id": f"load-{i}",
+        "answers": [{"question": "What type of facility is this?", "answer": "Industrial facility",
+                     "category": "Facility Type and Operations"}]
+    }),
+    "ask-question": lambda i: ("/ask-question", {"question": f"What is the 45Q credit rate for facility {i % 20}?"}),
+}
+
+
+def _run_load(endpoint: str, requests: int, concurrency: int, latency_ms: float,
+              error_rate: float, workdir: str) -> dict:
+    os.environ["PRIMARY_LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_LATENCY_MS"] = str(latency_ms)
+    os.environ["LOCAL_LLM_ERROR_RATE"] = str(error_rate)
+    from app.config import settings
+
+    settings.vector_db_path = os.path.join(workdir, "vector_db")
+    import asyncio
+    import httpx
+    from app.main import app
+
+    async def drive():
+        transport = httpx.ASGITransport(app=app)
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, statuses = [], []
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            async def one(i):
+                path, payload = LOAD_ENDPOINTS[endpoint](i)
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post(path, json=payload)
+                    latencies.append(time.perf_counter() - start)
+                    statuses.append(response.status_code)
+
+            start = time.perf_counter()
+            await asyncio.gather(*[one(i) for i in range(requests)])
+            return time.perf_counter() - start, sorted(latencies), statuses
+
+    elapsed, latencies, statuses = asyncio.run(drive())
+    return {
+        "seconds": elapsed,
+        "requests_per_second": requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000,
+        "errors": sum(1 for status in statuses if status >= 400)
+    }
+
+
+def bench_load(args):
+    """End-to-end API throughput against the local stand-in LLM (no network or API key)."""
+    with tempfile.TemporaryDirectory() as workdir:
+        result = _run_isolated(_run_load, args.endpoint, args.requests, args.concurrency,
+                               args.latency_ms, args.error_rate, workdir)
+    if "error" in result:
+        print(f"Load test failed: {result['error'][:120]}")
+        return 1
+
+    print(f"Load benchmark: /{args.endpoint}, {args.requests:,} requests, concurrency {args.concurrency}, "
+          f"local LLM median latency {args.latency_ms:.0f} ms, error rate {args.error_rate:.0%}")
+    print(f"{result['requests_per_second']:,.1f} req/s over {result['seconds']:.2f}s, "
+          f"p50 {result['p50_ms']:.0f} ms, p99 {result['p99_ms']:.0f} ms, {result['errors']} errors")
+
+
+def _serialization_payloads() -> dict:
+    """Response models shaped like the largest API payloads, with realistic text sizes.
+
+    The guidance payloads appear twice: with full context and source text, and
+    in the compact default shape.
+    """
+    import random
+    from app.models.forecasting import CreditForecast, ForecastPeriod, TimelineProjection
+    from app.models.responses import BaseResponse
+    from app.utils.payload_fields import select_fields
+
+    rng = random.Random(45)
+    paragraph = ("Section 45Q provides a credit per metric ton of qualified carbon oxide captured "
+                 "and disposed of in secure geological storage or utilized. ") * 6
+    sources = [{"id": f"chunk-{i}", "content": paragraph,
+                "metadata": {"source": f"documents/doc-{i}.pdf", "file_name": f"doc-{i}.pdf", "page": i}}
+               for i in range(5)]
+    rag_answer = {"answer": paragraph * 2, "context": "\n\n".join([paragraph] * 5),
+                  "confidence_score": 0.8, "sources": sources}
+    periods = [ForecastPeriod(year=2025 + i, co2_captured_tons=rng.uniform(1e5, 1e6), credit_rate=85.0,
+                              total_credits=rng.uniform(1e6, 1e8), bonus_credits=rng.uniform(0, 1e6),
+                              total_value=rng.uniform(1e6, 1e8)) for i in range(12)]
+    forecast = CreditForecast(
+        facility_info={"facility_type": "Direct Air Capture", "location_state": "TX"},
+        forecast_periods=periods, total_credits_10_years=1e9, total_value_10_years=1e9,
+        total_credits_12_years=1.2e9, total_value_12_years=1.2e9, average_annual_credits=1e8,
+        average_annual_value=1e8, bonus_opportunities=[{"type": "domestic_content", "description": paragraph}],
+        assumptions={"capture_efficiency": 0.9, "inflation_adjustment": True}, recommendations=[paragraph] * 4
+    )
+    timeline = [TimelineProjection(year=period.year, cumulative_credits=period.total_credits * i,
+                                   cumulative_value=period.total_value * i, roi_percentage=12.5)
+                for i, period in enumerate(periods)]
+
+    questions = []
+    if os.path.exists("enhanced_question_base.json"):
+        import json
+        with open("enhanced_question_base.json") as f:
+            questions = [question for category in json.load(f)["categories"].values()
+                         for question in category["questions"]]
+
+    analysis = {
+        "forecast": forecast, "timeline_projections": timeline, "rag_analysis": rag_answer,
+        "summary": {"total_potential_credits": 1.2e9, "confidence_score": 0.85}
+    }
+    guidance = {
+        "facility_info": {"facility_type": "Direct Air Capture"}, "rag_guidance": rag_answer,
+        "assessment_result": {"eligible": True, "score": 0.9}
+    }
+    full = "context,source_text"
+    return {
+        "detailed-forecast-analysis": BaseResponse(success=True, message="Detailed forecast analysis generated",
+                                                   data=select_fields(analysis, ["rag_analysis"], include=full)),
+        "detailed-forecast-analysis compact": BaseResponse(success=True, message="Detailed forecast analysis generated",
+                                                           data=select_fields(analysis, ["rag_analysis"])),
+        "detailed-guidance": BaseResponse(success=True, message="Detailed guidance generated",
+                                          data=select_fields(guidance, ["rag_guidance"], include=full)),
+        "detailed-guidance compact": BaseResponse(success=True, message="Detailed guidance generated",
+                                                  data=select_fields(guidance, ["rag_guidance"])),
+        "get-enhanced-questions": BaseResponse(success=True, message="Enhanced questions loaded successfully",
+                                               data={"questions": questions, "total_questions": len(questions)}),
+    }
+
+
+def bench_serialization(args):
+    """Response serialization time and bytes on the wire: jsonable_encoder + json versus FastJSONResponse."""
+    import gzip
+    import json
+    from fastapi.encoders import jsonable_encoder
+    from app.utils.json_response import dumps
+
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    def stdlib(payload):
+        # What FastAPI's default JSONResponse does for a returned model
+        return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                          indent=None, separators=(",", ":")).encode("utf-8")
+
+    print(f"Serialization benchmark: {args.repeat} renders per payload")
+    print(f"{'payload':<38}{'serializer':<12}{'ms':>9}{'bytes':>10}{'gzip':>9}" + (f"{'brotli':>9}" if brotli else ""))
+    for name, payload in _serialization_payloads().items():
+        for label, render in (("stdlib", stdlib), ("fast", dumps)):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                body = render(payload)
+            elapsed_ms = (time.perf_counter() - start) * 1000 / args.repeat
+            row = f"{name:<38}{label:<12}{elapsed_ms:>9.3f}{len(body):>10,}{len(gzip.compress(body, 6)):>9,}"
+            if brotli:
+                row += f"{len(brotli.compress(body, quality=4)):>9,}"
+            print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="45Q application benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild_parser = subparsers.add_parser("rebuild", help="Knowledge base rebuild time and peak memory")
+    rebuild_parser.add_argument("--documents", default="app/data/documents")
+    rebuild_parser.add_argument("--fake-embeddings", action="store_true",
+                                help="Use deterministic fake embeddings to isolate index costs")
+    rebuild_parser.set_defaults(func=bench_rebuild)
+
+    embeddings_parser = subparsers.add_parser("embeddings", help="Query embedding speed per backend")
+    embeddings_parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    embeddings_parser.add_argument("--queries", type=int, default=200)
+    embeddings_parser.set_defaults(func=bench_embeddings)
+
+    retrieval_parser = subparsers.add_parser("retrieval", help="Chroma versus memory-mapped snapshot retrieval")
+    retrieval_parser.add_argument("--documents", default="app/data/documents")
+    retrieval_parser.add_argument("--queries", type=int, default=200)
+    retrieval_parser.set_defaults(func=bench_retrieval)
+
+    batch_parser = subparsers.add_parser("batch-retrieval", help="Per-query cost of batched retrieval")
+    batch_parser.add_argument("--documents", default="app/data/documents")
+    batch_parser.add_argument("--batch-sizes", default="1,4,16,64")
+    batch_parser.add_argument("--fake-embeddings", action="store_true",
+                              help="Use deterministic fake embeddings to isolate search costs")
+    batch_parser.set_defaults(func=bench_batch_retrieval)
+
+    sessions_parser = subparsers.add_parser("sessions", help="Session store soak test")
+    sessions_parser.add_argument("--backends", default="unbounded,memory,sqlite")
+    sessions_parser.add_argument("--sessions", type=int, default=1000000)
+    sessions_parser.set_defaults(func=bench_sessions)
+
+    start_parser = subparsers.add_parser("start-assessment", help="Per-session memory and start latency")
+    start_parser.add_argument("--sessions", type=int, default=100000)
+    start_parser.set_defaults(func=bench_start_assessment)
+
+    rules_parser = subparsers.add_parser("rules", help="Eligibility rule evaluation speed")
+    rules_parser.add_argument("--rows", type=int, default=100000)
+    rules_parser.set_defaults(func=bench_rules)
+
+    screening_parser = subparsers.add_parser("screening", help="Bulk eligibility screening endpoint throughput")
+    screening_parser.add_argument("--rows", type=int, default=100000)
+    screening_parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    screening_parser.set_defaults(func=bench_screening)
+
+    load_parser = subparsers.add_parser("load", help="End-to-end API throughput against the local stand-in LLM")
+    load_parser.add_argument("--endpoint", choices=sorted(LOAD_ENDPOINTS), default="complete-enhanced-assessment")
+    load_parser.add_argument("--requests", type=int, default=500)
+    load_parser.add_argument("--concurrency", type=int, default=50)
+    load_parser.add_argument("--latency-ms", type=float, default=200.0)
+    load_parser.add_argument("--error-rate", type=float, default=0.0)
+    load_parser.set_defaults(func=bench_load)
+
+    serialization_parser = subparsers.add_parser("serialization",
+                                                 help="Response serialization time and compressed size")
+    serialization_parser.add_argument("--repeat", type=int, default=200)
+    serialization_parser.set_defaults(func=bench_serialization)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
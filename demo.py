@@ -151,17 +151,19 @@ async def demo_rag_question_answering():
     print("Note: This demo will work best if you have uploaded 45Q documents.")
     print("Without documents, the system will provide general guidance.\n")
     
-    for question in questions:
+    try:
+        results = await rag_service.answer_questions(questions)
+    except Exception as e:
+        print(f"Error: {e}")
+        print()
+        return
+
+    for question, result in zip(questions, results):
         print(f"Q: {question}")
-        try:
-            result = await rag_service.answer_question(question)
-            print(f"A: {result['answer'][:200]}...")
-            print(f"Confidence: {result['confidence_score']:.2f}")
-            print(f"Sources: {len(result['sources'])} documents")
-            print()
-        except Exception as e:
-            print(f"Error: {e}")
-            print()
+        print(f"A: {result['answer'][:200]}...")
+        print(f"Confidence: {result['confidence_score']:.2f}")
+        print(f"Sources: {len(result['sources'])} documents")
+        print()
 
 
 async def demo_detailed_analysis():
@@ -6,19 +6,89 @@ Uses ChatGPT to generate comprehensive questions for 45Q tax credit eligibility
 
 import os
 import json
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from openai import OpenAI
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from datetime import datetime
 
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
-# Configure OpenAI
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from app.config import settings
+from app.services.llm_service import RETRYABLE_ERRORS
+from app.utils.completion_cache import CompletionCache
 
-def generate_questions_with_chatgpt(category: str, context: str) -> List[Dict[str, Any]]:
-    """Generate questions for a specific category using ChatGPT."""
+# Configure OpenAI; created on first use so importing the module needs no API key
+_client = None
+
+
+def get_client() -> OpenAI:
+    global _client
+    if _client is None:
+        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+MODEL = "gpt-4"
+TEMPERATURE = 0.7
+MAX_TOKENS = 2000
+SYSTEM_PROMPT = "You are a 45Q tax credit expert. Generate detailed assessment questions in JSON format."
+
+# Completions from earlier runs; replaced in main() to honour --force / --cache-dir
+completion_cache = CompletionCache(settings.completion_cache_dir)
+
+CATEGORIES = {
+    "facility_basic_info": {
+        "name": "Facility Basic Information",
+        "context": "Basic information about the facility, location, and ownership structure"
+    },
+    "facility_type_operations": {
+        "name": "Facility Type and Operations", 
+        "context": "Type of facility, industrial processes, and operational details"
+    },
+    "carbon_capture_technology": {
+        "name": "Carbon Capture Technology",
+        "context": "Carbon capture, utilization, and storage (CCUS) technology details"
+    },
+    "emissions_data": {
+        "name": "Emissions Data and Monitoring",
+        "context": "Current emissions, monitoring systems, and historical data"
+    },
+    "project_scope": {
+        "name": "Project Scope and Timeline",
+        "context": "Project details, timeline, and implementation plans"
+    },
+    "financial_considerations": {
+        "name": "Financial Considerations",
+        "context": "Investment requirements, costs, and financial projections"
+    },
+    "regulatory_compliance": {
+        "name": "Regulatory Compliance",
+        "context": "Environmental permits, regulations, and compliance requirements"
+    },
+    "technical_requirements": {
+        "name": "Technical Requirements",
+        "context": "Technical specifications, equipment, and engineering requirements"
+    },
+    "partnerships_contracts": {
+        "name": "Partnerships and Contracts",
+        "context": "Partnerships, contracts, and third-party relationships"
+    },
+    "risk_assessment": {
+        "name": "Risk Assessment",
+        "context": "Technical, financial, and regulatory risks"
+    }
+}
+
+def request_questions(category: str, context: str) -> List[Dict[str, Any]]:
+    """One ChatGPT request for a category's questions; raises on API or JSON errors.
+
+    A cached completion for the exact same request is reused instead.
+    """
     
     prompt = f"""
 You are an expert 45Q tax credit consultant. Generate comprehensive questions for the category: {category}
@@ -43,103 +113,110 @@ Format each question as a JSON object with:
 Return only valid JSON array of question objects.
 """
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a 45Q tax credit expert. Generate detailed assessment questions in JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    cache_key = completion_cache.key(MODEL, messages, TEMPERATURE, max_tokens=MAX_TOKENS)
+    content = completion_cache.get(cache_key)
+    cached = content is not None
+    if not cached:
+        response = get_client().chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS
         )
         
         # Extract and parse JSON from response
         content = response.choices[0].message.content.strip()
-        
-        # Try to extract JSON from the response
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0]
-        elif "```" in content:
-            content = content.split("```")[1]
-        
-        questions = json.loads(content)
-        return questions
-        
-    except Exception as e:
-        print(f"Error generating questions for {category}: {e}")
-        return []
-
-def generate_all_categories() -> Dict[str, List[Dict[str, Any]]]:
-    """Generate questions for all 45Q assessment categories."""
     
-    categories = {
-        "facility_basic_info": {
-            "name": "Facility Basic Information",
-            "context": "Basic information about the facility, location, and ownership structure"
-        },
-        "facility_type_operations": {
-            "name": "Facility Type and Operations", 
-            "context": "Type of facility, industrial processes, and operational details"
-        },
-        "carbon_capture_technology": {
-            "name": "Carbon Capture Technology",
-            "context": "Carbon capture, utilization, and storage (CCUS) technology details"
-        },
-        "emissions_data": {
-            "name": "Emissions Data and Monitoring",
-            "context": "Current emissions, monitoring systems, and historical data"
-        },
-        "project_scope": {
-            "name": "Project Scope and Timeline",
-            "context": "Project details, timeline, and implementation plans"
-        },
-        "financial_considerations": {
-            "name": "Financial Considerations",
-            "context": "Investment requirements, costs, and financial projections"
-        },
-        "regulatory_compliance": {
-            "name": "Regulatory Compliance",
-            "context": "Environmental permits, regulations, and compliance requirements"
-        },
-        "technical_requirements": {
-            "name": "Technical Requirements",
-            "context": "Technical specifications, equipment, and engineering requirements"
-        },
-        "partnerships_contracts": {
-            "name": "Partnerships and Contracts",
-            "context": "Partnerships, contracts, and third-party relationships"
-        },
-        "risk_assessment": {
-            "name": "Risk Assessment",
-            "context": "Technical, financial, and regulatory risks"
-        }
-    }
+    # Try to extract JSON from the response
+    json_content = content
+    if "```json" in json_content:
+        json_content = json_content.split("```json")[1].split("```")[0]
+    elif "```" in json_content:
+        json_content = json_content.split("```")[1]
     
-    all_questions = {}
+    questions = json.loads(json_content)
+    if not cached:
+        # Only completions that parsed are kept, so a bad one is retried next run
+        completion_cache.put(cache_key, content)
+    return questions
+
+def generate_questions_with_chatgpt(category: str, context: str, retries: int = 3,
+                                    backoff_seconds: float = 2.0) -> List[Dict[str, Any]]:
+    """Generate questions for a specific category using ChatGPT.
+
+    Transient failures (timeouts, connection errors, rate limits, 5xx) and
+    unparseable responses (a fresh sample usually parses) are retried with
+    exponential backoff and jitter. Other errors, such as authentication or
+    bad requests, fail at once. An empty list is returned when the category
+    fails.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return request_questions(category, context)
+        except (*RETRYABLE_ERRORS, json.JSONDecodeError) as e:
+            if attempt == retries:
+                print(f"Error generating questions for {category}: {e}")
+                return []
+            delay = backoff_seconds * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"⚠️  {category}: attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+        except Exception as e:
+            print(f"Error generating questions for {category}: {e}")
+            return []
+
+def _timed_generation(category_key: str, context: str, retries: int) -> Tuple[List[Dict[str, Any]], float]:
+    start = time.perf_counter()
+    questions = generate_questions_with_chatgpt(category_key, context, retries)
+    return questions, time.perf_counter() - start
+
+def generate_all_categories(concurrency: int = 10, retries: int = 3) -> Dict[str, List[Dict[str, Any]]]:
+    """Generate questions for all 45Q assessment categories.
+
+    Up to `concurrency` categories are requested at once; the result keeps
+    the order of CATEGORIES regardless of which request finishes first.
+    """
     
     print("🚀 Generating comprehensive 45Q assessment questions...")
+    print(f"   {len(CATEGORIES)} categories, up to {concurrency} at a time")
     print("=" * 60)
     
-    for category_key, category_info in categories.items():
-        print(f"\n📋 Generating questions for: {category_info['name']}")
-        questions = generate_questions_with_chatgpt(category_key, category_info['context'])
+    start = time.perf_counter()
+    generated = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(_timed_generation, category_key, category_info['context'], retries): category_key
+            for category_key, category_info in CATEGORIES.items()
+        }
+        for future in as_completed(futures):
+            category_key = futures[future]
+            questions, elapsed = future.result()
+            generated[category_key] = questions
+            name = CATEGORIES[category_key]['name']
+            if questions:
+                print(f"✅ {name}: {len(questions)} questions in {elapsed:.1f}s")
+            else:
+                print(f"❌ Failed to generate questions for {name} ({elapsed:.1f}s)")
+    
+    all_questions = {}
+    for category_key, category_info in CATEGORIES.items():
+        questions = generated[category_key]
+        if not questions:
+            continue
+        # Add category info to each question
+        for question in questions:
+            question['category'] = category_info['name']
+            question['category_key'] = category_key
         
-        if questions:
-            # Add category info to each question
-            for question in questions:
-                question['category'] = category_info['name']
-                question['category_key'] = category_key
-            
-            all_questions[category_key] = {
-                'name': category_info['name'],
-                'questions': questions
-            }
-            
-            print(f"✅ Generated {len(questions)} questions")
-        else:
-            print(f"❌ Failed to generate questions for {category_info['name']}")
+        all_questions[category_key] = {
+            'name': category_info['name'],
+            'questions': questions
+        }
     
+    print(f"\n⏱️  Generated {len(all_questions)}/{len(CATEGORIES)} categories in {time.perf_counter() - start:.1f}s")
     return all_questions
 
 def save_questions_to_file(questions: Dict[str, Any], filename: str = "enhanced_question_base.json"):
@@ -187,11 +264,14 @@ def create_clickup_format(questions: Dict[str, Any]) -> str:
     print("📝 ClickUp format saved to: 45Q_assessment_clickup.md")
     return clickup_content
 
-def main():
+def main(concurrency: int = 10, retries: int = 3, force: bool = False,
+         cache_dir: str = settings.completion_cache_dir):
     """Main function to generate and save enhanced questions."""
+    global completion_cache
     
     print("🎯 45Q Enhanced Question Generator")
     print("=" * 40)
+    completion_cache = CompletionCache(cache_dir, force=force)
     
     # Check if OpenAI API key is available
     if not os.getenv("OPENAI_API_KEY"):
@@ -199,7 +279,8 @@ def main():
         return
     
     # Generate questions for all categories
-    all_questions = generate_all_categories()
+    all_questions = generate_all_categories(concurrency, retries)
+    print(f"🗄️  Completion cache: {completion_cache.hits} reused, {completion_cache.misses} requested")
     
     if not all_questions:
         print("❌ No questions were generated. Please check your API key and try again.")
@@ -223,4 +304,10 @@ def main():
         print(f"  - {category_data['name']}: {len(category_data['questions'])} questions")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate the enhanced 45Q assessment question base")
+    parser.add_argument("--concurrency", type=int, default=10, help="Categories to request at the same time")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per category after a failed request")
+    parser.add_argument("--force", action="store_true", help="Ignore cached completions and request every category")
+    parser.add_argument("--cache-dir", default=settings.completion_cache_dir, help="Completion cache directory")
+    args = parser.parse_args()
+    main(args.concurrency, args.retries, args.force, args.cache_dir)
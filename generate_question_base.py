@@ -8,24 +8,28 @@ import os
 import sys
 import json
 import asyncio
+import argparse
 from datetime import datetime
 
 # Add the app directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
-from app.services.llm_service import LLMService
+from app.services.llm_service import LLMService, DEFAULT_TEMPERATURE
 from app.services.rag_service import RAGService
 from app.config import settings
+from app.utils.completion_cache import CompletionCache
+from app.utils.prompts import RAG_QUERY_PROMPT, build_prompt_messages
 
-async def generate_question_base():
+async def generate_question_base(output_dir: str = ".", cache: CompletionCache = None):
     """Generate a comprehensive question base for 45Q eligibility assessment."""
+    cache = cache or CompletionCache(settings.completion_cache_dir)
     
     print("🔍 Generating 45Q Eligibility Question Base...")
     print("=" * 60)
     
     # Initialize services
     llm_service = LLMService()
-    rag_service = RAGService()
+    rag_service = RAGService(llm_service=llm_service)
     
     # Comprehensive prompt to analyze documents and generate questions
     analysis_prompt = """
@@ -54,8 +58,21 @@ Be thorough and specific. This will be used to create an intelligent assessment
     try:
         print("📚 Analyzing documents for eligibility criteria...")
         
-        # Get the answer from the RAG system
-        result = await rag_service.answer_question(analysis_prompt)
+        # Get the answer from the RAG system, reusing an earlier completion when
+        # the prompt and retrieved context are unchanged
+        relevant_docs = rag_service.retrieve_relevant_documents(analysis_prompt)
+        context = rag_service.context_from_documents(relevant_docs)
+        # Key on the full message list so a change to the instructions or layout misses,
+        # and on the model that answered, which routing decides per call
+        messages = build_prompt_messages(RAG_QUERY_PROMPT, context, analysis_prompt)
+        result = cache.get_any(cache.key(model, messages, DEFAULT_TEMPERATURE) for model in llm_service.model_ids())
+        if result is None:
+            answer, model = await llm_service.chat_completion_with_model(messages)
+            result = rag_service.package_answer(analysis_prompt, answer, context, relevant_docs)
+            result.pop("context", None)
+            cache.put(cache.key(model, messages, DEFAULT_TEMPERATURE), result)
+        else:
+            print("🗄️  Reusing cached analysis (pass --force to regenerate)")
         
         print("✅ Analysis complete!")
         print("\n" + "=" * 60)
@@ -72,7 +89,7 @@ Be thorough and specific. This will be used to create an intelligent assessment
         }
         
         # Save to file
-        with open("question_base.json", "w") as f:
+        with open(os.path.join(output_dir, "question_base.json"), "w") as f:
             json.dump(question_base, f, indent=2)
         
         print(result["answer"])
@@ -89,7 +106,7 @@ Be thorough and specific. This will be used to create an intelligent assessment
         traceback.print_exc()
         return None
 
-async def generate_assessment_prompt():
+async def generate_assessment_prompt(output_dir: str = "."):
     """Generate an improved assessment prompt based on the question base."""
     
     print("\n🎯 Generating Improved Assessment Prompt...")
@@ -97,7 +114,7 @@ async def generate_assessment_prompt():
     
     try:
         # Load the question base
-        with open("question_base.json", "r") as f:
+        with open(os.path.join(output_dir, "question_base.json"), "r") as f:
             question_base = json.load(f)
         
         # Create an improved prompt
@@ -135,7 +152,7 @@ Remember: You are the expert. Provide complete guidance, don't defer to others.
             "based_on_question_base": True
         }
         
-        with open("assessment_prompt.json", "w") as f:
+        with open(os.path.join(output_dir, "assessment_prompt.json"), "w") as f:
             json.dump(assessment_prompt, f, indent=2)
         
         print("✅ Improved assessment prompt generated!")
@@ -149,18 +166,20 @@ Remember: You are the expert. Provide complete guidance, don't defer to others.
         traceback.print_exc()
         return None
 
-async def main():
+async def main(output_dir: str = ".", force: bool = False,
+               cache_dir: str = settings.completion_cache_dir) -> int:
     """Main function to run the question base generation."""
     
     print("🚀 Starting 45Q Question Base Generation...")
     print("=" * 60)
+    os.makedirs(output_dir, exist_ok=True)
     
     # Step 1: Generate question base
-    question_base = await generate_question_base()
+    question_base = await generate_question_base(output_dir, CompletionCache(cache_dir, force=force))
     
     if question_base:
         # Step 2: Generate improved assessment prompt
-        assessment_prompt = await generate_assessment_prompt()
+        assessment_prompt = await generate_assessment_prompt(output_dir)
         
         if assessment_prompt:
             print("\n🎉 SUCCESS! Question base and assessment prompt generated.")
@@ -171,10 +190,17 @@ async def main():
             print("   1. Review the generated content")
             print("   2. Update the interactive assessment with the new prompt")
             print("   3. Test the improved assessment flow")
+            return 0
         else:
             print("❌ Failed to generate assessment prompt")
     else:
         print("❌ Failed to generate question base")
+    return 1
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate the 45Q question base and assessment prompt")
+    parser.add_argument("--output-dir", default=".", help="Directory to write the generated files to")
+    parser.add_argument("--force", action="store_true", help="Ignore the cached analysis and query the LLM again")
+    parser.add_argument("--cache-dir", default=settings.completion_cache_dir, help="Completion cache directory")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.output_dir, args.force, args.cache_dir)))
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the 45Q vector index.
+
+The Chroma collection keeps growing as documents are added incrementally and is
+never compacted. `compact` copies every stored chunk (embeddings included, so
+nothing is re-embedded) into a fresh collection built with the HNSW settings
+from app/config.py, then swaps it in atomically.
+
+`rebuild` re-embeds the source documents into a fresh collection and swaps it
+in the same way, which is what /upload-documents does on a running server.
+
+`export-snapshot` writes the live collection to a read-only memory-mapped
+snapshot that workers serve from when RETRIEVAL_BACKEND=snapshot.
+
+Usage:
+    python manage_index.py compact [--batch-size 500] [--keep 1]
+    python manage_index.py rebuild [--documents app/data/documents]
+    python manage_index.py export-snapshot [--dtype float32] [--ivf-lists 0]
+    python manage_index.py stats [--recall-sample 20]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+from app.config import settings
+from app.utils.vector_index import (
+    resolve_live_path,
+    new_generation_path,
+    activate_generation,
+    prune_generations,
+    rebuild_lock,
+    open_collection,
+    compact_collection,
+    collection_stats
+)
+from app.utils.vector_snapshot import export_collection_snapshot
+
+
+def compact(args):
+    """Rebuild the live collection into a new generation and swap it in."""
+    source = resolve_live_path()
+    if not source.exists():
+        print(f"❌ No vector index found at {settings.vector_db_path}")
+        return 1
+
+    lock = rebuild_lock()
+    if not lock.acquire({"pid": os.getpid(), "started_at": time.time()}):
+        print(f"❌ The index is already being rebuilt ({lock.owner()})")
+        return 1
+    try:
+        return _compact(args, source)
+    finally:
+        lock.release()
+
+
+def _compact(args, source):
+    target = new_generation_path()
+    print(f"🔧 Compacting {source}")
+    print(f"   -> {target}")
+    print(f"   HNSW: space={settings.hnsw_space} M={settings.hnsw_m} "
+          f"ef_construction={settings.hnsw_ef_construction} ef_search={settings.hnsw_ef_search}")
+
+    start = time.perf_counter()
+    result = compact_collection(source, target, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    activate_generation(target)
+    removed = prune_generations(keep=args.keep)
+
+    print(f"✓ Copied {result['records_copied']} records in {elapsed:.1f}s")
+    print(f"✓ Index size: {result['source_size_bytes']:,} -> {result['target_size_bytes']:,} bytes")
+    print(f"✓ {settings.vector_db_path} now points to {target}")
+    if removed:
+        print(f"✓ Removed {len(removed)} old generation(s)")
+    print(f"   Running workers switch over within {settings.index_reload_check_seconds:g}s.")
+    return 0
+
+
+def rebuild(args):
+    """Re-embed the source documents into a new generation and swap it in."""
+    from app.services.rag_service import RAGService, IndexRebuildInProgress
+    from app.utils.document_loader import DocumentProcessor
+
+    result = DocumentProcessor().process_documents_for_rag(args.documents)
+    if not result["success"]:
+        print(f"❌ Failed to process documents: {result.get('error', 'Unknown error')}")
+        return 1
+
+    print(f"🔧 Rebuilding index from {result['documents_processed']} documents "
+          f"({result['chunks_created']} chunks)")
+    try:
+        rebuild_result = RAGService().rebuild_index(result["chunks"])
+    except IndexRebuildInProgress as e:
+        print(f"❌ {e} ({e.owner})")
+        return 1
+
+    print(f"✓ Built and activated {rebuild_result['generation']} "
+          f"in {rebuild_result['rebuild_seconds']:.1f}s")
+    return 0
+
+
+def export_snapshot(args):
+    """Export the live collection to a memory-mapped snapshot."""
+    path = resolve_live_path()
+    if not path.exists():
+        print(f"❌ No vector index found at {settings.vector_db_path}")
+        return 1
+
+    start = time.perf_counter()
+    result = export_collection_snapshot(
+        open_collection(path, create=False),
+        dtype=args.dtype,
+        ivf_lists=args.ivf_lists
+    )
+
+    print(f"✓ Exported {result['count']} chunks as {result['dtype']} "
+          f"({result['vectors_bytes']:,} bytes of vectors) in {time.perf_counter() - start:.1f}s")
+    if result["ivf_lists"]:
+        print(f"✓ IVF index with {result['ivf_lists']} lists")
+    print(f"✓ {settings.vector_snapshot_path} now points to {result['path']}")
+    return 0
+
+
+def stats(args):
+    """Print statistics for the live collection."""
+    path = resolve_live_path()
+    if not path.exists():
+        print(f"❌ No vector index found at {settings.vector_db_path}")
+        return 1
+
+    collection = open_collection(path, create=False)
+    print(json.dumps(collection_stats(collection, path, args.recall_sample), indent=2))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="45Q vector index maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = subparsers.add_parser("compact", help="Rebuild and compact the collection offline")
+    compact_parser.add_argument("--batch-size", type=int, default=500)
+    compact_parser.add_argument("--keep", type=int, default=settings.index_generations_to_keep,
+                                help="Number of previous generations to keep for rollback")
+    compact_parser.set_defaults(func=compact)
+
+    rebuild_parser = subparsers.add_parser("rebuild", help="Re-embed source documents into a new collection")
+    rebuild_parser.add_argument("--documents", default="app/data/documents")
+    rebuild_parser.set_defaults(func=rebuild)
+
+    snapshot_parser = subparsers.add_parser("export-snapshot", help="Write a read-only memory-mapped snapshot")
+    snapshot_parser.add_argument("--dtype", choices=["float16", "float32"], default=settings.vector_snapshot_dtype)
+    snapshot_parser.add_argument("--ivf-lists", type=int, default=settings.vector_snapshot_ivf_lists,
+                                 help="Number of IVF lists (0 for exact brute-force search)")
+    snapshot_parser.set_defaults(func=export_snapshot)
+
+    stats_parser = subparsers.add_parser("stats", help="Show index size, element count and recall")
+    stats_parser.add_argument("--recall-sample", type=int, default=20)
+    stats_parser.set_defaults(func=stats)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
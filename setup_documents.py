@@ -44,7 +44,7 @@ def process_documents(documents_path: str):
         
         # Initialize RAG service and add documents
         rag_service = RAGService()
-        rag_service.add_documents(result["chunks"])
+        rag_service.rebuild_index(result["chunks"])
         print("✓ Documents added to vector store")
         
         # Get document summary
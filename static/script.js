@@ -953,23 +953,17 @@ async function sendChatMessage() {
     });
     
     try {
-        // Get LLM response using the improved assessment prompt
-        const assessmentPrompt = window.assessmentPrompt || 'You are helping assess 45Q tax credit eligibility.';
-        
+        // Get LLM response using the improved assessment prompt (applied server-side)
         const response = await fetch('/ask-question', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
+            // The server supplies the instructions for the template; only the conversation is sent
             body: JSON.stringify({
-                question: `${assessmentPrompt}
-
-You are conducting a 45Q eligibility assessment. Based on the conversation so far and the 45Q documents, what should you ask next to determine eligibility?
-
-Current conversation:
-${window.assessmentConversation.map(msg => `${msg.role}: ${msg.content}`).join('\n')}
-
-Please provide the next question you should ask, or if you have enough information, provide a complete eligibility assessment. Be conversational and ask specific follow-up questions based on what you've learned.`
+                template: 'assessment_turn',
+                question: `Current conversation:
+${window.assessmentConversation.map(msg => `${msg.role}: ${msg.content}`).join('\n')}`
             })
         });
         
@@ -1030,44 +1024,7 @@ Please provide the next question you should ask, or if you have enough informati
                 window.assessmentComplete = true;
                 // Force the AI to give a complete assessment
                 setTimeout(async () => {
-                    const finalAssessmentPrompt = `STOP ASKING QUESTIONS. STOP REFERRING TO TAX PROFESSIONALS. 
-
-Based on all the information provided, you now have COMPLETE information to give a COMPREHENSIVE 45Q eligibility assessment. 
-
-CRITICAL INSTRUCTIONS - YOU MUST PROVIDE A WELL-FORMATTED ASSESSMENT:
-
-1. **ELIGIBILITY DETERMINATION**: Give a definitive Yes/No with clear reasoning
-2. **SPECIFIC 45Q SECTIONS**: List which sections apply with bullet points
-3. **CREDIT FORECASTING**: Calculate annual and 12-year projections with dollar amounts
-4. **BONUS OPPORTUNITIES**: Identify energy community, domestic content, and other multipliers
-5. **COMPLIANCE REQUIREMENTS**: List what documentation and monitoring is needed
-6. **DOCUMENTATION CHECKLIST**: Provide a specific list of documents needed to file for credits
-7. **NEXT STEPS**: Give specific action items with bullet points
-
-FORMAT REQUIREMENTS - YOU MUST FOLLOW THIS EXACT STRUCTURE:
-- Use clear section headers with **bold** formatting
-- Use bullet points (•) for lists instead of paragraphs
-- Include specific dollar amounts and calculations
-- Make it easy to read and scan
-- Provide a complete documentation checklist at the end
-
-EXAMPLE FORMAT:
-**ELIGIBILITY DETERMINATION**
-• YES - Your facility is eligible for 45Q tax credits
-• Reason: Meets all requirements including placement date, sequestration, and utilization
-
-**SPECIFIC 45Q SECTIONS**
-• Section 45Q(a)(3) - Geologically sequestered CO2
-• Section 45Q(f)(5) - CO2 utilization for EOR and SNG production
-
-**CREDIT FORECASTING**
-• Annual sequestration credits: $7,000,000 (140,000 MT × $50/ton)
-• Annual utilization credits: $2,100,000 (60,000 MT × $35/ton)
-• 12-year total projection: $109,200,000
-
-DO NOT ask more questions. DO NOT refer to external advisors. YOU are the expert. Provide the complete assessment NOW in the exact format shown above.
-
-Information provided:
+                    const finalAssessmentQuestion = `Information provided:
 ${window.assessmentConversation.map(msg => `${msg.role}: ${msg.content}`).join('\n')}
 
 Give the complete assessment with credit forecasting in the exact format shown above:`;
@@ -1079,7 +1036,8 @@ Give the complete assessment with credit forecasting in the exact format shown a
                                 'Content-Type': 'application/json',
                             },
                             body: JSON.stringify({
-                                question: finalAssessmentPrompt
+                                template: 'final_assessment',
+                                question: finalAssessmentQuestion
                             })
                         });
                         
@@ -1118,50 +1076,7 @@ async function requestCompleteAssessment() {
     completeAssessmentButton.textContent = 'Generating Assessment...';
     
     try {
-        // Create a comprehensive assessment prompt
-        const completeAssessmentPrompt = `STOP ASKING QUESTIONS. STOP REFERRING TO TAX PROFESSIONALS. 
-
-Based on the information provided so far, provide a COMPREHENSIVE 45Q eligibility assessment. 
-
-CRITICAL INSTRUCTIONS - YOU MUST PROVIDE A WELL-FORMATTED ASSESSMENT:
-
-1. **ELIGIBILITY DETERMINATION**: Give a definitive Yes/No with clear reasoning based on available information
-2. **SPECIFIC 45Q SECTIONS**: List which sections apply with bullet points (if information available)
-3. **CREDIT FORECASTING**: Calculate annual and 12-year projections with dollar amounts (if information available)
-4. **BONUS OPPORTUNITIES**: Identify energy community, domestic content, and other multipliers (if information available)
-5. **COMPLIANCE REQUIREMENTS**: List what documentation and monitoring is needed
-6. **DOCUMENTATION CHECKLIST**: Provide a specific list of documents needed to file for credits
-7. **NEXT STEPS**: Give specific action items with bullet points
-8. **ADDITIONAL INFORMATION NEEDED**: If any critical information is missing, clearly list what additional details are required
-
-FORMAT REQUIREMENTS - YOU MUST FOLLOW THIS EXACT STRUCTURE:
-- Use clear section headers with **bold** formatting
-- Use bullet points (•) for lists instead of paragraphs
-- Include specific dollar amounts and calculations where possible
-- Make it easy to read and scan
-- Provide a complete documentation checklist at the end
-- If information is missing, clearly state what is needed
-
-EXAMPLE FORMAT:
-**ELIGIBILITY DETERMINATION**
-• YES - Your facility appears eligible for 45Q tax credits (based on available information)
-• Reason: Meets key requirements including placement date and sequestration methods
-
-**SPECIFIC 45Q SECTIONS**
-• Section 45Q(a)(3) - Geologically sequestered CO2
-• Section 45Q(f)(5) - CO2 utilization for EOR and SNG production
-
-**CREDIT FORECASTING**
-• Annual sequestration credits: $7,000,000 (140,000 MT × $50/ton)
-• Annual utilization credits: $2,100,000 (60,000 MT × $35/ton)
-• 12-year total projection: $109,200,000
-
-**ADDITIONAL INFORMATION NEEDED**
-• [List any missing critical information]
-
-DO NOT ask more questions. DO NOT refer to external advisors. YOU are the expert. Provide the complete assessment NOW in the exact format shown above.
-
-Information provided so far:
+        const completeAssessmentQuestion = `Information provided so far:
 ${window.assessmentConversation.map(msg => `${msg.role}: ${msg.content}`).join('\n')}
 
 Give the complete assessment with credit forecasting in the exact format shown above:`;
@@ -1172,7 +1087,8 @@ Give the complete assessment with credit forecasting in the exact format shown a
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
-                question: completeAssessmentPrompt
+                template: 'complete_assessment',
+                question: completeAssessmentQuestion
             })
         });
         
@@ -0,0 +1,116 @@
+import time
+import asyncio
+import httpx
+import openai
+import pytest
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.llm_service import OpenAILLMService
+
+
+class FakeChatModel:
+    """Stands in for ChatOpenAI: runs the queued behaviours one call at a time."""
+
+    def __init__(self, *behaviours):
+        self.behaviours = list(behaviours)
+        self.calls = 0
+
+    async def agenerate(self, messages):
+        self.calls += 1
+        behaviour = self.behaviours.pop(0) if self.behaviours else "ok"
+        if behaviour == "hang":
+            await asyncio.sleep(10)
+        if isinstance(behaviour, Exception):
+            raise behaviour
+        return "response"
+
+
+def make_service(model, **kwargs):
+    options = dict(timeout=1.0, max_retries=2, backoff_seconds=0.01, max_backoff_seconds=0.01,
+                   circuit_breaker=CircuitBreaker("openai", failure_threshold=3, reset_seconds=0.1))
+    options.update(kwargs)
+    service = OpenAILLMService("test-key", "gpt-4", **options)
+    service.llm = model
+    return service
+
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+
+
+def test_retries_retryable_errors_only():
+    """Test that connection errors are retried while other errors fail on the first attempt."""
+    model = FakeChatModel(connection_error(), connection_error())
+    service = make_service(model)
+    assert asyncio.run(service._agenerate([])) == "response"
+    assert model.calls == 3
+    assert service.circuit_breaker.state == "closed"
+
+    model = FakeChatModel(ValueError("bad request"))
+    service = make_service(model)
+    with pytest.raises(ValueError):
+        asyncio.run(service._agenerate([]))
+    assert model.calls == 1
+    assert service.circuit_breaker.consecutive_failures == 0
+
+
+def test_deadline_bounds_stalled_calls():
+    """Test that a hanging upstream call is abandoned at the call's deadline."""
+    model = FakeChatModel("hang", "hang", "hang")
+    service = make_service(model, timeout=0.2)
+
+    start = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(service._agenerate([]))
+    assert time.perf_counter() - start < 1.0
+
+
+def test_circuit_opens_fails_fast_and_recovers():
+    """Test that repeated failures open the circuit and a successful probe closes it."""
+    model = FakeChatModel(*[connection_error() for _ in range(3)])
+    service = make_service(model, max_retries=0)
+
+    for _ in range(3):
+        with pytest.raises(Exception):
+            asyncio.run(service._agenerate([]))
+    assert service.circuit_breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(service._agenerate([]))
+    assert model.calls == 3
+
+    time.sleep(0.15)
+    assert service.circuit_breaker.state == "half_open"
+    assert asyncio.run(service._agenerate([])) == "response"
+    assert service.circuit_breaker.to_dict()["state"] == "closed"
+    assert service.circuit_breaker.times_opened == 1
+
+
+def test_counts_one_failure_per_call():
+    """Test that a call failing all its retries counts once and a bad request leaves the streak alone."""
+    model = FakeChatModel(*[connection_error() for _ in range(3)], ValueError("bad request"))
+    service = make_service(model)
+
+    with pytest.raises(openai.APIConnectionError):
+        asyncio.run(service._agenerate([]))
+    assert model.calls == 3
+    assert service.circuit_breaker.consecutive_failures == 1
+
+    with pytest.raises(ValueError):
+        asyncio.run(service._agenerate([]))
+    assert service.circuit_breaker.consecutive_failures == 1
+    assert service.circuit_breaker.state == "closed"
+
+
+def test_failed_probe_reopens_circuit():
+    """Test that a failing half-open probe opens the circuit again and blocks other calls meanwhile."""
+    breaker = CircuitBreaker("openai", failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert breaker.times_opened == 2
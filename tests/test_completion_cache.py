@@ -0,0 +1,60 @@
+import os
+import time
+from app.utils.completion_cache import CompletionCache
+
+
+def test_key_covers_every_request_parameter():
+    """Test that changing the model, prompt, temperature or a parameter changes the key."""
+    base = CompletionCache.key("gpt-4", [{"role": "user", "content": "a"}], 0.7, max_tokens=2000)
+
+    assert base == CompletionCache.key("gpt-4", [{"role": "user", "content": "a"}], 0.7, max_tokens=2000)
+    assert base != CompletionCache.key("gpt-4o", [{"role": "user", "content": "a"}], 0.7, max_tokens=2000)
+    assert base != CompletionCache.key("gpt-4", [{"role": "user", "content": "b"}], 0.7, max_tokens=2000)
+    assert base != CompletionCache.key("gpt-4", [{"role": "user", "content": "a"}], 0.1, max_tokens=2000)
+    assert base != CompletionCache.key("gpt-4", [{"role": "user", "content": "a"}], 0.7, max_tokens=500)
+
+
+def test_entries_survive_reopening_and_force_bypasses(tmp_path):
+    """Test that a later run reuses completions unless forced, and forced runs overwrite them."""
+    key = CompletionCache.key("gpt-4", "prompt", 0.7)
+    CompletionCache(str(tmp_path)).put(key, {"answer": "first"})
+
+    resumed = CompletionCache(str(tmp_path))
+    assert resumed.get(key) == {"answer": "first"}
+    assert resumed.get(CompletionCache.key("gpt-4", "other prompt", 0.7)) is None
+    assert (resumed.hits, resumed.misses) == (1, 1)
+
+    forced = CompletionCache(str(tmp_path), force=True)
+    assert forced.get(key) is None
+    forced.put(key, {"answer": "second"})
+    assert CompletionCache(str(tmp_path)).get(key) == {"answer": "second"}
+
+
+def test_get_any_tries_each_key_as_one_lookup(tmp_path):
+    """Test that a completion stored under any candidate model's key is found, counting one hit or miss."""
+    cache = CompletionCache(str(tmp_path))
+    keys = [CompletionCache.key(model, "prompt", 0.1) for model in ("openai:gpt-4o", "anthropic:claude")]
+    cache.put(keys[1], "answer")
+
+    assert cache.get_any(keys) == "answer"
+    assert cache.get_any(keys[:1]) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expired_and_surplus_entries_are_pruned(tmp_path):
+    """Test that entries past the TTL miss and writes keep the cache within max_entries."""
+    cache = CompletionCache(str(tmp_path), max_age_seconds=60, max_entries=2, prune_interval_seconds=0)
+    keys = [CompletionCache.key("gpt-4", f"prompt {i}", 0.1) for i in range(4)]
+    cache.put(keys[0], "stale")
+    stale_path = cache._path(keys[0])
+    os.utime(stale_path, (time.time() - 120, time.time() - 120))
+    assert cache.get(keys[0]) is None
+
+    cache.put(keys[1], "one")
+    assert not stale_path.exists()
+    os.utime(cache._path(keys[1]), (time.time() - 10, time.time() - 10))
+    cache.put(keys[2], "two")
+    cache.put(keys[3], "three")
+    # The least recently written entry makes room
+    assert [cache.get(key) for key in keys] == [None, None, "two", "three"]
+    assert len(list(tmp_path.glob("*/*.json"))) == 2
@@ -0,0 +1,161 @@
+import random
+from datetime import datetime
+from app.services.eligibility_rules import RULES
+
+# The hand-written checks the rule set replaces, kept verbatim for parity
+
+
+def legacy_determine_eligibility(answers):
+    is_eligible = True
+    reasons = []
+    requirements_not_met = []
+    applicable_provisions = []
+
+    annual_co2 = answers.get("annual_co2_captured")
+    if annual_co2:
+        try:
+            annual_co2 = float(annual_co2)
+            if annual_co2 < 12.5:
+                is_eligible = False
+                requirements_not_met.append("Minimum CO2 capture requirement not met (12.5 metric tons)")
+        except (ValueError, TypeError):
+            requirements_not_met.append("Invalid CO2 capture amount format")
+            is_eligible = False
+
+    facility_type = answers.get("facility_type", "").lower()
+    if "direct air capture" in facility_type:
+        applicable_provisions.append("Section 45Q - Direct Air Capture")
+        if annual_co2 and isinstance(annual_co2, (int, float)) and annual_co2 < 1.0:
+            is_eligible = False
+            requirements_not_met.append("Direct air capture minimum requirement not met (1.0 metric tons)")
+    elif "electric generation" in facility_type:
+        applicable_provisions.append("Section 45Q - Electric Generation")
+    elif "industrial" in facility_type:
+        applicable_provisions.append("Section 45Q - Industrial Facilities")
+    else:
+        applicable_provisions.append("Section 45Q - Other Facilities")
+
+    sequestration_method = answers.get("sequestration_method", "").lower()
+    if "geologic storage" in sequestration_method or "enhanced oil recovery" in sequestration_method:
+        reasons.append("Qualified geologic storage or EOR sequestration")
+    elif "utilization" in sequestration_method:
+        reasons.append("CO2 utilization in qualified products")
+    else:
+        requirements_not_met.append("Qualified sequestration method required")
+        is_eligible = False
+
+    operation_date = answers.get("carbon_capture_operation_date")
+    if operation_date:
+        try:
+            op_date = datetime.strptime(operation_date, "%Y-%m-%d")
+            if op_date.year < 2023:
+                reasons.append("Facility operational before 2023")
+            elif op_date.year > 2032:
+                requirements_not_met.append("Facility must be operational by 2032")
+                is_eligible = False
+        except ValueError:
+            requirements_not_met.append("Invalid operation date format")
+
+    recommendations = []
+    if not is_eligible:
+        recommendations.append("Review facility characteristics to meet eligibility requirements")
+        recommendations.append("Consider increasing CO2 capture capacity if below minimum thresholds")
+        recommendations.append("Ensure qualified sequestration method is used")
+    recommendations.append("Consult with tax professionals for detailed guidance")
+    recommendations.append("Maintain detailed documentation of capture and sequestration")
+    recommendations.append("Consider domestic content requirements for bonus credits")
+    if "direct air capture" in facility_type:
+        recommendations.append("Ensure DAC facility meets specific technical requirements")
+    elif "industrial" in facility_type:
+        recommendations.append("Verify industrial facility qualifies under Section 45Q")
+
+    return {
+        "is_eligible": is_eligible,
+        "applicable_provisions": applicable_provisions,
+        "reasons": reasons,
+        "requirements_not_met": requirements_not_met,
+        "recommendations": recommendations,
+        "estimated_credit_rate": legacy_credit_rate(answers),
+        "confidence_score": 0.85
+    }
+
+
+def legacy_credit_rate(answers):
+    facility_type = answers.get("facility_type", "").lower()
+    base_rate = 85.0 if "direct air capture" in facility_type else 60.0
+    multiplier = 1.0
+    domestic_content = answers.get("domestic_content")
+    if domestic_content:
+        try:
+            if float(domestic_content) >= 40:
+                multiplier += 0.1
+        except (ValueError, TypeError):
+            pass
+    energy_community = answers.get("energy_community")
+    if energy_community:
+        if isinstance(energy_community, str):
+            if energy_community.lower() in ['true', 'yes', '1']:
+                multiplier += 0.1
+        elif isinstance(energy_community, bool) and energy_community:
+            multiplier += 0.1
+    return base_rate * multiplier
+
+
+def legacy_forecast_base_rate(facility_type, sequestration_method):
+    base_rate = 85.0 if "direct air capture" in facility_type.lower() else 60.0
+    if "utilization" in sequestration_method.lower():
+        base_rate *= 0.6
+    return base_rate
+
+
+FACILITY_TYPES = ["Electric generation facility", "Industrial facility (cement, steel, chemicals, etc.)",
+                  "Direct air capture facility", "Other", "DIRECT AIR CAPTURE plant", "industrial electric generation"]
+SEQUESTRATION_METHODS = ["Geologic storage (underground injection)", "Enhanced oil recovery (EOR)",
+                         "Utilization in products", "Other", "geologic storage with utilization", ""]
+CO2_AMOUNTS = ["5000", "12", "12.5", "0.5", "0", "0.0", "abc", 100000, 0.2, None, "", -3]
+DATES = ["2021-06-01", "2025-01-01", "2033-01-01", "2032-12-31", "not a date", "2025-1-5", None, ""]
+DOMESTIC = ["50", "39.9", 40, "x", None, 0]
+ENERGY = [True, False, "yes", "No", "1", "true", None, 1]
+
+
+def _random_answers(rng):
+    answers = {
+        "facility_type": rng.choice(FACILITY_TYPES),
+        "sequestration_method": rng.choice(SEQUESTRATION_METHODS),
+        "annual_co2_captured": rng.choice(CO2_AMOUNTS),
+        "carbon_capture_operation_date": rng.choice(DATES),
+        "domestic_content": rng.choice(DOMESTIC),
+        "energy_community": rng.choice(ENERGY)
+    }
+    return {key: value for key, value in answers.items() if value is not None or rng.random() < 0.5}
+
+
+def test_evaluate_matches_legacy_rules():
+    """Test that single and bulk evaluation reproduce the hand-written checks exactly."""
+    rng = random.Random(45)
+    rows = [_random_answers(rng) for _ in range(3000)]
+    rows = [row for row in rows if "facility_type" in row and "sequestration_method" in row]
+
+    expected = [legacy_determine_eligibility(row) for row in rows]
+    assert [RULES.evaluate(row).model_dump() for row in rows] == expected
+    assert [result.model_dump() for result in RULES.evaluate_many(rows)] == expected
+
+    scores = RULES.score_many(rows)
+    assert scores.is_eligible.tolist() == [result["is_eligible"] for result in expected]
+
+    # All-numeric capture amounts take the vectorized parsing path
+    numeric = [i for i, row in enumerate(rows) if row.get("annual_co2_captured") != "abc"]
+    assert [dict(fields) for fields in RULES.score_many([rows[i] for i in numeric]).result_dicts()] == \
+        [expected[i] for i in numeric]
+
+
+def test_forecast_rates_match_legacy():
+    """Test that forecast base rates and bonus multipliers are unchanged."""
+    for facility_type in FACILITY_TYPES:
+        for method in SEQUESTRATION_METHODS:
+            assert RULES.forecast_base_rate(facility_type, method) == legacy_forecast_base_rate(facility_type, method)
+
+    assert RULES.forecast_bonus_multipliers(45.0, True, "Industrial facility") == {
+        "domestic_content": 0.1, "energy_community": 0.1, "carbon_intensity": 0.05
+    }
+    assert RULES.forecast_bonus_multipliers(None, False, "Direct air capture facility") == {}
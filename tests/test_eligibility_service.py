@@ -0,0 +1,34 @@
+from app.services.eligibility_service import EligibilityService
+from app.services.questionnaire import get_questionnaire
+from app.services.session_store import InMemorySessionStore
+
+DAC_ANSWERS = {
+    "facility_name": "North Plant",
+    "location_city": "Houston",
+    "location_state": "TX",
+    "facility_type": "Direct air capture facility",
+    "ownership": "You (the taxpayer)",
+    "technology_ownership": "You (the taxpayer)",
+    "capture_method": "Direct air capture",
+    "annual_co2_captured": "5000",
+    # Skipped for direct air capture, so not part of the path
+    "capture_efficiency": "90",
+    "carbon_capture_operation_date": "2026-01-01",
+    "sequestration_method": "Geologic storage (underground injection)",
+    "sequestration_location": "Permian Basin"
+}
+
+
+def test_metrics_count_questions_on_the_path_once_per_completion():
+    """Test that skipped answers are not counted and answering a complete assessment does not count it again."""
+    service = EligibilityService(sessions=InMemorySessionStore(), rag_service=object())
+    path_length = get_questionnaire().path_length(DAC_ANSWERS)
+    assert path_length == len(get_questionnaire()) - 1
+
+    result = service.submit_assessment(DAC_ANSWERS)
+    assert result["is_complete"]
+    service.submit_answer(result["session_id"], "facility_name", "South Plant")
+
+    metrics = service.get_assessment_metrics()
+    assert metrics["completed_assessments"] == 1
+    assert metrics["average_questions_per_assessment"] == path_length
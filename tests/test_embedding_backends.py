@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from app.services.embedding_service import create_embeddings
+
+PASSAGES = [
+    "Direct air capture facilities must capture at least 1,000 metric tons of qualified carbon oxide per year.",
+    "Electricity generating facilities must capture at least 18,750 metric tons of carbon oxide annually.",
+    "Carbon oxide used as a tertiary injectant in enhanced oil recovery qualifies for a reduced credit rate.",
+    "Secure geologic storage requires monitoring, reporting and verification under EPA Subpart RR.",
+    "The prevailing wage and apprenticeship requirements increase the credit amount fivefold.",
+    "Construction of the carbon capture equipment must begin before January 1, 2033.",
+    "Utilization of carbon oxide in commercial products is measured through a lifecycle analysis.",
+    "The credit is available for twelve years beginning on the date the equipment is placed in service.",
+]
+
+QUERIES = [
+    "What is the minimum capture threshold for a DAC plant?",
+    "Does CO2 used for oil recovery qualify?",
+    "How long can the credit be claimed?",
+    "What monitoring is required for underground storage?",
+]
+
+
+def _rankings(embeddings):
+    passages = np.array(embeddings.embed_documents(PASSAGES))
+    queries = np.array([embeddings.embed_query(query) for query in QUERIES])
+    passages /= np.linalg.norm(passages, axis=1, keepdims=True)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.argsort(-(queries @ passages.T), axis=1)
+
+
+@pytest.fixture(scope="module")
+def reference_rankings():
+    try:
+        return _rankings(create_embeddings("torch"))
+    except Exception as e:
+        pytest.skip(f"Embedding model unavailable: {e}")
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_backend_rankings_match_torch(backend, reference_rankings):
+    """Test that ONNX backends rank the fixture passages like PyTorch does."""
+    try:
+        rankings = _rankings(create_embeddings(backend))
+    except Exception as e:
+        pytest.skip(f"{backend} backend unavailable: {e}")
+
+    for expected, actual in zip(reference_rankings, rankings):
+        assert actual[0] == expected[0]
+        assert len(set(actual[:3]) & set(expected[:3])) >= 2
+
+
+def test_unknown_backend_rejected():
+    """Test that an unknown backend name raises a clear error."""
+    with pytest.raises(ValueError):
+        create_embeddings("tensorflow")
@@ -0,0 +1,35 @@
+import os
+import json
+from app.utils.file_cache import CachedJSONFile, etag_matches
+
+
+def test_reloads_only_when_content_changes(tmp_path):
+    """Test that the file is parsed once and re-parsed only after its content changes."""
+    path = tmp_path / "questions.json"
+    path.write_text(json.dumps({"questions": [1, 2]}))
+    builds = []
+    cached_file = CachedJSONFile(str(path), lambda data: builds.append(data) or {"count": len(data["questions"])})
+
+    first = cached_file.get()
+    assert cached_file.get() is first
+    assert json.loads(first.body) == {"count": 2}
+
+    # Same content rewritten: new mtime, same ETag and no re-parse
+    path.write_text(json.dumps({"questions": [1, 2]}))
+    os.utime(path, ns=(1, 1))
+    assert cached_file.get().etag == first.etag
+    assert len(builds) == 1
+
+    path.write_text(json.dumps({"questions": [1, 2, 3]}))
+    os.utime(path, ns=(2, 2))
+    second = cached_file.get()
+    assert json.loads(second.body) == {"count": 3}
+    assert second.etag != first.etag
+
+
+def test_missing_file_and_etag_matching(tmp_path):
+    """Test that a missing file yields None and If-None-Match lists are honoured."""
+    assert CachedJSONFile(str(tmp_path / "missing.json")).get() is None
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches(None, '"b"')
@@ -0,0 +1,47 @@
+import time
+import httpx
+import openai
+import generate_enhanced_questions as generator
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def test_categories_keep_their_order_under_concurrency(monkeypatch):
+    """Test that results follow CATEGORIES order even when later categories finish first."""
+    categories = list(generator.CATEGORIES)
+
+    def request_questions(category, context):
+        # The first categories are the slowest to answer
+        time.sleep(0.01 * (len(categories) - categories.index(category)))
+        return [{"id": f"{category}_1", "question": f"About {category}?"}]
+
+    monkeypatch.setattr(generator, "request_questions", request_questions)
+    result = generator.generate_all_categories(concurrency=len(categories), retries=0)
+
+    assert list(result) == categories
+    assert result["emissions_data"]["questions"][0]["category"] == "Emissions Data and Monitoring"
+
+
+def test_retries_transient_errors_only(monkeypatch):
+    """Test that connection errors are retried while authentication errors fail at once."""
+    calls = []
+
+    def flaky(category, context):
+        calls.append(category)
+        if len(calls) == 1:
+            raise openai.APIConnectionError(request=REQUEST)
+        return [{"id": "q1"}]
+
+    monkeypatch.setattr(generator, "request_questions", flaky)
+    assert generator.generate_questions_with_chatgpt("project_scope", "", retries=2, backoff_seconds=0) == [{"id": "q1"}]
+    assert len(calls) == 2
+
+    calls.clear()
+
+    def unauthorized(category, context):
+        calls.append(category)
+        raise openai.AuthenticationError("bad key", response=httpx.Response(401, request=REQUEST), body=None)
+
+    monkeypatch.setattr(generator, "request_questions", unauthorized)
+    assert generator.generate_questions_with_chatgpt("project_scope", "", retries=3, backoff_seconds=0) == []
+    assert len(calls) == 1
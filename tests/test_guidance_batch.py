@@ -0,0 +1,190 @@
+import json
+import asyncio
+from types import SimpleNamespace
+import pytest
+from langchain.schema import Document
+from app.services.guidance_batch import GuidanceBatchRunner
+
+FACILITIES = [{"facility_type": f"type-{i}"} for i in range(5)]
+
+
+class FakeRAG:
+    """Answers guidance requests, failing the facilities in `fail` and stalling on those in `stall`."""
+
+    def __init__(self, fail=(), stall=()):
+        self.fail = set(fail)
+        self.stall = set(stall)
+        self.calls = []
+
+    async def get_guidance(self, facility_info, kinds):
+        self.calls.append(facility_info["facility_type"])
+        await asyncio.sleep(10 if facility_info["facility_type"] in self.stall else 0)
+        if facility_info["facility_type"] in self.fail:
+            raise RuntimeError("provider down")
+        return {kind: {"answer": f"{kind} for {facility_info['facility_type']}"} for kind in kinds}
+
+    def guidance_prompt(self, kind, facility_info):
+        return f"{kind}: {facility_info['facility_type']}", f"instructions for {kind}"
+
+    def retrieve_many(self, queries):
+        return [[Document(page_content=f"doc for {query}")] for query in queries]
+
+    @staticmethod
+    def context_from_documents(docs):
+        return "\n\n".join(doc.page_content for doc in docs)
+
+    def package_answer(self, question, answer, context, docs):
+        return {"answer": answer, "context": context, "sources": len(docs)}
+
+
+async def _drain(runner):
+    while any(job.meta["status"] in ("queued", "running", "submitted") for job in runner._jobs.values()):
+        await asyncio.sleep(0.01)
+
+
+def _results(runner, job_id):
+    return [json.loads(line) for line in runner.iter_results(job_id)]
+
+
+def test_workers_drain_job_and_record_failures(tmp_path):
+    """Test that every item gets a result line and failures are reported per item."""
+    runner = GuidanceBatchRunner(FakeRAG(fail={"type-3"}), directory=str(tmp_path), concurrency=2, mode="workers")
+
+    async def run():
+        job = runner.submit(FACILITIES, ["eligibility"])
+        await _drain(runner)
+        await runner.shutdown()
+        return job["job_id"]
+
+    job_id = asyncio.run(run())
+
+    job = runner.get(job_id)
+    assert job["status"] == "completed"
+    assert (job["succeeded"], job["failed"], job["progress"]) == (4, 1, 1.0)
+    results = _results(runner, job_id)
+    assert [line["index"] for line in results] == [0, 1, 2, 3, 4]
+    assert results[0]["result"]["eligibility"]["answer"] == "eligibility for type-0"
+    assert results[3]["error"] == "provider down"
+
+
+def test_resume_skips_completed_items(tmp_path):
+    """Test that a job interrupted mid-way resumes only the items without a successful result."""
+    first = GuidanceBatchRunner(FakeRAG(fail={"type-1"}, stall={"type-2"}), directory=str(tmp_path),
+                                concurrency=1, mode="workers")
+
+    async def interrupted():
+        job = first.submit(FACILITIES[:3])
+        while first._jobs[job["job_id"]].finished < 2:
+            await asyncio.sleep(0.001)
+        await first.shutdown()
+        return job["job_id"]
+
+    job_id = asyncio.run(interrupted())
+    # A partial line left by the crash is ignored
+    with open(tmp_path / job_id / "results.jsonl", "a") as f:
+        f.write('{"index": 2, "sta')
+
+    rag = FakeRAG()
+    second = GuidanceBatchRunner(rag, directory=str(tmp_path), concurrency=2, mode="workers")
+
+    async def resumed():
+        assert second.resume() == [job_id]
+        await _drain(second)
+        await second.shutdown()
+
+    asyncio.run(resumed())
+
+    assert sorted(rag.calls) == ["type-1", "type-2"]
+    job = second.get(job_id)
+    assert (job["status"], job["succeeded"], job["failed"]) == ("completed", 3, 0)
+    assert all(line["status"] == "succeeded" for line in _results(second, job_id))
+
+
+def test_one_worker_drains_a_job_and_others_read_progress(tmp_path):
+    """Test that a job is resumed by one worker only and other workers see its progress on disk."""
+    owner = GuidanceBatchRunner(FakeRAG(stall={"type-2"}), directory=str(tmp_path), concurrency=1, mode="workers")
+    rag = FakeRAG()
+    other = GuidanceBatchRunner(rag, directory=str(tmp_path), concurrency=1, mode="workers")
+
+    async def run():
+        job_id = owner.submit(FACILITIES[:3])["job_id"]
+        assert other.get(job_id)["succeeded"] == 0
+        while owner._jobs[job_id].finished < 2:
+            await asyncio.sleep(0.001)
+        # The owner holds the job's lock, so the other worker leaves it alone
+        assert other.resume() == []
+        assert other.get(job_id)["succeeded"] == 2
+
+        # Once the owner stops, the job is free to be picked up
+        await owner.shutdown()
+        assert other.resume() == [job_id]
+        await _drain(other)
+        await other.shutdown()
+        return job_id
+
+    job_id = asyncio.run(run())
+
+    assert rag.calls == ["type-2"]
+    for runner in (owner, other):
+        job = runner.get(job_id)
+        assert (job["status"], job["succeeded"]) == ("completed", 3)
+
+
+class FakeBatches:
+    """OpenAI client stand-in that completes a batch on its second status check."""
+
+    def __init__(self):
+        self.input = None
+        self.checks = 0
+
+    async def create_file(self, file, purpose):
+        self.input = [json.loads(line) for line in file.read().decode().splitlines()]
+        return SimpleNamespace(id="file-in")
+
+    async def create(self, input_file_id, endpoint, completion_window):
+        return SimpleNamespace(id="batch-1", status="validating")
+
+    async def retrieve(self, batch_id):
+        self.checks += 1
+        status = "completed" if self.checks > 1 else "in_progress"
+        return SimpleNamespace(id=batch_id, status=status, output_file_id="file-out", error_file_id=None)
+
+    async def content(self, file_id):
+        lines = [
+            {"custom_id": request["custom_id"],
+             "response": {"status_code": 200, "body": {"choices": [{"message": {"content": f"answer {request['custom_id']}"}}]}}}
+            for request in self.input if not request["custom_id"].startswith("1:")
+        ]
+        return SimpleNamespace(text="\n".join(json.dumps(line) for line in lines))
+
+
+def test_openai_batch_mode_maps_outputs_to_items(tmp_path):
+    """Test that provider batch outputs are packaged per facility and missing outputs fail their item."""
+    fake = FakeBatches()
+    client = SimpleNamespace(files=SimpleNamespace(create=fake.create_file, content=fake.content),
+                             batches=SimpleNamespace(create=fake.create, retrieve=fake.retrieve))
+    runner = GuidanceBatchRunner(FakeRAG(), directory=str(tmp_path), mode="openai_batch",
+                                 poll_seconds=0, openai_client=client)
+
+    async def run():
+        job = runner.submit(FACILITIES[:2])
+        await _drain(runner)
+        return job["job_id"]
+
+    job_id = asyncio.run(run())
+
+    assert len(fake.input) == 4
+    assert fake.input[0]["body"]["messages"][0] == {"role": "system", "content": "instructions for eligibility"}
+    job = runner.get(job_id)
+    assert (job["status"], job["succeeded"], job["failed"]) == ("completed", 1, 1)
+    results = _results(runner, job_id)
+    assert results[0]["result"]["credit_calculation"]["answer"] == "answer 0:credit_calculation"
+    assert "no result in batch output" in results[1]["error"]
+
+
+def test_rejects_unknown_kinds(tmp_path):
+    """Test that unknown guidance kinds are refused before anything is queued."""
+    runner = GuidanceBatchRunner(FakeRAG(), directory=str(tmp_path))
+    with pytest.raises(ValueError):
+        runner.submit(FACILITIES, ["forecast"])
+    assert not any(tmp_path.iterdir())
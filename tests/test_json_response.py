@@ -0,0 +1,64 @@
+import json
+import asyncio
+from datetime import datetime
+import httpx
+import numpy as np
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from app.config import settings
+from app.models.forecasting import ForecastPeriod
+from app.models.responses import BaseResponse
+from app.utils.json_response import FastJSONResponse, add_compression, dumps
+
+
+def test_dumps_matches_default_encoding():
+    """Test that nested models, datetimes and sets encode like FastAPI's jsonable_encoder."""
+    period = ForecastPeriod(year=2030, co2_captured_tons=1.5, credit_rate=85.0, total_credits=2.0, total_value=3.0)
+    content = BaseResponse(success=True, message="ok", data={
+        "periods": [period],
+        "generated_at": datetime(2025, 1, 2, 3, 4, 5),
+        "tags": {"45q"}
+    })
+
+    assert json.loads(dumps(content)) == json.loads(json.dumps(jsonable_encoder(content)))
+    assert json.loads(dumps({1: period})) == {"1": period.model_dump()}
+
+
+def test_dumps_numpy_values():
+    """Test that numpy scalars and arrays inside untyped fields are serialized rather than rejected."""
+    content = BaseResponse(success=True, message="ok", data={"score": np.float32(0.5), "counts": np.arange(3)})
+    assert json.loads(dumps(content))["data"] == {"score": 0.5, "counts": [0, 1, 2]}
+
+
+def _get(app, path, accept_encoding):
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path, headers={"Accept-Encoding": accept_encoding})
+    return asyncio.run(request())
+
+
+def test_compresses_bodies_over_threshold(monkeypatch):
+    """Test that only responses of at least the configured size are compressed."""
+    monkeypatch.setattr(settings, "response_compression", "gzip")
+    monkeypatch.setattr(settings, "response_compression_min_bytes", 500)
+    app = FastAPI(default_response_class=FastJSONResponse)
+    add_compression(app)
+
+    @app.get("/small")
+    async def small():
+        return BaseResponse(success=True, message="ok")
+
+    @app.get("/large")
+    async def large():
+        return FastJSONResponse(BaseResponse(success=True, message="ok", data=["45Q credit"] * 200))
+
+    response = _get(app, "/small", "gzip")
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"success": True, "message": "ok", "data": None, "error": None}
+
+    response = _get(app, "/large", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < 500
+    assert response.json()["data"] == ["45Q credit"] * 200
+
+    assert "content-encoding" not in _get(app, "/large", "identity").headers
@@ -0,0 +1,73 @@
+import asyncio
+from app.services.llm_router import LLMRouter, LLMRoutingError
+from app.services.llm_service import LocalLLMService
+
+
+def _local(latency_ms: float, error_rate: float = 0.0) -> LocalLLMService:
+    return LocalLLMService(latency_distribution="fixed", latency_ms=latency_ms, error_rate=error_rate,
+                           response_tokens=5)
+
+
+def test_routes_to_fastest_provider_after_measuring():
+    """Test that once each provider has been measured, calls go to the lowest-latency one."""
+    router = LLMRouter({"slow": _local(60), "fast": _local(5)}, hedge=False)
+
+    async def run():
+        for _ in range(4):
+            await router.generate_response("45Q eligibility")
+
+    asyncio.run(run())
+
+    assert router.ranked_providers() == ["fast", "slow"]
+    assert router.stats["fast"].calls >= 3
+
+
+def test_fails_over_and_demotes_failing_provider():
+    """Test that a failing provider's calls are answered by the next one and it drops to last."""
+    router = LLMRouter({"broken": _local(0, error_rate=1.0), "backup": _local(20)},
+                       hedge=False, alpha=0.6, cooldown_seconds=60)
+
+    response = asyncio.run(router.generate_response("45Q eligibility"))
+
+    assert response.startswith("[local:")
+    assert router.ranked_providers() == ["backup", "broken"]
+
+
+def test_hedged_request_wins_and_cancels_slow_provider():
+    """Test that a call slower than the hedge delay is raced against the next provider."""
+    router = LLMRouter({"stalled": _local(2000), "healthy": _local(10)}, hedge=True, default_hedge_delay=0.05)
+
+    async def run():
+        start = asyncio.get_running_loop().time()
+        response = await router.generate_response("45Q eligibility")
+        return response, asyncio.get_running_loop().time() - start
+
+    response, elapsed = asyncio.run(run())
+
+    assert response and elapsed < 1.0
+    assert router.stats["healthy"].hedges_won == 1
+    assert router.stats["stalled"].calls == 0  # cancelled, neither a success nor a failure
+
+
+def test_all_providers_failing_raises():
+    """Test that the router reports every provider's error when none succeeds."""
+    router = LLMRouter({"a": _local(0, error_rate=1.0), "b": _local(0, error_rate=1.0)}, hedge=False)
+
+    try:
+        asyncio.run(router.chat_completion([{"role": "user", "content": "hi"}]))
+    except LLMRoutingError as e:
+        assert "a:" in str(e) and "b:" in str(e)
+    else:
+        raise AssertionError("expected LLMRoutingError")
+
+
+def test_reports_the_model_that_answered():
+    """Test that a failed-over call reports the backup's model, for keying cached completions."""
+    broken, backup = _local(0, error_rate=1.0), _local(5)
+    broken.model, backup.model = "broken-model", "backup-model"
+    router = LLMRouter({"broken": broken, "backup": backup}, hedge=False, alpha=0.6, cooldown_seconds=60)
+
+    answer, model = asyncio.run(router.chat_completion_with_model([{"role": "user", "content": "hi"}]))
+
+    assert answer.startswith("[local:") and model == "local:backup-model"
+    assert router.model_ids() == ["local:backup-model", "local:broken-model"]
@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+from fastapi import FastAPI
+from app.config import get_llm_config
+from app.services.llm_service import LocalLLMService
+from app.services.llm_usage import (
+    LLMUsageRoute, LLMUsageTracker, estimate_cost, extract_token_usage, llm_usage, llm_usage_tags
+)
+
+
+def test_costs_use_longest_model_prefix():
+    """Test that prices follow the most specific model prefix and unknown models cost nothing."""
+    assert estimate_cost("gpt-4o-mini-2024-07-18", 1_000_000, 0) == 0.15
+    assert estimate_cost("gpt-4", 1000, 1000) == (1000 * 30 + 1000 * 60) / 1_000_000
+    assert estimate_cost("local", 1000, 1000) == 0.0
+    # Cached prompt tokens are billed at the provider's discounted rate
+    assert estimate_cost("gpt-4o", 2000, 0, cached_prompt_tokens=1000) == (1000 * 2.5 + 1000 * 1.25) / 1_000_000
+
+
+def test_token_usage_from_message_metadata_or_llm_output():
+    """Test that usage is read from message usage metadata, falling back to llm_output."""
+    message = SimpleNamespace(usage_metadata={"input_tokens": 1200, "output_tokens": 30,
+                                              "input_token_details": {"cache_read": 1024}})
+    assert extract_token_usage(SimpleNamespace(generations=[[SimpleNamespace(message=message)]])) == (1200, 30, 1024)
+    legacy = SimpleNamespace(generations=[], llm_output={"token_usage": {
+        "prompt_tokens": 7, "completion_tokens": 3, "prompt_tokens_details": {"cached_tokens": 0}}})
+    assert extract_token_usage(legacy) == (7, 3, 0)
+    assert extract_token_usage("text") == (0, 0, 0)
+
+
+def test_summary_groups_by_tags_and_drops_old_calls():
+    """Test that calls are aggregated per endpoint, provider and session within the window."""
+    tracker = LLMUsageTracker(window_seconds=60)
+    with llm_usage_tags(endpoint="/ask-question"):
+        tracker.record("openai", "gpt-4", 1000, 200, 1.0)
+        with llm_usage_tags(session_id="s1"):
+            tracker.record("openai", "gpt-4", 3000, 100, 2.0, cached_prompt_tokens=2000)
+    tracker.record("local", "local", 10, 10, 0.5, error=True)
+    tracker._calls[-1].timestamp -= 120
+
+    summary = tracker.summary()
+
+    assert summary["total"]["calls"] == 2
+    endpoint = summary["endpoints"]["/ask-question"]
+    assert endpoint["prompt_tokens"] == 4000 and endpoint["max_prompt_tokens"] == 3000
+    assert endpoint["avg_latency_ms"] == 1500
+    assert endpoint["prompt_cache_hit_rate"] == 0.5
+    assert list(summary["providers"]) == ["openai:gpt-4"]
+    assert summary["sessions"]["s1"]["calls"] == 1
+    assert "unknown" not in summary["endpoints"]
+
+
+def test_local_provider_calls_are_recorded_with_tags():
+    """Test that calls through a provider service land in the shared tracker with the caller's tags."""
+    llm = LocalLLMService(latency_ms=0, response_tokens=12)
+
+    async def run():
+        with llm_usage_tags(endpoint="/test-usage", session_id="local-session"):
+            await llm.generate_response("How is the credit computed?")
+
+    asyncio.run(run())
+
+    summary = llm_usage.summary()
+    endpoint = summary["endpoints"]["/test-usage"]
+    assert endpoint["calls"] == 1
+    assert endpoint["prompt_tokens"] == 5 and endpoint["completion_tokens"] == 12
+    # Recorded under the model /llm-provider-info reports for the local provider
+    assert f"local:{get_llm_config('local')['model']}" in summary["providers"]
+
+
+
+def test_route_class_tags_endpoint_and_session():
+    """Test that endpoints on LLMUsageRoute record calls under their route path and path session id."""
+    app = FastAPI()
+    app.router.route_class = LLMUsageRoute
+    llm = LocalLLMService(latency_ms=0, response_tokens=3)
+
+    @app.post("/route-usage/{session_id}")
+    async def guidance(session_id: str):
+        return {"answer": await llm.generate_response("Which credit applies?")}
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/route-usage/route-session")
+
+    assert asyncio.run(run()).status_code == 200
+    summary = llm_usage.summary()
+    assert summary["endpoints"]["/route-usage/{session_id}"]["calls"] == 1
+    assert summary["sessions"]["route-session"]["calls"] == 1
@@ -0,0 +1,72 @@
+import time
+import asyncio
+from typing import List, Literal, Optional
+import pytest
+from pydantic import BaseModel
+from app.services.llm_service import LocalLLMService, LocalLLMError
+from app.utils.structured_output import structured_output_metrics
+
+
+def test_responses_are_deterministic_and_canned_responses_win():
+    """Test that the same prompt always gets the same text and canned markers override the template."""
+    llm = LocalLLMService(latency_ms=0, response_tokens=30, canned_responses={"credit rate": "85 dollars per ton"})
+
+    async def run():
+        return (await llm.generate_response("Is a DAC facility eligible?"),
+                await LocalLLMService(latency_ms=0, response_tokens=30, seed=7).generate_response("Is a DAC facility eligible?"),
+                await llm.generate_response("What is the credit rate?"))
+
+    first, other_seed, canned = asyncio.run(run())
+
+    assert first == other_seed
+    assert len(first.split(" ")) == 30
+    assert canned == "85 dollars per ton"
+
+
+def test_streaming_paces_tokens():
+    """Test that streamed tokens rebuild the full response at the configured token rate."""
+    llm = LocalLLMService(latency_distribution="fixed", latency_ms=0, tokens_per_second=200, response_tokens=20)
+
+    async def run():
+        start = time.perf_counter()
+        chunks = [chunk async for chunk in llm.stream_response("Describe 45Q")]
+        return chunks, time.perf_counter() - start, await llm.generate_response("Describe 45Q")
+
+    chunks, elapsed, full = asyncio.run(run())
+
+    assert len(chunks) == 20 and "".join(chunks) == full
+    assert elapsed >= 19 / 200
+
+
+def test_error_injection():
+    """Test that an error rate of one fails every request."""
+    llm = LocalLLMService(latency_ms=0, error_rate=1.0)
+
+    with pytest.raises(LocalLLMError):
+        asyncio.run(llm.generate_response("anything"))
+    with pytest.raises(ValueError):
+        LocalLLMService(latency_distribution="pareto")
+
+
+class Eligibility(BaseModel):
+    eligible: bool
+    method: Literal["geologic", "utilization"]
+    credit_rate: float
+    notes: Optional[str] = None
+    reasons: List[str]
+
+
+def test_structured_responses_validate_like_hosted_models():
+    """Test that example-dict and pydantic schemas both return validated dicts and are counted."""
+    llm = LocalLLMService(latency_ms=0)
+    before = structured_output_metrics.to_dict()["responses"]
+
+    async def run():
+        return (await llm.generate_structured_response("Is it eligible?", {"eligible": True, "score": 0.5}),
+                await llm.generate_structured_response("Is it eligible?", Eligibility))
+
+    from_example, from_model = asyncio.run(run())
+
+    assert from_example == {"eligible": True, "score": 0.5}
+    assert from_model == {"eligible": False, "method": "geologic", "credit_rate": 0.0, "notes": None, "reasons": []}
+    assert structured_output_metrics.to_dict()["responses"] == before + 2
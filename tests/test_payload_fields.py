@@ -0,0 +1,38 @@
+import pytest
+from app.utils.payload_fields import select_fields, summarize_source
+
+SOURCE = {"id": "chunk-1", "content": "Section 45Q   provides a credit\nper metric ton of qualified carbon oxide.",
+          "metadata": {"file_name": "irs-notice.pdf", "page": 3}}
+GUIDANCE = {
+    "facility_info": {"facility_type": "Direct Air Capture"},
+    "rag_guidance": {"answer": "Eligible.", "confidence_score": 0.8, "context": "full context", "sources": [SOURCE]},
+    "assessment_result": {"eligible": True}
+}
+
+
+def test_compact_default_summarizes_sources():
+    """Test that the default payload drops the context and keeps source ids, titles and snippets."""
+    data = select_fields(GUIDANCE, ["rag_guidance"])
+
+    assert data["facility_info"] == GUIDANCE["facility_info"]
+    assert data["rag_guidance"] == {
+        "answer": "Eligible.",
+        "confidence_score": 0.8,
+        "sources": [{"id": "chunk-1", "title": "irs-notice.pdf (page 3)",
+                     "snippet": "Section 45Q provides a credit per metric ton of qualified carbon oxide."}]
+    }
+    assert summarize_source(SOURCE, snippet_chars=20)["snippet"] == "Section 45Q provides…"
+    assert summarize_source({"content": "", "metadata": {"source": "docs/guide.txt"}})["title"] == "guide.txt"
+
+
+def test_fields_and_include():
+    """Test that fields limits the top-level keys and include restores the full context and sources."""
+    data = select_fields(GUIDANCE, ["rag_guidance"], fields="rag_guidance", include="context, source_text")
+    assert list(data) == ["rag_guidance"]
+    assert data["rag_guidance"]["context"] == "full context"
+    assert data["rag_guidance"]["sources"] == [SOURCE]
+
+    with pytest.raises(ValueError, match="Unknown fields"):
+        select_fields(GUIDANCE, ["rag_guidance"], fields="forecast")
+    with pytest.raises(ValueError, match="Unknown include"):
+        select_fields(GUIDANCE, ["rag_guidance"], include="everything")
@@ -0,0 +1,114 @@
+import sys
+import json
+import asyncio
+import pytest
+from app.services.question_base_job import JOBS_DIR, LOCK_FILE, QuestionBaseRegenerator, RegenerationInProgress
+
+# Stand-in for generate_question_base.py: prints the stage markers and writes both files
+FAKE_GENERATOR = """
+import os, sys, json, time
+output_dir = sys.argv[sys.argv.index("--output-dir") + 1]
+print("Analyzing documents", flush=True)
+time.sleep(float(sys.argv[1]))
+for name in ("question_base.json", "assessment_prompt.json"):
+    with open(os.path.join(output_dir, name), "w") as f:
+        json.dump({"version": 2}, f)
+print("Improved assessment prompt generated", flush=True)
+"""
+
+
+def _regenerator(tmp_path, delay: float) -> QuestionBaseRegenerator:
+    (tmp_path / "assessment_prompt.json").write_text(json.dumps({"version": 1}))
+    return QuestionBaseRegenerator(target_dir=str(tmp_path), cancel_poll_seconds=0.05,
+                                   command=[sys.executable, "-c", FAKE_GENERATOR, str(delay)])
+
+
+def _live_files(tmp_path):
+    return sorted(p.name for p in tmp_path.iterdir() if p.name not in (LOCK_FILE, JOBS_DIR))
+
+
+def test_regeneration_swaps_files_when_done(tmp_path):
+    """Test that a finished job replaces the live files and reports its progress."""
+    regenerator = _regenerator(tmp_path, 0)
+
+    async def run():
+        job = regenerator.start()
+        with pytest.raises(RegenerationInProgress):
+            regenerator.start()
+        await regenerator._jobs[job["job_id"]].task
+        return regenerator.get(job["job_id"])
+
+    job = asyncio.run(run())
+
+    assert job["status"] == "succeeded" and job["progress"] == 1.0
+    assert json.loads((tmp_path / "assessment_prompt.json").read_text()) == {"version": 2}
+    assert _live_files(tmp_path) == ["assessment_prompt.json", "question_base.json"]
+
+
+def test_cancelled_regeneration_leaves_files_untouched(tmp_path):
+    """Test that cancelling stops the script and keeps the previous files."""
+    regenerator = _regenerator(tmp_path, 30)
+
+    async def run():
+        job = regenerator.start()
+        while regenerator.get(job["job_id"])["stage"] != "analyzing_documents":
+            await asyncio.sleep(0.05)
+        return await regenerator.cancel(job["job_id"])
+
+    job = asyncio.run(run())
+
+    assert job["status"] == "cancelled"
+    assert json.loads((tmp_path / "assessment_prompt.json").read_text()) == {"version": 1}
+    assert _live_files(tmp_path) == ["assessment_prompt.json"]
+
+
+def test_one_regeneration_across_workers(tmp_path):
+    """Test that a second regenerator on the same directory (another worker) is refused until the first ends."""
+    first, second = _regenerator(tmp_path, 0.5), _regenerator(tmp_path, 0)
+
+    async def run():
+        job = first.start()
+        with pytest.raises(RegenerationInProgress) as refused:
+            second.start()
+        assert refused.value.job["job_id"] == job["job_id"]
+        await first._jobs[job["job_id"]].task
+        retry = second.start()
+        await second._jobs[retry["job_id"]].task
+        return second.get(retry["job_id"])
+
+    assert asyncio.run(run())["status"] == "succeeded"
+
+
+def test_other_worker_polls_and_cancels(tmp_path):
+    """Test that a worker that did not start the job can read its progress and cancel it."""
+    owner, other = _regenerator(tmp_path, 30), _regenerator(tmp_path, 0)
+
+    async def run():
+        job = owner.start()
+        while other.get(job["job_id"])["stage"] != "analyzing_documents":
+            await asyncio.sleep(0.05)
+        cancelled = await other.cancel(job["job_id"])
+        await asyncio.gather(owner._jobs[job["job_id"]].task, return_exceptions=True)
+        return cancelled
+
+    job = asyncio.run(run())
+
+    assert job["status"] == "cancelled"
+    assert _live_files(tmp_path) == ["assessment_prompt.json"]
+    with pytest.raises(ValueError):
+        other.get("not-a-job")
+
+
+def test_cancel_before_start_frees_the_lock(tmp_path):
+    """Test that a job cancelled before its task ran is finished and a new one can start."""
+    regenerator = _regenerator(tmp_path, 0)
+
+    async def run():
+        job = regenerator.start()
+        assert (await regenerator.cancel(job["job_id"]))["status"] == "cancelled"
+        retry = regenerator.start()
+        await regenerator._jobs[retry["job_id"]].task
+        return regenerator.get(job["job_id"]), regenerator.get(retry["job_id"])
+
+    cancelled, retry = asyncio.run(run())
+    assert (cancelled["status"], retry["status"]) == ("cancelled", "succeeded")
@@ -0,0 +1,71 @@
+import pytest
+from app.models.eligibility import EligibilityQuestion, QuestionType
+from app.services.questionnaire import Questionnaire, get_questionnaire
+
+VALID_ANSWERS = {
+    "facility_name": "North Plant",
+    "location_city": "Houston",
+    "location_state": "TX",
+    "facility_type": "Industrial facility (cement, steel, chemicals, etc.)",
+    "ownership": "You (the taxpayer)",
+    "technology_ownership": "You (the taxpayer)",
+    "capture_method": "Post-combustion capture",
+    "annual_co2_captured": "150000",
+    "carbon_capture_operation_date": "2026-01-01",
+    "sequestration_method": "Geologic storage (underground injection)",
+    "sequestration_location": "Permian Basin",
+    "energy_community": True
+}
+
+
+def test_validate_accepts_complete_answers():
+    """Test that a complete, well-typed answer map has no errors."""
+    assert get_questionnaire().validate(VALID_ANSWERS) == []
+
+
+def test_validate_reports_every_problem_in_one_pass():
+    """Test that missing, mistyped and unknown answers are all reported in question order."""
+    answers = dict(VALID_ANSWERS, facility_type="Refinery", annual_co2_captured="lots", energy_community="maybe",
+                   facility_id="F-1")
+    del answers["location_city"]
+
+    errors = get_questionnaire().validate(answers)
+
+    assert [error["question_id"] for error in errors] == [
+        "location_city", "facility_type", "annual_co2_captured", "energy_community", "facility_id"
+    ]
+    assert errors[0]["message"] == "Answer is required"
+
+
+def test_dependent_question_only_required_when_condition_met():
+    """Test that a required question is skipped unless its parent answer meets the condition."""
+    questionnaire = Questionnaire((
+        EligibilityQuestion(id="stores", question="Stored?", type=QuestionType.BOOLEAN),
+        EligibilityQuestion(id="site", question="Where?", type=QuestionType.TEXT,
+                            depends_on="stores", condition={"equals": True}),
+    ))
+
+    assert questionnaire.validate({"stores": False}) == []
+    assert questionnaire.validate({"stores": True}) == [{"question_id": "site", "message": "Answer is required"}]
+
+
+def test_next_index_skips_questions_that_do_not_apply():
+    """Test that the step-by-step path jumps over conditional questions and progress follows the path."""
+    questionnaire = get_questionnaire()
+    position = {question.id: i for i, question in enumerate(questionnaire)}
+    answers = {"facility_type": "Direct air capture facility", "capture_method": "Direct air capture",
+               "annual_co2_captured": 5000}
+
+    assert questionnaire.next_index(position["annual_co2_captured"], answers) == position["facility_construction_date"]
+    assert questionnaire.path_length(answers) == len(questionnaire) - 1
+    assert questionnaire.path_length({}) == len(questionnaire)
+    assert questionnaire.progress(len(questionnaire), answers) == 1.0
+
+
+def test_dependency_must_point_to_an_earlier_question():
+    """Test that a forward or unknown dependency is rejected when the questionnaire is built."""
+    with pytest.raises(ValueError):
+        Questionnaire((
+            EligibilityQuestion(id="site", question="Where?", type=QuestionType.TEXT, depends_on="stores"),
+            EligibilityQuestion(id="stores", question="Stored?", type=QuestionType.BOOLEAN),
+        ))
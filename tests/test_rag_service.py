@@ -0,0 +1,106 @@
+import asyncio
+from pathlib import Path
+import pytest
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from app.config import settings
+from app.services.llm_service import LocalLLMService
+from app.services.rag_service import IndexRebuildInProgress, RAGService
+from app.utils.vector_index import generations_dir, rebuild_lock, resolve_live_path
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vector_db_path", str(tmp_path / "vector_db"))
+    monkeypatch.setattr(settings, "index_generations_to_keep", 1)
+    monkeypatch.setattr(settings, "index_reload_check_seconds", 0)
+    return RAGService(embeddings=DeterministicFakeEmbedding(size=16))
+
+
+def _chunks(*texts):
+    return [Document(page_content=text, metadata={"file_name": f"{text}.pdf"}) for text in texts]
+
+
+def test_rebuild_swaps_generation_and_keeps_previous(rag):
+    """Test that a rebuild becomes the live generation, queries switch over and the previous one is kept."""
+    first = rag.rebuild_index(_chunks("old credit rules", "old storage rules"))
+    assert resolve_live_path() == rag.persist_directory
+    assert rag.retrieve_relevant_documents("old credit rules", 1)[0].page_content == "old credit rules"
+
+    second = rag.rebuild_index(_chunks("new credit rules"))
+    assert resolve_live_path() == Path(second["generation"]).resolve()
+    assert [doc.page_content for doc in rag.retrieve_relevant_documents("old credit rules", 5)] == ["new credit rules"]
+
+    third = rag.rebuild_index(_chunks("newest credit rules"))
+    # The previous generation stays for rollback, older ones are pruned
+    remaining = {path.name for path in generations_dir().iterdir()}
+    assert remaining == {Path(second["generation"]).name, Path(third["generation"]).name}
+    assert Path(first["generation"]).name not in remaining
+    assert third["generations_removed"] == 1
+
+
+def test_one_rebuild_at_a_time(rag):
+    """Test that a rebuild is refused while another process holds the rebuild lock."""
+    rag.rebuild_index(_chunks("old credit rules"))
+    live = resolve_live_path()
+    other = rebuild_lock()
+    assert other.acquire({"pid": 1})
+    try:
+        with pytest.raises(IndexRebuildInProgress) as error:
+            rag.rebuild_index(_chunks("new credit rules"))
+        assert error.value.owner == {"pid": 1}
+        assert resolve_live_path() == live
+    finally:
+        other.release()
+    rag.rebuild_index(_chunks("new credit rules"))
+    assert resolve_live_path() != live
+
+
+def test_rebuild_reexports_snapshot(rag, tmp_path, monkeypatch):
+    """Test that with the snapshot backend a rebuild exports a new snapshot that retrieval switches to."""
+    monkeypatch.setattr(settings, "retrieval_backend", "snapshot")
+    monkeypatch.setattr(settings, "vector_snapshot_path", str(tmp_path / "vector_snapshot"))
+
+    rag.rebuild_index(_chunks("old credit rules"))
+    first_snapshot = rag.snapshot.path
+    assert rag.snapshot.vectors.dtype == settings.vector_snapshot_dtype
+
+    rag.rebuild_index(_chunks("new credit rules", "new storage rules"))
+    assert rag.snapshot.path != first_snapshot
+    assert resolve_live_path(settings.vector_snapshot_path) == rag.snapshot.path
+    assert rag.retrieve_relevant_documents("new storage rules", 1)[0].page_content == "new storage rules"
+
+
+TEXTS = [f"45Q guidance chunk {i}" for i in range(12)]
+
+
+@pytest.mark.parametrize("backend", ["chroma", "snapshot"])
+def test_retrieve_many_matches_single_queries(rag, tmp_path, monkeypatch, backend):
+    """Test that batched retrieval keeps query order, honours top_k and matches one-by-one retrieval."""
+    monkeypatch.setattr(settings, "retrieval_backend", backend)
+    monkeypatch.setattr(settings, "vector_snapshot_path", str(tmp_path / "vector_snapshot"))
+    rag.rebuild_index(_chunks(*TEXTS))
+    assert (rag.snapshot is not None) == (backend == "snapshot")
+
+    queries = [TEXTS[7], TEXTS[2], TEXTS[11]]
+    for top_k in (1, 4):
+        batched = rag.retrieve_many(queries, top_k)
+        assert [docs[0].page_content for docs in batched] == queries
+        assert all(len(docs) == top_k for docs in batched)
+        for query, docs in zip(queries, batched):
+            single = rag.retrieve_relevant_documents(query, top_k)
+            assert [doc.id for doc in docs] == [doc.id for doc in single]
+
+    assert rag.retrieve_many([]) == []
+
+
+def test_answers_through_the_injected_llm_service(tmp_path, monkeypatch):
+    """Test that a RAGService given the worker's LLM service routes its answers through it."""
+    monkeypatch.setattr(settings, "vector_db_path", str(tmp_path / "vector_db"))
+    llm = LocalLLMService(latency_ms=0, canned_responses={"credit rules": "Use the 2025 rate."})
+    rag = RAGService(embeddings=DeterministicFakeEmbedding(size=16), llm_service=llm)
+    rag.rebuild_index(_chunks("credit rules"))
+
+    answer = asyncio.run(rag.answer_question("Which credit rules apply?"))
+    assert rag.llm_service is llm
+    assert answer["answer"] == "Use the 2025 rate."
@@ -0,0 +1,42 @@
+import asyncio
+from app.utils.screening import ScreeningParser, detect_format, iter_line_batches
+
+
+def _collect(chunks, batch_lines):
+    async def source():
+        for chunk in chunks:
+            yield chunk
+
+    async def run():
+        return [batch async for batch in iter_line_batches(source(), batch_lines)]
+
+    return asyncio.run(run())
+
+
+def test_line_batches_split_across_chunks():
+    """Test that lines and multi-byte characters split between chunks are reassembled."""
+    data = '{"facility_name": "Usine été"}\n{"a": 1}\n{"b": 2}'.encode()
+    chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+    lines = [line for batch in _collect(chunks, 2) for line in batch]
+
+    assert lines == ['{"facility_name": "Usine été"}', '{"a": 1}', '{"b": 2}']
+
+
+def test_ndjson_reports_bad_lines_in_place():
+    """Test that invalid lines become per-row errors without stopping the upload."""
+    parser = ScreeningParser("ndjson")
+    rows = parser.parse(['{"facility_type": "dac"}', "", "not json", "[1, 2]"])
+
+    assert rows[0] == (1, {"facility_type": "dac"})
+    assert rows[1][0] == 2 and rows[1][1].startswith("Invalid JSON")
+    assert rows[2] == (3, "Each line must be a JSON object of answers")
+
+
+def test_csv_quoted_newline_spans_batches():
+    """Test that a quoted field containing a newline is joined across batches."""
+    parser = ScreeningParser(detect_format("text/csv"))
+    rows = parser.parse(["facility_id,facility_name", '1,"North'])
+    rows += parser.parse(['Plant"', "2,South"])
+
+    assert rows == [(1, {"facility_id": "1", "facility_name": "North\nPlant"}), (2, {"facility_id": "2", "facility_name": "South"})]
+    assert parser.finish() == []
@@ -0,0 +1,62 @@
+import time
+from app.models.eligibility import EligibilityAssessment
+from app.services.session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+def _assessment(session_id: str) -> EligibilityAssessment:
+    return EligibilityAssessment(session_id=session_id, questionnaire_version="test", answers={"facility_name": session_id})
+
+
+def test_memory_store_evicts_least_recently_used():
+    """Test that the in-memory store stays within capacity, dropping the LRU session."""
+    store = InMemorySessionStore(max_sessions=2, ttl_seconds=60)
+    store.put(_assessment("a"))
+    store.put(_assessment("b"))
+    store.get("a")
+    store.put(_assessment("c"))
+
+    assert "a" in store and "c" in store
+    assert store.get("b") is None
+    assert len(store) == 2
+
+
+def test_memory_store_expires_sessions():
+    """Test that sessions disappear after the TTL."""
+    store = InMemorySessionStore(max_sessions=10, ttl_seconds=0.05)
+    store.put(_assessment("a"))
+    time.sleep(0.1)
+
+    assert store.get("a") is None
+    assert len(store) == 0
+
+
+def test_sqlite_store_batches_and_persists(tmp_path):
+    """Test that buffered writes are readable at once and survive reopening."""
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path, flush_interval_seconds=60, flush_batch_size=100)
+    store.put(_assessment("a"))
+
+    other_worker = SQLiteSessionStore(path, flush_interval_seconds=0)
+    assert store.get("a").answers == {"facility_name": "a"}
+    assert other_worker.get("a") is None
+
+    store.close()
+    assert other_worker.get("a").answers == {"facility_name": "a"}
+    other_worker.delete("a")
+    assert len(other_worker) == 0
+    other_worker.close()
+
+
+def test_sqlite_store_writes_through_by_default(tmp_path):
+    """Test that workers sharing the file see each other's answers at once."""
+    path = str(tmp_path / "sessions.db")
+    worker_a, worker_b = SQLiteSessionStore(path), SQLiteSessionStore(path)
+    worker_a.put(_assessment("a"))
+
+    assessment = worker_b.get("a")
+    assessment.answers["facility_type"] = "Direct Air Capture"
+    worker_b.put(assessment)
+    assert worker_a.get("a").answers == {"facility_name": "a", "facility_type": "Direct Air Capture"}
+
+    worker_a.close()
+    worker_b.close()
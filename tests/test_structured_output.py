@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from pydantic import BaseModel
+from app.services.llm_service import ChatModelLLMService, OpenAILLMService, supports_json_mode
+from app.utils.structured_output import (
+    StructuredOutputError, parse_json, schema_model, structured_output_metrics, validate_structured
+)
+
+SCHEMA = {"eligible": True, "credit_rate": 85.0, "reasons": ["reason"], "facility": {"type": "dac"}}
+
+
+def test_parse_json_tolerates_fences_prose_and_trailing_commas():
+    """Test that common wrappers around model JSON are recovered."""
+    assert parse_json('```json\n{"a": 1}\n```') == {"a": 1}
+    assert parse_json('Here is the result:\n{"a": [1, 2,],}\nHope this helps!') == {"a": [1, 2]}
+    assert parse_json('Sure: [{"text": "a, ]"},]') == [{"text": "a, ]"}]
+
+    with pytest.raises(StructuredOutputError) as error:
+        parse_json("I cannot answer that.")
+    assert error.value.kind == "parse"
+
+
+def test_validation_follows_example_schema():
+    """Test that example dicts become cached pydantic models that check fields and types."""
+    assert schema_model(dict(SCHEMA)) is schema_model(SCHEMA)
+
+    data = validate_structured('{"eligible": false, "credit_rate": 12, "reasons": [], '
+                               '"facility": {"type": "ccs"}, "notes": "extra"}', SCHEMA)
+    assert data["credit_rate"] == 12 and data["notes"] == "extra"
+
+    with pytest.raises(StructuredOutputError) as error:
+        validate_structured('{"eligible": "maybe", "credit_rate": 12, "reasons": []}', SCHEMA)
+    assert error.value.kind == "validation"
+    assert "facility" in str(error.value)
+
+    class Result(BaseModel):
+        eligible: bool
+
+    assert validate_structured('{"eligible": true}', Result) == {"eligible": True}
+
+
+class ScriptedModel:
+    """Returns the queued texts in order, recording the messages it was sent."""
+
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.sent = []
+
+    async def agenerate(self, messages):
+        self.sent.append(messages[0])
+        return SimpleNamespace(generations=[[SimpleNamespace(text=self.texts.pop(0))]])
+
+
+class ScriptedService(ChatModelLLMService):
+    def __init__(self, *texts):
+        self.llm = ScriptedModel(*texts)
+
+
+def test_invalid_response_is_corrected_in_conversation():
+    """Test that a malformed response is sent back with its error and the corrected JSON returned."""
+    before = structured_output_metrics.to_dict()
+    service = ScriptedService('{"eligible": true,', '{"eligible": true, "credit_rate": 85, "reasons": [], '
+                                                  '"facility": {"type": "dac"}}')
+
+    result = asyncio.run(service.generate_structured_response("Is it eligible?", SCHEMA))
+
+    assert result["eligible"] is True
+    second_request = service.llm.sent[1]
+    assert second_request[1].content == '{"eligible": true,'
+    assert "Failed to parse" in second_request[2].content
+    after = structured_output_metrics.to_dict()
+    assert after["retries"] == before["retries"] + 1
+    assert after["parse_failures"] == before["parse_failures"] + 1
+
+
+def test_json_mode_by_model():
+    """Test that JSON mode is used for models that support it."""
+    assert supports_json_mode("gpt-4o-mini")
+    assert not supports_json_mode("gpt-4")
+    assert OpenAILLMService("test-key", "gpt-4o").json_llm is not None
+    assert OpenAILLMService("test-key", "gpt-4").json_llm is None
@@ -0,0 +1,58 @@
+import os
+import numpy as np
+from app.utils.vector_index import (
+    brute_force_top_k,
+    brute_force_top_k_ids,
+    measure_recall,
+    open_collection,
+    activate_generation,
+    new_generation_path,
+    prune_generations,
+    resolve_live_path
+)
+
+
+def test_brute_force_top_k_orders_nearest_first():
+    """Test exact search returns the closest vectors in order."""
+    vectors = np.array([[0.0, 0.0], [1.0, 0.0], [5.0, 5.0], [0.9, 0.1]], dtype=np.float32)
+    queries = np.array([[1.0, 0.0]], dtype=np.float32)
+
+    assert brute_force_top_k(vectors, queries, 2, "l2").tolist() == [[1, 3]]
+    assert brute_force_top_k(vectors, queries, 10, "cosine").shape == (1, 4)
+
+
+def test_activate_generation_swaps_live_path(tmp_path):
+    """Test that activating a generation repoints the live path atomically."""
+    live = tmp_path / "vector_db"
+    live.mkdir()
+    (live / "marker").write_text("legacy")
+
+    generation = new_generation_path(str(live))
+    generation.mkdir(parents=True)
+    activate_generation(generation, str(live))
+
+    assert live.is_symlink()
+    assert resolve_live_path(str(live)) == generation.resolve()
+    # The original directory is preserved as a legacy generation
+    assert any(path.name.endswith("-legacy") for path in generation.parent.iterdir())
+
+    # Just retired, so kept until workers have had time to switch over
+    assert prune_generations(keep=0, live_path=str(live), min_age_seconds=60) == []
+    removed = prune_generations(keep=0, live_path=str(live), min_age_seconds=0)
+    assert len(removed) == 1
+    assert os.listdir(generation.parent) == [generation.name]
+
+
+def test_brute_force_ids_stream_matches_in_memory_search(tmp_path):
+    """Test that the batched exact search over a collection agrees with searching all vectors at once."""
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(57, 8)).astype(np.float32)
+    ids = [f"chunk-{i}" for i in range(len(vectors))]
+    collection = open_collection(tmp_path / "index")
+    collection.add(ids=ids, embeddings=vectors.tolist(), documents=ids)
+
+    queries = vectors[[3, 40]]
+    expected = [[ids[i] for i in row] for row in brute_force_top_k(vectors, queries, 5)]
+    assert brute_force_top_k_ids(collection, queries, 5, batch_size=10) == expected
+    assert measure_recall(collection, k=5, sample_size=10) > 0.9
+    assert measure_recall(collection, k=5, sample_size=0) is None
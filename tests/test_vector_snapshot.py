@@ -0,0 +1,44 @@
+import numpy as np
+from app.utils.vector_index import brute_force_top_k
+from app.utils.vector_snapshot import VectorSnapshot, write_snapshot
+
+
+def _write(tmp_path, space="l2", ivf_lists=0, count=300, dimension=16):
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(count, dimension)).astype(np.float32)
+    ids = [f"chunk-{i}" for i in range(count)]
+    documents = [f"Chunk {i} about 45Q" for i in range(count)]
+    metadatas = [{"source": f"doc-{i % 5}.pdf"} for i in range(count)]
+    write_snapshot(tmp_path, ids, vectors, documents, metadatas,
+                   space=space, dtype="float32", ivf_lists=ivf_lists)
+    return vectors, rng.normal(size=(5, dimension)).astype(np.float32)
+
+
+def test_exact_search_matches_brute_force(tmp_path):
+    """Test that snapshot search returns the same neighbours as exact search."""
+    for space in ("l2", "cosine"):
+        path = tmp_path / space
+        vectors, queries = _write(path, space=space)
+        snapshot = VectorSnapshot(path)
+
+        expected = brute_force_top_k(vectors, queries, 10, space)
+        results = snapshot.search(queries, 10)
+        for rows, expected_rows in zip(results, expected):
+            assert [snapshot.ids[row] for row, _ in rows] == [f"chunk-{i}" for i in expected_rows]
+
+
+def test_ivf_with_all_lists_probed_is_exact(tmp_path):
+    """Test that probing every IVF list gives exact results and documents round-trip."""
+    vectors, queries = _write(tmp_path, ivf_lists=8)
+    snapshot = VectorSnapshot(tmp_path)
+
+    expected = brute_force_top_k(vectors, queries, 5, "l2")
+    results = snapshot.search(queries, 5, nprobe=8)
+    for rows, expected_rows in zip(results, expected):
+        assert [snapshot.ids[row] for row, _ in rows] == [f"chunk-{i}" for i in expected_rows]
+
+    document = snapshot.similarity_search_by_vector(vectors[42].tolist(), 1)[0]
+    assert document.id == "chunk-42"
+    assert document.page_content == "Chunk 42 about 45Q"
+    assert document.metadata == {"source": "doc-2.pdf"}
+    assert snapshot.row_of("chunk-42") is not None
@@ -49,7 +49,7 @@ def main():
     
     # Add documents to vector store
     if result["chunks"]:
-        rag_service.add_documents(result["chunks"])
+        rag_service.rebuild_index(result["chunks"])
         print("✅ Documents added to vector store")
         
         # Get vector store stats